@@ -0,0 +1,85 @@
+"""
+Round trip and benchmark of Parquet forecasts against csv forecasts: each
+forecast is written from the same Arrow table both as a csv and as a Parquet
+file, then validated both ways with `covid19.validate_quantile_csv_file()`.
+The error messages must be identical. This is checked for the forecast as it
+is and for a copy with errors added (an invalid location and quantile, and
+values that decrease). Then the time of each validation is printed.
+
+Needs pyarrow, and the hub config (see the README). Run from the repository
+root with forecast csv files, e.g.:
+
+    python benchmarks/bench_arrow_input.py data-processed/*/2021-07-12-*.csv
+"""
+
+# Standard modules
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from codebase.covid19 import validate_quantile_csv_file
+from codebase.forecast_file import ArrowForecastFile, ForecastFile
+
+NUMBER = 3  # validations timed per file
+
+
+def forecast_table(csv_path):
+    # the forecast with typed columns: dates as date32, quantile and value as numbers
+    df = pd.read_csv(csv_path, dtype={'location': str})
+    for column in ('forecast_date', 'target_end_date'):
+        dates = pd.to_datetime(df[column], errors='coerce')
+        if dates.notna().all():
+            df[column] = dates.dt.date
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def with_errors(table):
+    # an invalid location and quantile in the first quantile row, and decreasing values in the next quantile row
+    df = table.to_pandas()
+    quantile_rows = df.index[df['type'] == 'quantile']
+    df.loc[quantile_rows[0], ['location', 'quantile']] = ['XX', 0.33]
+    df.loc[quantile_rows[1], 'value'] = -1
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def validate(forecast_file):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return validate_quantile_csv_file(forecast_file)
+
+
+def main(csv_paths):
+    num_differences = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for csv_path in csv_paths:
+            table = forecast_table(csv_path)
+            for variant, variant_table in (('as is', table), ('with errors', with_errors(table))):
+                name = os.path.splitext(os.path.basename(csv_path))[0]
+                csv_copy, parquet_copy = os.path.join(tmp_dir, name + '.csv'), os.path.join(tmp_dir, name + '.parquet')
+                variant_table.to_pandas().to_csv(csv_copy, index=False)
+                pq.write_table(variant_table, parquet_copy)
+
+                csv_messages = validate(ForecastFile(csv_copy))
+                parquet_messages = validate(ArrowForecastFile(parquet_copy))
+                if csv_messages != parquet_messages:
+                    num_differences += 1
+                    print(f"DIFFERENT MESSAGES: {csv_path} ({variant})\n  csv: {csv_messages}\n  "
+                          f"parquet: {parquet_messages}")
+
+                csv_time = timeit.timeit(lambda: validate(ForecastFile(csv_copy)), number=NUMBER) / NUMBER
+                parquet_time = timeit.timeit(lambda: validate(ArrowForecastFile(parquet_copy)), number=NUMBER) / NUMBER
+                num_messages = 0 if csv_messages == "no errors" else len(csv_messages)
+                print(f"{csv_path} ({variant}, {variant_table.num_rows} rows, {num_messages} messages): "
+                      f"csv {csv_time * 1000:.1f} ms, parquet {parquet_time * 1000:.1f} ms")
+    print(f"{num_differences} forecasts with different messages")
+    return num_differences
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv[1:]) else 0)
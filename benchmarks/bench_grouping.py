@@ -0,0 +1,84 @@
+"""
+Benchmark of building the prediction dicts of a quantile csv file: the former
+sort + groupby against the single-pass grouping of
+`quantile_io._prediction_dicts_for_quantile_rows()`.
+
+Rows are generated like a hub forecast file (8 targets, 23 quantiles and one
+point per location/target), in file order and shuffled, for growing numbers of
+locations. Run from the repository root:
+
+    python benchmarks/bench_grouping.py
+"""
+
+# Standard modules
+import os
+import random
+import sys
+import timeit
+from itertools import groupby
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codebase.quantile_io import _prediction_dicts_for_quantile_rows
+import codebase.project_variables as project
+
+QUANTILES = [0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5,
+             0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.975, 0.99]
+TARGETS = [f"{horizon} wk ahead {target_variable}" for horizon in range(1, 5)
+           for target_variable in ['inc case', 'inc death']]
+
+
+def sort_groupby_prediction_dicts(rows):
+    # the sort + groupby implementation that _prediction_dicts_for_quantile_rows() replaced
+    prediction_dicts = []
+    rows.sort(key=lambda _: (_[0], _[1], _[2]))  # sorted for groupby()
+    for (target_name, location, is_point_row), quantile_val_grouper in \
+            groupby(rows, key=lambda _: (_[0], _[1], _[2])):
+        point_values = []
+        quant_quantiles, quant_values = [], []
+        for _, _, _, quantile, value in quantile_val_grouper:
+            if is_point_row:
+                point_values.append(value)
+            else:
+                quant_quantiles.append(quantile)
+                quant_values.append(value)
+        for point_value in point_values:
+            prediction_dicts.append({'unit': location, 'target': target_name,
+                                     'class': project.POINT_PREDICTION_CLASS,
+                                     'prediction': {'value': point_value}})
+        if quant_quantiles:
+            prediction_dicts.append({'unit': location, 'target': target_name,
+                                     'class': project.QUANTILE_PREDICTION_CLASS,
+                                     'prediction': {'quantile': quant_quantiles, 'value': quant_values}})
+    return prediction_dicts
+
+
+def forecast_rows(num_locations):
+    # [target_name, location, is_point_row, quantile, value], as returned by _validated_rows_for_quantile_csv()
+    rows = []
+    for location_idx in range(num_locations):
+        location = f"L{location_idx:04d}"
+        for target_name in TARGETS:
+            rows.append([target_name, location, True, None, 1000])
+            rows.extend([target_name, location, False, quantile, 1000 * quantile] for quantile in QUANTILES)
+    return rows
+
+
+def main():
+    print(f"{'rows':>8} {'order':>9} {'sort+groupby':>13} {'single pass':>12} {'speedup':>8}")
+    for num_locations in [32, 320, 3200]:
+        for order in ['file', 'shuffled']:
+            rows = forecast_rows(num_locations)
+            if order == 'shuffled':
+                random.Random(0).shuffle(rows)
+            assert sort_groupby_prediction_dicts(list(rows)) == _prediction_dicts_for_quantile_rows(list(rows))
+
+            number = max(1, 200 // num_locations)
+            old_time = min(timeit.repeat(lambda: sort_groupby_prediction_dicts(list(rows)), number=number, repeat=3))
+            new_time = min(timeit.repeat(lambda: _prediction_dicts_for_quantile_rows(list(rows)), number=number,
+                                         repeat=3))
+            print(f"{len(rows):>8} {order:>9} {1000 * old_time / number:>11.1f}ms {1000 * new_time / number:>10.1f}ms "
+                  f"{old_time / new_time:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
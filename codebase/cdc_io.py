@@ -1,7 +1,8 @@
 # Standard modules
 import csv
 import datetime
-from itertools import groupby
+import functools
+import re
 import pymmwr
 
 import codebase.project_variables as project
@@ -118,9 +119,17 @@ def _prediction_dicts_for_csv_rows(season_start_year, rows):
     :return: a list of PointPrediction or BinDistribution prediction dicts
     """
     prediction_dicts = []  # return value
-    rows.sort(key=lambda _: (_[0], _[1], _[2]))  # sorted for groupby()
-    for (location_name, target_name, is_point_row), bin_start_end_val_grouper in \
-            groupby(rows, key=lambda _: (_[0], _[1], _[2])):
+
+    # group rows in a single pass. only the distinct groups are sorted, which gives the same order as sorting all rows
+    grouped_rows = {}  # (location_name, target_name, is_point_row) -> [(bin_start_incl, bin_end_notincl, value), ...]
+    for location_name, target_name, is_point_row, bin_start_incl, bin_end_notincl, value in rows:
+        group_rows = grouped_rows.get((location_name, target_name, is_point_row))
+        if group_rows is None:
+            group_rows = grouped_rows[(location_name, target_name, is_point_row)] = []
+        group_rows.append((bin_start_incl, bin_end_notincl, value))
+
+    for location_name, target_name, is_point_row in sorted(grouped_rows):
+        bin_start_end_vals = grouped_rows[(location_name, target_name, is_point_row)]
         if target_name not in ['Season onset', 'Season peak week', 'Season peak percentage', '1 wk ahead', '2 wk ahead',
                                '3 wk ahead', '4 wk ahead', '1_biweek_ahead', '2_biweek_ahead', '3_biweek_ahead',
                                '4_biweek_ahead', '5_biweek_ahead']:  # all CDC and Thai targets
@@ -130,7 +139,7 @@ def _prediction_dicts_for_csv_rows(season_start_year, rows):
         # (i.e., don't validate here)
         point_values = []
         bin_cats, bin_probs = [], []
-        for _, _, _, bin_start_incl, bin_end_notincl, value in bin_start_end_val_grouper:  # all 3 are numbers or None
+        for bin_start_incl, bin_end_notincl, value in bin_start_end_vals:  # all 3 are numbers or None
             if is_point_row:
                 point_value = _process_csv_point_row(season_start_year, target_name, value)
                 point_values.append(point_value)
@@ -224,6 +233,16 @@ def _process_csv_bin_row(season_start_year, target_name, value, bin_start_incl,
 # utility functions
 #
 
+# _parse_date() and _parse_value() are called for every cell of the row-based validators, on few distinct strings
+# (dates, quantile levels), so their results are cached. PARSE_CACHE_SIZE bounds the number of strings each keeps
+PARSE_CACHE_SIZE = 2 ** 16
+
+# the common numeric cases, which are parsed without going through a raised exception
+_INT_RE = re.compile(r'[+-]?[0-9]+\Z')
+_FLOAT_RE = re.compile(r'[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?\Z')
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def _parse_date(value_str):
     """
     Tries to parse value_str as a date in YYYY_MM_DD_DATE_FORMAT. Returns a datetime.date if valid, or None o/w
@@ -234,10 +253,17 @@ def _parse_date(value_str):
         return None
 
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def _parse_value(value_str):
     """
     Tries to parse value_str (a string) in this order: int, float, or date in YYYY_MM_DD_DATE_FORMAT. Returns None o/w.
     """
+    if _INT_RE.match(value_str):
+        return int(value_str)
+    if _FLOAT_RE.match(value_str):
+        return float(value_str)
+
+    # less common forms int() and float() accept, e.g. ' 1', '1_000', 'inf', 'NaN'
     try:
         return int(value_str)
     except ValueError:
@@ -250,6 +276,15 @@ def _parse_value(value_str):
 
     return _parse_date(value_str)
 
+
+def parse_cache_info():
+    """
+    :return: dict that maps 'date' and 'value' to the functools cache statistics (hits, misses, maxsize, currsize)
+        of _parse_date() and _parse_value()
+    """
+    return {'date': _parse_date.cache_info(), 'value': _parse_value.cache_info()}
+
+
 # ---- CDC EW utilities ----
 #
 
@@ -0,0 +1,73 @@
+"""
+The files changed by a pull request or commit, and their classification into
+forecasts, other data-processed csv files, metadata and other files.
+
+The changes come either from the Github API (PyGithub File objects) or from a
+local git checkout, diffed against a base ref with `git_changed_files()`. The
+latter needs no network access or token, e.g. for local runs and pre-commit
+hooks. Both give objects with the `filename`, `status` ('added', 'modified',
+'removed' or 'renamed') and `previous_filename` of each changed file.
+"""
+
+# Standard modules
+import collections
+import re
+import subprocess
+
+# Pattern that matches a forecast file added to the data-processed folder.
+# Test this regex usiing this link: https://regex101.com/r/wmajJA/1
+FORECAST_PAT = re.compile(r"^data-processed/(.+)/\d\d\d\d-\d\d-\d\d-\1\.csv$")
+METADATA_PAT = re.compile(r"^model-metadata/.+\.yml$")
+DATA_PROCESSED_CSV_PAT = re.compile(r"^data-processed/(.+)\.csv$")
+
+ChangedFile = collections.namedtuple('ChangedFile', ['filename', 'status', 'previous_filename'])
+
+# `git diff --name-status` letters -> Github API file status
+_GIT_STATUSES = {'A': 'added', 'C': 'added', 'M': 'modified', 'T': 'modified', 'D': 'removed', 'R': 'renamed'}
+
+
+def git_changed_files(base_ref, checkout='.'):
+    """
+    purpose: list the files changed in a local git checkout since it branched off base_ref, including
+             staged and unstaged changes to tracked files
+
+    params:
+    * base_ref: the ref the changes are compared to, e.g. 'origin/main'
+    * checkout: path of the git checkout
+
+    returns: list of ChangedFile, in git diff order
+    """
+    def git(*args):
+        return subprocess.run(['git', '-C', checkout] + list(args), check=True, capture_output=True,
+                              text=True).stdout
+
+    merge_base = git('merge-base', base_ref, 'HEAD').strip()
+    fields = git('diff', '--name-status', '-z', '-M', merge_base).split('\0')[:-1]
+
+    files_changed = []
+    fields = iter(fields)
+    for status in fields:
+        if status[0] in 'RC':  # renames and copies are followed by the old and the new path
+            previous_filename, filename = next(fields), next(fields)
+        else:
+            previous_filename, filename = None, next(fields)
+        files_changed.append(ChangedFile(filename, _GIT_STATUSES.get(status[0], 'modified'),
+                                         previous_filename if status[0] == 'R' else None))
+    return files_changed
+
+
+def classify_changed_files(files_changed):
+    """
+    :param files_changed: list of changed files, see module docstring
+    :return: 4-tuple of lists of the files in files_changed that are:
+        - forecasts: forecast files in data-processed
+        - forecasts_err: any csv file in data-processed, including badly named forecasts
+        - metadatas: metadata files
+        - other_files: all files that are neither forecasts nor metadata
+    """
+    forecasts = [file for file in files_changed if FORECAST_PAT.match(file.filename) is not None]
+    forecasts_err = [file for file in files_changed if DATA_PROCESSED_CSV_PAT.match(file.filename) is not None]
+    metadatas = [file for file in files_changed if METADATA_PAT.match(file.filename) is not None]
+    other_files = [file for file in files_changed
+                   if (FORECAST_PAT.match(file.filename) is None and METADATA_PAT.match(file.filename) is None)]
+    return forecasts, forecasts_err, metadatas, other_files
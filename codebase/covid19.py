@@ -5,55 +5,150 @@ from pathlib import Path
 import click
 import sys
 
+# To list in requirements.txt
+import numpy as np
+import pandas as pd
+
 # Local modules
 sys.path.append('validation/codebase/')
-from .quantile_io import json_io_dict_from_quantile_csv_file
+from .quantile_io import json_io_dict_from_quantile_csv_file, iter_quantile_csv_errors, STREAM_CHUNK_SIZE
+from .forecast_file import ForecastFile, as_forecast_file, is_arrow_forecast
+from .error_summary import ERROR_SAMPLES, RowError, summarize_errors
+from .validation_context import get_validation_context
 
 # Use codes, targets, and quantiles
 #   as defined in project_variables (ultimately from hub config)
 import codebase.project_variables as project
 
-VALID_LOCATIONS = list(project.CODES['location'])
-VALID_TARGET_NAMES = project.VALID_TARGET_NAMES
-VALID_QUANTILES = project.VALID_QUANTILES
-FORECAST_WEEK_DAY = project.FORECAST_WEEK_DAY
+# VALID_LOCATIONS, VALID_TARGET_NAMES, VALID_QUANTILES and FORECAST_WEEK_DAY
+#   are looked up on first use, so that importing this module does not load the hub config
+_PROJECT_VARIABLES = ('VALID_TARGET_NAMES', 'VALID_QUANTILES', 'FORECAST_WEEK_DAY')
+
+
+def __getattr__(name):
+    if name == 'VALID_LOCATIONS':
+        return _valid_locations()
+    if name in _PROJECT_VARIABLES:
+        return getattr(project, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _valid_locations():
+    return list(project.CODES['location'])
+
 
 #
 # validate_quantile_csv_file()
 #
 
-def validate_quantile_csv_file(csv_fp):
+def validate_quantile_csv_file(csv_fp, engine='columnar', streaming=False, chunk_size=STREAM_CHUNK_SIZE,
+                               error_samples=ERROR_SAMPLES, context=None):
     """
     A simple wrapper of `json_io_dict_from_quantile_csv_file()` that tosses
     the json_io_dict and just prints validation error_messages.
 
-    :param csv_fp: as passed to `json_io_dict_from_quantile_csv_file()`
+    :param csv_fp: a ForecastFile (or `forecast_file.ArrowForecastFile`), or a path to a forecast csv, Parquet or Arrow
+        file which is then loaded
+    :param engine: 'columnar' runs the COVID19-specific checks on whole columns with
+        `covid19_column_validator()`, 'row' runs `covid19_row_validator()` once per row.
+        Both give the same error messages
+    :param streaming: validate with `iter_quantile_csv_errors()` instead, in memory
+        bounded by `chunk_size` rows. A path is then read from disk chunk by chunk
+    :param chunk_size: number of rows read at a time when streaming
+    :param error_samples: row errors with the same message are reported once, with their count and this many example
+        rows, see `error_summary`. None reports every row error
+    :param context: the `validation_context.ValidationContext` to validate against. None for the one of the hub
+        config, see `get_validation_context()`
     :return: error_messages: a list of strings
     """
-    quantile_csv_file = Path(csv_fp)
+    if streaming:
+        error_messages = _streaming_error_messages(csv_fp, engine, chunk_size, error_samples, context)
+    else:
+        _, error_messages = validated_json_io_dict(csv_fp, engine, error_samples, context)
+
+    if error_messages:
+        return error_messages
+    else:
+        return "no errors"
+
+
+def validated_json_io_dict(csv_fp, engine='columnar', error_samples=ERROR_SAMPLES, context=None):
+    """
+    Does the validations of `validate_quantile_csv_file()` but keeps the
+    json_io_dict, e.g. to upload the forecast without converting it again.
+
+    :param csv_fp: as passed to `validate_quantile_csv_file()`
+    :param engine: as passed to `validate_quantile_csv_file()`
+    :param error_samples: ""
+    :param context: ""
+    :return: 2-tuple: (json_io_dict, error_messages) as returned by `json_io_dict_from_quantile_csv_file()`.
+        json_io_dict is None if there were errors
+    """
+    forecast = as_forecast_file(csv_fp)
+    quantile_csv_file = Path(forecast.filepath)
     click.echo(f"* validating quantile_csv_file '{quantile_csv_file}'...")
-    with open(quantile_csv_file) as ecdc_csv_fp:
-        # toss json_io_dict:
-        target_names = VALID_TARGET_NAMES
+    context = context or get_validation_context()
 
-        _, error_messages = json_io_dict_from_quantile_csv_file(
-                csv_fp = ecdc_csv_fp,
-                valid_target_names = target_names,
-                codes = VALID_LOCATIONS,
-                row_validator = covid19_row_validator,
-                addl_req_cols = ['forecast_date', 'target_end_date'])
+    return json_io_dict_from_quantile_csv_file(
+            csv_fp = forecast.csv_fp(),
+            valid_target_names = context.target_names,
+            codes = context,
+            row_validator = covid19_row_validator if engine == 'row' else None,
+            addl_req_cols = ['forecast_date', 'target_end_date'],
+            column_validator = covid19_column_validator if engine == 'columnar' else None,
+            error_samples = error_samples)
+
+
+def validated_quantile_predictions(csv_fp, engine='columnar', chunk_size=STREAM_CHUNK_SIZE,
+                                   error_samples=ERROR_SAMPLES, context=None):
+    """
+    Does the validations of `validate_quantile_csv_file(streaming=True)` and
+    builds the compact `json_io.QuantilePredictions` of the forecast in the
+    same pass, e.g. to upload it without reading it again.
+
+    :param csv_fp: as passed to `validate_quantile_csv_file()`
+    :param engine: ""
+    :param chunk_size: ""
+    :param error_samples: ""
+    :param context: ""
+    :return: 2-tuple: (predictions, error_messages). predictions is None if
+        there were errors
+    """
+    predictions = []  # set by iter_quantile_csv_errors() if the forecast is valid
+    error_messages = _streaming_error_messages(csv_fp, engine, chunk_size, error_samples, context,
+                                               on_predictions=predictions.append)
+    return (None if error_messages else predictions[0]), error_messages
 
-        if error_messages:
-            return error_messages
-        else:
-            return "no errors"
+
+def _streaming_error_messages(csv_fp, engine, chunk_size, error_samples, context, on_predictions=None):
+    """
+    `validate_quantile_csv_file()` helper for streaming=True
+
+    :return: error_messages: a list of strings
+    """
+    if not isinstance(csv_fp, ForecastFile) and is_arrow_forecast(csv_fp):
+        csv_fp = as_forecast_file(csv_fp)  # read whole, as compact typed columns
+    quantile_csv_file = Path(csv_fp.filepath if isinstance(csv_fp, ForecastFile) else csv_fp)
+    click.echo(f"* validating quantile_csv_file '{quantile_csv_file}' in chunks of {chunk_size} rows...")
+    context = context or get_validation_context()
+    with (csv_fp.csv_fp() if isinstance(csv_fp, ForecastFile) else open(quantile_csv_file)) as ecdc_csv_fp:
+        error_messages = summarize_errors(iter_quantile_csv_errors(
+                csv_fp = ecdc_csv_fp,
+                valid_target_names = context.target_names,
+                codes = context,
+                row_validator = covid19_row_validator if engine == 'row' else None,
+                addl_req_cols = ['forecast_date', 'target_end_date'],
+                column_validator = covid19_column_validator if engine == 'columnar' else None,
+                chunk_size = chunk_size,
+                on_predictions = on_predictions), error_samples)
+    return error_messages
 
 
 #
 # `json_io_dict_from_quantile_csv_file()` row validator
 #
 
-def covid19_row_validator(column_index_dict, row, codes):
+def covid19_row_validator(column_index_dict, row, context):
     """
     Does COVID19-specific row validation. Notes:
     - Checks in order:
@@ -71,6 +166,9 @@ def covid19_row_validator(column_index_dict, row, codes):
     - Expects these `addl_req_cols` passed to
      `json_io_dict_from_quantile_csv_file()`:
          ['forecast_date', 'target_end_date']
+
+    - Expects a `validation_context.ValidationContext` as the `codes` passed to
+     `json_io_dict_from_quantile_csv_file()`
     """
 
     from .cdc_io import _parse_date  # avoid circular imports
@@ -84,20 +182,19 @@ def covid19_row_validator(column_index_dict, row, codes):
 
     # 1. validate location (ISO-2 code)
     location = row[column_index_dict['location']]
-    if location not in codes:
-        error_messages.append(f"Error > invalid ISO-2 location: {location!r}. row={row}")
+    if location not in context.locations:
+        error_messages.append(RowError(f"Error > invalid ISO-2 location: {location!r}.", row))
 
     row_type = row[column_index_dict['type']]
     if row_type not in ["observed", "point", "quantile"]:
-        print(row_type)
-        error_messages.append(f"Error > invalid type: {row_type!r}. row={row}")
+        error_messages.append(RowError(f"Error > invalid type: {row_type!r}.", row))
 
     # 2. validate quantiles (stored as strings, checked against numeric)
     quantile = row[column_index_dict['quantile']]
     if row[column_index_dict['type']] == 'quantile':
         try:
-            if float(quantile) not in VALID_QUANTILES:
-                error_messages.append(f"Error > invalid quantile: {quantile!r}. row={row}")
+            if float(quantile) not in context.quantiles:
+                error_messages.append(RowError(f"Error > invalid quantile: {quantile!r}.", row))
         except ValueError:
             pass  # ignore, caught by `json_io_dict_from_quantile_csv_file()`
 
@@ -109,16 +206,15 @@ def covid19_row_validator(column_index_dict, row, codes):
     forecast_date = _parse_date(forecast_date)  # None if invalid format
     target_end_date = _parse_date(target_end_date)  # ""
     if not forecast_date or not target_end_date:
-        error_messages.append(f"Error > invalid forecast_date or target_end_date format. forecast_date={forecast_date!r}. "
-                              f"target_end_date={target_end_date}. row={row}")
+        error_messages.append(RowError(f"Error > invalid forecast_date or target_end_date format. forecast_date={forecast_date!r}. "
+                              f"target_end_date={target_end_date}.", row))
         return error_messages
 
     # 4. validate "__ week ahead" increment - must be an int
     target = row[column_index_dict['target']]
-    try:
-        step_ahead_increment = int(target.split('wk ahead')[0].strip())
-    except ValueError:
-        error_messages.append(f"Error > non-integer number of weeks ahead in 'wk ahead' target: {target!r}. row={row}")
+    step_ahead_increment = _step_ahead_increment(target, context)
+    if step_ahead_increment is None:
+        error_messages.append(RowError(f"Error > non-integer number of weeks ahead in 'wk ahead' target: {target!r}.", row))
         return error_messages  # terminate - depends on valid step_ahead_increment
 
     # 5. Validate date alignment (Sunday-Saturday epi week)
@@ -126,7 +222,7 @@ def covid19_row_validator(column_index_dict, row, codes):
 
     # 5.1 for x week ahead targets, weekday(target_end_date) should be a Sat
     if weekday_to_sun_based[target_end_date.weekday()] != 7:
-       error_messages.append(f"Error > target_end_date was not a Saturday: {target_end_date}. row={row}")
+       error_messages.append(RowError(f"Error > target_end_date was not a Saturday: {target_end_date}.", row))
        return error_messages  # terminate - depends on valid target_end_date
 
     # 5.2 Forecast date should always be Mon -- no longer checked
@@ -147,17 +243,166 @@ def covid19_row_validator(column_index_dict, row, codes):
     exp_target_end_date = sat_forecast_date + datetime.timedelta(weeks = step_ahead_increment)
     # - Validate
     if target_end_date != exp_target_end_date:
-        error_messages.append(f"Error > target_end_date was not the expected Saturday. forecast_date = {forecast_date}, "
-                                  f"target_end_date={target_end_date}. Expected target end date = {exp_target_end_date}, "
-                                  f"row={row}")
+        error_messages.append(RowError(f"Error > target_end_date was not the expected Saturday. forecast_date = {forecast_date}, "
+                                  f"target_end_date={target_end_date}. Expected target end date = {exp_target_end_date},", row))
 
     # done!
     return error_messages
 
 
+#
+# `json_io_dict_from_quantile_csv_file()` column validator
+#
 
+def covid19_column_validator(column_index_dict, rows, context):
+    """
+    Does the same checks as `covid19_row_validator()`, with the same error
+    messages, but on whole columns at once. Each check is worked out once per
+    distinct value (location, quantile, date or target string) and then
+    broadcast to the rows with pandas/NumPy, so the cost grows with the
+    number of distinct values rather than with the number of rows. Only rows
+    that fail a check are formatted into messages.
 
+    - Expects the same `valid_target_names`, `addl_req_cols` and context as
+      `covid19_row_validator()`
 
-# forecast_date = 2021-07-09,
-# target_end_date=2021-07-17.
-# Expected target end date = 2021-07-18
+    :return: a dict that maps a row index to the list of error messages for that row
+    """
+
+    if not rows:
+        return {}
+
+    columns = pd.DataFrame(rows, dtype=object)
+    location, row_type, quantile, forecast_date, target_end_date, target = \
+        [columns[column_index_dict[column]] for column in ('location', 'type', 'quantile', 'forecast_date',
+                                                          'target_end_date', 'target')]
+    checks = covid19_column_checks(location, row_type, quantile, forecast_date, target_end_date, target, context)
+    is_invalid_location, is_invalid_type, is_invalid_quantile, is_invalid_date, is_invalid_target, is_not_saturday, \
+        is_unexpected_date = [checks[check] for check in COVID19_COLUMN_CHECKS]
+    parsed_dates, exp_target_end_ordinal = checks['parsed_dates'], checks['exp_target_end_ordinal']
+
+    # format messages for the failing rows only, in the order `covid19_row_validator()` reports them
+    row_error_messages = {}
+    for row_idx in np.flatnonzero(checks['is_error']):
+        row = rows[row_idx]
+        error_messages = []
+        if is_invalid_location[row_idx]:
+            error_messages.append(RowError(f"Error > invalid ISO-2 location: {location.iat[row_idx]!r}.", row))
+        if is_invalid_type[row_idx]:
+            error_messages.append(RowError(f"Error > invalid type: {row_type.iat[row_idx]!r}.", row))
+        if is_invalid_quantile[row_idx]:
+            error_messages.append(RowError(f"Error > invalid quantile: {quantile.iat[row_idx]!r}.", row))
+        if is_invalid_date[row_idx]:
+            error_messages.append(RowError(f"Error > invalid forecast_date or target_end_date format. "
+                                  f"forecast_date={parsed_dates[forecast_date.iat[row_idx]]!r}. "
+                                  f"target_end_date={parsed_dates[target_end_date.iat[row_idx]]}.", row))
+        elif is_invalid_target[row_idx]:
+            error_messages.append(RowError(f"Error > non-integer number of weeks ahead in 'wk ahead' target: "
+                                  f"{target.iat[row_idx]!r}.", row))
+        elif is_not_saturday[row_idx]:
+            error_messages.append(RowError(f"Error > target_end_date was not a Saturday: "
+                                  f"{parsed_dates[target_end_date.iat[row_idx]]}.", row))
+        elif is_unexpected_date[row_idx]:
+            error_messages.append(RowError(f"Error > target_end_date was not the expected Saturday. "
+                                  f"forecast_date = {parsed_dates[forecast_date.iat[row_idx]]}, "
+                                  f"target_end_date={parsed_dates[target_end_date.iat[row_idx]]}. "
+                                  f"Expected target end date = "
+                                  f"{datetime.date.fromordinal(exp_target_end_ordinal[row_idx])},", row))
+        row_error_messages[int(row_idx)] = error_messages
+
+    # done!
+    return row_error_messages
+
+
+COVID19_COLUMN_CHECKS = ('is_invalid_location', 'is_invalid_type', 'is_invalid_quantile', 'is_invalid_date',
+                         'is_invalid_target', 'is_not_saturday', 'is_unexpected_date')
+
+
+def covid19_column_checks(location, row_type, quantile, forecast_date, target_end_date, target, context):
+    """
+    The checks of `covid19_column_validator()` as boolean arrays over the rows, without the messages. Also run on
+    the rows of many forecasts at once, see `hub_dataset`.
+
+    :param location: Series of the location strings of the rows
+    :param row_type: Series of their type strings
+    :param quantile: "" quantile strings
+    :param forecast_date: "" forecast_date strings
+    :param target_end_date: "" target_end_date strings
+    :param target: "" target strings
+    :param context: a `validation_context.ValidationContext`
+    :return: dict with a boolean array per name in COVID19_COLUMN_CHECKS and their union, 'is_error'. For the
+        messages also 'parsed_dates': a dict that maps each date string to its date, None if invalid, and
+        'exp_target_end_ordinal': the expected target_end_date of each row, as a day number
+    """
+
+    from .cdc_io import _parse_date  # avoid circular imports
+
+    # 1. validate location (ISO-2 code)
+    is_invalid_location = ~location.isin(context.locations).to_numpy()
+
+    is_invalid_type = ~row_type.isin(["observed", "point", "quantile"]).to_numpy()
+
+    # 2. validate quantiles (stored as strings, checked against numeric)
+    is_quantile_row = (row_type == 'quantile').to_numpy()
+    invalid_quantiles = [quantile_str for quantile_str in quantile[is_quantile_row].unique()
+                         if _is_invalid_quantile(quantile_str, context)]
+    is_invalid_quantile = is_quantile_row & quantile.isin(invalid_quantiles).to_numpy()
+
+    # 3. validate forecast_date and target_end_date: parse each distinct string once, as a day number
+    parsed_dates = {date_str: _parse_date(date_str)
+                    for date_str in pd.unique(pd.concat([forecast_date, target_end_date]))}
+    date_ordinals = {date_str: date.toordinal() if date else -1 for date_str, date in parsed_dates.items()}
+    forecast_ordinal = forecast_date.map(date_ordinals).to_numpy(dtype=np.int64)
+    target_end_ordinal = target_end_date.map(date_ordinals).to_numpy(dtype=np.int64)
+    is_invalid_date = (forecast_ordinal < 0) | (target_end_ordinal < 0)
+
+    # 4. validate "__ week ahead" increment - must be an int
+    step_ahead_increments = {target_str: _step_ahead_increment(target_str, context) for target_str in target.unique()}
+    step_ahead_increment = target.map(lambda target_str: step_ahead_increments[target_str] or 0).to_numpy(dtype=np.int64)
+    is_int_target = target.map(lambda target_str: step_ahead_increments[target_str] is not None).to_numpy(dtype=bool)
+    is_invalid_target = ~is_invalid_date & ~is_int_target
+    is_dated = ~is_invalid_date & is_int_target
+
+    # 5.1 for x week ahead targets, weekday(target_end_date) should be a Sat. ordinal 1 (0001-01-01) is a Monday
+    is_not_saturday = is_dated & ((target_end_ordinal - 1) % 7 != 5)
+
+    # 5.3 Set expected target end date from forecast date, see `covid19_row_validator()`
+    forecast_weekday = (forecast_ordinal - 1) % 7
+    forecast_weekday = np.where(forecast_weekday == 6, 1, forecast_weekday + 2)  # Sun=1, Mon=2, ..., Sat=7
+    sat_forecast_ordinal = forecast_ordinal - forecast_weekday
+    sat_forecast_ordinal = np.where(np.isin(forecast_weekday, [1, 2]), sat_forecast_ordinal, sat_forecast_ordinal + 7)
+    exp_target_end_ordinal = sat_forecast_ordinal + 7 * step_ahead_increment
+    is_unexpected_date = is_dated & ~is_not_saturday & (target_end_ordinal != exp_target_end_ordinal)
+
+    checks = {'is_invalid_location': is_invalid_location, 'is_invalid_type': is_invalid_type,
+              'is_invalid_quantile': is_invalid_quantile, 'is_invalid_date': is_invalid_date,
+              'is_invalid_target': is_invalid_target, 'is_not_saturday': is_not_saturday,
+              'is_unexpected_date': is_unexpected_date}
+    checks['is_error'] = np.logical_or.reduce([checks[check] for check in COVID19_COLUMN_CHECKS])
+    checks['parsed_dates'] = parsed_dates
+    checks['exp_target_end_ordinal'] = exp_target_end_ordinal
+    return checks
+
+
+def _is_invalid_quantile(quantile, context):
+    """
+    `covid19_column_validator()` helper: the quantile check of `covid19_row_validator()` for one quantile string
+    """
+    try:
+        return float(quantile) not in context.quantiles
+    except ValueError:
+        return False  # ignore, caught by `json_io_dict_from_quantile_csv_file()`
+
+
+def _step_ahead_increment(target, context):
+    """
+    `covid19_row_validator()` and `covid19_column_validator()` helper: the "__ week ahead" increment of target as an
+    int, or None if not an int. valid targets are looked up in the context, others are parsed
+    """
+    step_ahead_increment = context.target_horizons.get(target)
+    if step_ahead_increment is not None:
+        return step_ahead_increment
+    try:
+        return int(target.split('wk ahead')[0].strip())
+    except ValueError:
+        return None
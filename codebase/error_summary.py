@@ -0,0 +1,127 @@
+"""
+Row-level validation errors, grouped so that one systematically wrong file does
+not produce one message per row.
+
+Row validators report errors as RowError: a str that is the usual
+"<message> row=<row>" text but that also keeps the message and the row apart.
+ErrorSummary collects error messages like a list but keeps only one entry per
+distinct row error message (i.e. per rule and key fields, e.g. the invalid
+location or the unexpected target_end_date), with a count and up to
+`max_samples` example rows. Other error messages are kept as they are.
+
+The number of example rows is set with VALIDATION_ERROR_SAMPLES (default 5).
+VALIDATION_ERROR_SAMPLES=all keeps the full list of messages, one per row. An
+invalid value falls back to the default, with a warning.
+"""
+
+# Standard modules
+import os
+
+
+DEFAULT_ERROR_SAMPLES = 5
+
+
+def _error_samples_from_environ():
+    error_samples = os.environ.get('VALIDATION_ERROR_SAMPLES', str(DEFAULT_ERROR_SAMPLES))
+    if error_samples.strip().lower() == 'all':
+        return None
+    try:
+        num_samples = int(error_samples)
+    except ValueError:
+        num_samples = 0
+    if num_samples < 1:
+        print(f"Warning: VALIDATION_ERROR_SAMPLES must be a positive number of example rows or 'all', "
+              f"not {error_samples!r}. Using {DEFAULT_ERROR_SAMPLES}.")
+        return DEFAULT_ERROR_SAMPLES
+    return num_samples
+
+
+ERROR_SAMPLES = _error_samples_from_environ()  # None: full list of messages
+
+
+class RowError(str):
+    """
+    purpose: an error message about one row, "<message> row=<row>"
+
+    params:
+    * message: the error, including its key fields and ending punctuation
+    * row: the raw row
+    """
+
+    def __new__(cls, message, row):
+        row_error = super().__new__(cls, f"{message} row={row}")
+        row_error.message = message
+        row_error.row = row
+        return row_error
+
+    def __reduce__(self):
+        # pickled with its message and row, e.g. in the results of worker processes
+        return (RowError, (self.message, self.row))
+
+
+class ErrorSummary:
+    """
+    purpose: collect error messages, grouping RowErrors by message (see module docstring)
+
+    params:
+    * max_samples: number of example rows kept per group
+    """
+
+    def __init__(self, max_samples=ERROR_SAMPLES):
+        self.max_samples = max_samples
+        self._entries = []  # [message or [RowError message, count, example rows]], in first seen order
+        self._row_error_entries = {}  # RowError message -> its entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self.messages())
+
+    def append(self, error_message):
+        if not isinstance(error_message, RowError):
+            self._entries.append(error_message)
+            return
+
+        entry = self._row_error_entries.get(error_message.message)
+        if entry is None:
+            entry = [error_message.message, 0, []]
+            self._row_error_entries[error_message.message] = entry
+            self._entries.append(entry)
+        entry[1] += 1
+        if len(entry[2]) < self.max_samples:
+            entry[2].append(error_message.row)
+
+    def extend(self, error_messages):
+        for error_message in error_messages:
+            self.append(error_message)
+
+    def messages(self):
+        """
+        :return: list of strings, one per error message or group of row errors. a row error that occurred once is
+            reported as is
+        """
+        return [entry if isinstance(entry, str) else _row_error_group_message(*entry) for entry in self._entries]
+
+
+def _row_error_group_message(message, count, rows):
+    if count == 1:
+        return str(RowError(message, rows[0]))
+
+    rows_text = "; ".join(f"row={row}" for row in rows)
+    more_text = f"; and {count - len(rows)} more" if count > len(rows) else ""
+    return f"{message.rstrip('.,')}. {count} rows, e.g. {rows_text}{more_text}"
+
+
+def summarize_errors(error_messages, max_samples=ERROR_SAMPLES):
+    """
+    :param error_messages: iterable of error messages (strings and RowErrors)
+    :param max_samples: number of example rows per group of row errors. None returns the full list
+    :return: list of error messages, grouped as described in the module docstring
+    """
+    if max_samples is None:
+        return list(error_messages)
+
+    error_summary = ErrorSummary(max_samples)
+    error_summary.extend(error_messages)
+    return error_summary.messages()
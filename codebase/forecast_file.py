@@ -0,0 +1,240 @@
+"""
+A forecast file loaded once and shared by every validation check:
+- the bytes are read and decoded once
+- csv.reader based checks get a fresh file-like object over the same text
+- pandas based checks share one DataFrame, parsed on first use
+
+Forecasts kept as Parquet or Arrow (IPC/Feather) files, or as in-memory Arrow
+tables, are loaded as an ArrowForecastFile instead, without going through csv
+text: the pandas based checks get the typed columns of the table, and the
+row-based checks get its rows already split into cells, see ArrowRows. The
+cells are still strings, which the row-based checks parse like the cells of a
+csv. Only the reading and tokenizing of csv text is skipped, so that the rules
+and error messages are exactly those of csv forecasts. These need the optional
+pyarrow package.
+"""
+
+# Standard modules
+import csv
+import hashlib
+import io
+import os
+
+# To list in requirements.txt
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for Parquet/Arrow forecasts
+    pa = feather = pq = None
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather')
+ARROW_ROWS_CHUNK_SIZE = 10000  # rows of an Arrow table converted to cells at a time
+
+
+class ForecastFile:
+    """
+    purpose: hold the decoded text of a forecast file and its parsed DataFrame
+
+    params:
+    * filepath: path of the forecast. Used for error messages and the filename checks
+    * text: optional file contents. If given, the file is not read from disk
+    """
+
+    def __init__(self, filepath, text=None):
+        self.filepath = filepath
+        if text is None:
+            with open(filepath, 'rb') as fp:
+                text = fp.read().decode('utf-8')
+        # universal newlines, i.e. the same text `open(filepath)` would give us
+        self.text = text.replace('\r\n', '\n').replace('\r', '\n')
+        self._df = None
+
+    def __repr__(self):
+        return f"ForecastFile({self.filepath!r})"
+
+    @property
+    def filename(self):
+        return os.path.basename(self.filepath)
+
+    def checksum(self):
+        """
+        :return: md5 hex digest of the file contents, as recorded for uploaded forecasts
+        """
+        return hashlib.md5(self.text.encode('utf-8')).hexdigest()
+
+    def csv_fp(self):
+        """
+        :return: a fresh file-like object over the decoded text, for csv.reader based validators
+        """
+        return io.StringIO(self.text)
+
+    @property
+    def df(self):
+        """
+        :return: the forecast as a DataFrame, parsed on first access and then reused
+        """
+        if self._df is None:
+            self._df = pd.read_csv(self.csv_fp())
+        return self._df
+
+
+class ArrowForecastFile(ForecastFile):
+    """
+    purpose: a forecast held as an Arrow table, with the interface of ForecastFile. See the module docstring
+
+    params:
+    * filepath: path of the forecast. Used for error messages and the filename checks
+    * table: optional pyarrow.Table of the forecast. If given, the file is not read from disk
+    """
+
+    def __init__(self, filepath, table=None):
+        _require_pyarrow()
+        self.filepath = filepath
+        self._file_bytes = None
+        if table is None:
+            with open(filepath, 'rb') as fp:
+                self._file_bytes = fp.read()
+            table = read_arrow_table(pa.BufferReader(self._file_bytes), filepath)
+        self.table = table
+        self._df = None
+
+    def __repr__(self):
+        return f"ArrowForecastFile({self.filepath!r})"
+
+    @property
+    def text(self):
+        raise AttributeError(f"{self!r} has no csv text, see csv_fp() and df")
+
+    def checksum(self):
+        """
+        :return: md5 hex digest of the file bytes, or of the table in the Arrow IPC format if it was given in memory
+        """
+        if self._file_bytes is None:
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, self.table.schema) as writer:
+                writer.write_table(self.table)
+            return hashlib.md5(sink.getvalue().to_pybytes()).hexdigest()
+        return hashlib.md5(self._file_bytes).hexdigest()
+
+    def csv_fp(self):
+        """
+        :return: fresh ArrowRows over the table, for csv.reader based validators, see csv_row_reader()
+        """
+        return ArrowRows(self.table)
+
+    @property
+    def df(self):
+        """
+        :return: the table as a DataFrame with its typed columns. Date and time columns are converted to strings, as
+            pd.read_csv() leaves them in a csv
+        """
+        if self._df is None:
+            self._df = _with_string_dates(self.table).to_pandas()
+        return self._df
+
+
+class ArrowRows:
+    """
+    The rows of an Arrow table as csv.reader gives the rows of a csv file: lists of strings, the header first. Cells
+    are converted a chunk of rows at a time. Like a file, it can be used as a context manager.
+
+    :param table: a pyarrow.Table
+    :param chunk_size: number of rows converted at a time
+    """
+
+    def __init__(self, table, chunk_size=ARROW_ROWS_CHUNK_SIZE):
+        self.table = table
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        yield list(self.table.column_names)
+        for batch in self.table.to_batches(max_chunksize=self.chunk_size):
+            yield from map(list, zip(*[_cell_strings(column) for column in batch.columns]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+
+def csv_row_reader(csv_fp):
+    """
+    :param csv_fp: an open csv file-like object, or ArrowRows
+    :return: an iterator of the rows as lists of strings, the header first
+    """
+    if isinstance(csv_fp, ArrowRows):
+        return iter(csv_fp)
+    return csv.reader(csv_fp, delimiter=',')
+
+
+def is_arrow_forecast(filepath):
+    """
+    :return: True if filepath is a Parquet or Arrow file, by its suffix
+    """
+    return str(filepath).lower().endswith(PARQUET_SUFFIXES + ARROW_SUFFIXES)
+
+
+def read_arrow_table(source, filepath):
+    """
+    :param source: a path or a pyarrow file-like object of a Parquet or Arrow (IPC/Feather) file
+    :param filepath: path of the forecast, whose suffix tells the format
+    :return: the forecast as a pyarrow.Table
+    """
+    _require_pyarrow()
+    if str(filepath).lower().endswith(PARQUET_SUFFIXES):
+        return pq.read_table(source)
+    return feather.read_table(source)
+
+
+def as_forecast_file(forecast):
+    """
+    :param forecast: a ForecastFile (or ArrowForecastFile) or a path to a forecast csv, Parquet or Arrow file
+    :return: a ForecastFile, loading it from disk if a path was given
+    """
+    if isinstance(forecast, ForecastFile):
+        return forecast
+    if is_arrow_forecast(forecast):
+        return ArrowForecastFile(forecast)
+    return ForecastFile(forecast)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet and Arrow forecasts need the pyarrow package: pip install pyarrow")
+
+
+def _cell_strings(column):
+    """
+    :param column: a pyarrow.Array
+    :return: list of its values as csv cells: floats as repr() writes them, so that they parse back to the same
+        number, nulls as ''. Each distinct value is converted once
+    """
+    encoded = column.dictionary_encode()
+    distinct_values = encoded.dictionary
+    if pa.types.is_floating(distinct_values.type):
+        cells = [repr(value) for value in distinct_values.to_pylist()]
+    else:
+        if not pa.types.is_string(distinct_values.type):
+            distinct_values = distinct_values.cast(pa.string())
+        cells = distinct_values.to_pylist()
+    cells = np.array(cells + [''], dtype=object)  # the last one for nulls
+    return cells[encoded.indices.fill_null(len(cells) - 1).to_numpy()].tolist()
+
+
+def _with_string_dates(table):
+    """
+    :return: table with its date and timestamp columns cast to strings
+    """
+    for column_idx, field in enumerate(table.schema):
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            table = table.set_column(column_idx, field.name, table.column(column_idx).cast(pa.string()))
+    return table
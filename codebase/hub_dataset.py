@@ -0,0 +1,194 @@
+"""
+Validation of many forecast files in one pass over a single table, for full-hub
+audits with `check_formatting(..., dataset=True)`.
+
+1. the files are loaded into one table of string columns, with the file and the
+   model of each row as categorical columns. Files with the same header are
+   parsed together, in one `pd.read_csv()` call
+2. every check runs once, vectorized over the whole table, as a boolean mask
+   over the rows:
+   - the COVID-19 column checks: locations, types, quantiles, dates and weeks
+     ahead (`covid19.covid19_column_checks()`)
+   - target names, quantiles in [0, 1], finite values, written as plain numbers
+   - per (file, target, location): unique quantiles with non-decreasing values,
+     and exactly one point prediction
+   - values below the location population
+   - one forecast_date per file, matching the file name, and the file name
+     matching its model folder
+   and the masks are split back per file with the file column
+3. files that pass every check have no errors. Files that fail a check, and
+   files that cannot be loaded safely in the table (e.g. with quoted fields,
+   blank lines or a header of their own that is invalid), are checked again one
+   by one, which gives exactly the error messages of the per-file checks
+
+The non-negativity warnings of `non_negative_forecasts.non_negative_values()`
+are worked out for the files in the table as well.
+"""
+
+# Standard modules
+import io
+import os
+
+# To list in requirements.txt
+import numpy as np
+import pandas as pd
+
+# Local modules
+import codebase.project_variables as project
+from .cdc_io import _FLOAT_RE
+from .covid19 import covid19_column_checks
+from .quantile_io import _validate_header, invalid_quantile_group_ids
+from .validation_context import get_validation_context, location_populations
+from .validation_functions.forecast_filename import validate_forecast_file_name
+
+ADDL_REQ_COLUMNS = ['forecast_date', 'target_end_date']  # as required by `covid19.validate_quantile_csv_file()`
+TABLE_COLUMNS = list(project.REQUIRED_COLUMNS) + ADDL_REQ_COLUMNS
+
+
+def load_forecast_table(forecast_tasks):
+    """
+    purpose: load forecast files into one table, see the module docstring
+
+    params:
+    * forecast_tasks: list of (filepath, forecast_file_path, text), where forecast_file_path is the model folder
+
+    returns: (table, loaded_tasks, other_tasks) where table has the TABLE_COLUMNS as strings, and 'file' and
+             'model': categoricals of the filepath and model folder of each row. loaded_tasks are the tasks in the
+             table, in the order of the 'file' categories. other_tasks could not be loaded in the table
+    """
+    header_groups = {}  # header line -> [(task, body, number of rows)]
+    other_tasks = []
+    for forecast_task in forecast_tasks:
+        text = forecast_task[2].replace('\r\n', '\n').replace('\r', '\n')  # as in ForecastFile
+        header_line, _, body = text.partition('\n')
+        if body and not body.endswith('\n'):
+            body += '\n'
+        num_rows = body.count('\n')
+        # csv.reader and pd.read_csv() agree on these files, and each line is one row
+        if (not num_rows or '"' in text or '\n\n' in text or
+                body.count(',') != header_line.count(',') * num_rows):
+            other_tasks.append(forecast_task)
+        else:
+            header_groups.setdefault(header_line, []).append((forecast_task, body, num_rows))
+
+    tables, loaded_tasks, file_rows = [], [], []
+    for header_line, group in header_groups.items():
+        group_tasks = [forecast_task for forecast_task, _, _ in group]
+        try:
+            _validate_header(header_line.split(','), ADDL_REQ_COLUMNS)
+            table = pd.read_csv(io.StringIO(header_line + '\n' + ''.join(body for _, body, _ in group)),
+                                dtype=str, na_filter=False, usecols=TABLE_COLUMNS)
+        except (RuntimeError, ValueError):  # invalid header, or a row with more fields than the header
+            other_tasks.extend(group_tasks)
+            continue
+        num_rows = [num_rows for _, _, num_rows in group]
+        if len(table) != sum(num_rows):
+            other_tasks.extend(group_tasks)
+            continue
+        tables.append(table[TABLE_COLUMNS])
+        loaded_tasks.extend(group_tasks)
+        file_rows.extend(num_rows)
+
+    if tables:
+        table = pd.concat(tables, ignore_index=True)
+    else:
+        table = pd.DataFrame({column: pd.Series(dtype=str) for column in TABLE_COLUMNS})
+    file_codes = np.repeat(np.arange(len(loaded_tasks)), file_rows)
+    table['file'] = pd.Categorical.from_codes(file_codes, categories=[filepath for filepath, _, _ in loaded_tasks])
+    models = pd.unique(np.array([folder for _, folder, _ in loaded_tasks], dtype=object))
+    model_codes = pd.Index(models).get_indexer([folder for _, folder, _ in loaded_tasks])
+    table['model'] = pd.Categorical.from_codes(model_codes[file_codes], categories=models)
+    return table, loaded_tasks, other_tasks
+
+
+def failing_files(table, loaded_tasks, context=None):
+    """
+    purpose: run the checks of the module docstring over the whole table
+
+    params:
+    * table, loaded_tasks: as returned by load_forecast_table()
+    * context: the `validation_context.ValidationContext` to validate against. None for the one of the hub config
+
+    returns: boolean array, True for the files (in loaded_tasks order) that fail a check
+    """
+    context = context or get_validation_context()
+    file_codes = table['file'].cat.codes.to_numpy()
+    row_type = table['type']
+    is_point_row = row_type.isin(['point', 'observed']).to_numpy()
+    is_quantile_row = (row_type == 'quantile').to_numpy()
+    quantiles = pd.to_numeric(table['quantile'], errors='coerce').to_numpy(dtype=float)
+    values = pd.to_numeric(table['value'], errors='coerce').to_numpy(dtype=float)
+
+    is_error = covid19_column_checks(table['location'], row_type, table['quantile'], table['forecast_date'],
+                                     table['target_end_date'], table['target'], context)['is_error']
+    is_error |= ~table['target'].isin(context.target_names).to_numpy()
+    # numbers in the plain form `cdc_io._parse_value()` and pd.to_numeric() both parse the same way
+    is_error |= ~table['value'].str.match(_FLOAT_RE.pattern).to_numpy(dtype=bool)
+    is_error |= is_quantile_row & ~table['quantile'].str.match(_FLOAT_RE.pattern).to_numpy(dtype=bool)
+    with np.errstate(invalid='ignore'):
+        is_error |= is_quantile_row & ~((0 <= quantiles) & (quantiles <= 1))
+    is_error |= ~np.isfinite(values)
+
+    # per (file, target, location): the quantile group, and the number of point predictions
+    group_ids = table.groupby([file_codes, table['target'], table['location']], sort=False).ngroup().to_numpy()
+    invalid_group_ids = invalid_quantile_group_ids(group_ids[is_quantile_row], quantiles[is_quantile_row],
+                                                   values[is_quantile_row])
+    is_error |= np.isin(group_ids, list(invalid_group_ids))
+    num_points = np.bincount(group_ids, weights=is_point_row)
+    is_error |= num_points[group_ids] != 1
+
+    # population bounds, see `test_formatting.get_num_invalid_predictions()`
+    with np.errstate(invalid='ignore'):
+        is_error |= values >= location_populations(context, table['location'])
+
+    # one forecast_date per file, the date in the file name
+    file_dates = np.array([os.path.basename(filepath)[:10] for filepath, _, _ in loaded_tasks], dtype=object)
+    is_error |= table['forecast_date'].to_numpy(dtype=object) != file_dates[file_codes]
+
+    is_failing = np.bincount(file_codes, weights=is_error, minlength=len(loaded_tasks)) > 0
+    is_failing |= np.array([validate_forecast_file_name(filepath, folder)[0] for filepath, folder, _ in loaded_tasks],
+                           dtype=bool)
+    return is_failing
+
+
+def value_warnings(table, loaded_tasks):
+    """
+    purpose: the warnings of `non_negative_forecasts.non_negative_values()` for every file in the table
+
+    returns: dict that maps the filepath of each file to its warning, [] if none, as non_negative_values() returns it
+    """
+    file_codes = table['file'].cat.codes.to_numpy()
+    values = pd.to_numeric(table['value'], errors='coerce').to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        has_negative = np.bincount(file_codes, weights=values < 0, minlength=len(loaded_tasks)) > 0
+        has_non_integer = np.bincount(file_codes, weights=values != np.round(values), minlength=len(loaded_tasks)) > 0
+    warnings = {}
+    for (filepath, _, _), negative, non_integer in zip(loaded_tasks, has_negative, has_non_integer):
+        result = [": negative value in forecast"] * negative + [" : non-integer value in forecast"] * non_integer
+        warnings[filepath] = 'Warnings' + ''.join(result) if result else []
+    return warnings
+
+
+def check_forecast_dataset(forecast_tasks, check_file, context=None):
+    """
+    purpose: check forecast files in one pass over a single table, see the module docstring
+
+    params:
+    * forecast_tasks: list of (filepath, forecast_file_path, text)
+    * check_file: function (filepath, forecast_file_path, text) -> list of error messages, that checks one file,
+      e.g. `test_formatting.check_forecast_file()`. Run on the files that fail a check or are not in the table
+    * context: as passed to failing_files()
+
+    returns: (errors, warnings): errors is a list of the error messages of each file, in forecast_tasks order.
+             warnings maps the filepaths of the files in the table to their warnings, see value_warnings()
+    """
+    table, loaded_tasks, other_tasks = load_forecast_table(forecast_tasks)
+    is_failing = failing_files(table, loaded_tasks, context)
+    print(f"Checked {len(loaded_tasks)} forecasts in one table of {len(table)} rows: {int(is_failing.sum())} to "
+          f"check one by one, with {len(other_tasks)} that could not be loaded in the table.")
+
+    file_errors = {filepath: [] for filepath, _, _ in loaded_tasks}
+    recheck_tasks = [forecast_task for forecast_task, failing in zip(loaded_tasks, is_failing) if failing]
+    for filepath, forecast_file_path, text in recheck_tasks + other_tasks:
+        file_errors[filepath] = check_file(filepath, forecast_file_path, text)
+    return [file_errors[filepath] for filepath, _, _ in forecast_tasks], value_warnings(table, loaded_tasks)
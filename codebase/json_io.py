@@ -0,0 +1,157 @@
+"""
+A compact, columnar form of the predictions of a quantile forecast.
+
+`json_io_dict_from_quantile_csv_file()` gives one Python dict per point row and
+per quantile group, with nested dicts and lists of numbers. QuantilePredictions
+holds the same predictions in a few flat NumPy arrays instead:
+
+- per prediction: the unit and target (as codes into lists of the distinct names),
+  whether it is a point prediction, and where its numbers start in the flat arrays
+- per number: the quantile (NaN for point predictions) and the value, and whether
+  each was an int in the csv, so they are written back as they were parsed
+
+`quantile_io.iter_quantile_csv_errors()` builds them from the rows it keeps while
+it validates a forecast, see its `on_predictions`. `write_json_io()` writes them
+in the Zoltar JSON IO format a chunk of predictions at a time, so the upload
+never builds the JSON IO dict of a whole forecast, see
+`zoltar_scripts.forecast_upload`.
+"""
+
+# Standard modules
+import json
+
+# To list in requirements.txt
+import numpy as np
+
+# Local modules
+import codebase.project_variables as project
+
+JSON_IO_CHUNK_SIZE = 1000  # predictions encoded at a time by write_json_io()
+
+
+class QuantilePredictions:
+    """
+    The point and quantile predictions of a forecast, in arrays. See the module docstring.
+    """
+
+    def __init__(self, unit_names, target_names, unit_codes, target_codes, is_point, offsets, quantiles,
+                 quantile_is_int, values, value_is_int):
+        self.unit_names = unit_names  # list of str
+        self.target_names = target_names  # ""
+        self.unit_codes = unit_codes  # per prediction: index into unit_names
+        self.target_codes = target_codes  # per prediction: index into target_names
+        self.is_point = is_point  # per prediction: bool
+        self.offsets = offsets  # per prediction + 1: the numbers of prediction i are [offsets[i], offsets[i + 1])
+        self.quantiles = quantiles  # per number: float, NaN for point predictions
+        self.quantile_is_int = quantile_is_int  # per number: bool
+        self.values = values  # per number: float
+        self.value_is_int = value_is_int  # ""
+
+    def __len__(self):
+        return len(self.is_point)
+
+    @property
+    def nbytes(self):
+        """
+        :return: the size of the arrays, in bytes
+        """
+        return sum(array.nbytes for array in (self.unit_codes, self.target_codes, self.is_point, self.offsets,
+                                               self.quantiles, self.values, self.quantile_is_int, self.value_is_int))
+
+    @classmethod
+    def from_rows(cls, unit_names, target_names, unit_codes, target_codes, is_point, quantiles, quantile_is_int,
+                  values, value_is_int):
+        """
+        Builds the predictions of the rows of a forecast that passed validation, in the order of
+        `json_io_dict_from_quantile_csv_file()`: the rows are ordered by (target, location, is_point) and the quantile
+        rows of each (target, location) are one prediction.
+
+        :param unit_names: list of the distinct locations
+        :param target_names: list of the distinct targets
+        :param unit_codes: per row: index into unit_names
+        :param target_codes: per row: index into target_names
+        :param is_point: per row: bool
+        :param quantiles: per row: float, NaN for point rows
+        :param quantile_is_int: per row: bool
+        :param values: per row: float
+        :param value_is_int: per row: bool
+        """
+        # order rows by (target_name, location, is_point_row), stably, like `_prediction_dicts_for_quantile_rows()`
+        unit_ranks = np.argsort(np.argsort(np.array(unit_names, dtype=object)))
+        target_ranks = np.argsort(np.argsort(np.array(target_names, dtype=object)))
+        row_order = np.lexsort((is_point, unit_ranks[unit_codes], target_ranks[target_codes]))
+        unit_codes, target_codes, is_point = unit_codes[row_order], target_codes[row_order], is_point[row_order]
+
+        # each point row is a prediction. quantile rows of the same (target, location) are one prediction
+        is_new_prediction = np.ones(len(row_order), dtype=bool)
+        is_new_prediction[1:] = (is_point[1:] | (unit_codes[1:] != unit_codes[:-1]) |
+                                 (target_codes[1:] != target_codes[:-1]) | (is_point[:-1] != is_point[1:]))
+        starts = np.flatnonzero(is_new_prediction)
+        return cls(unit_names, target_names, unit_codes[starts], target_codes[starts], is_point[starts],
+                   np.append(starts, len(row_order)).astype(np.int64), quantiles[row_order],
+                   quantile_is_int[row_order], values[row_order], value_is_int[row_order])
+
+    def iter_prediction_dicts(self, start=0, stop=None):
+        """
+        :return: a generator of the prediction dicts of predictions [start, stop), as in a JSON IO dict
+        """
+        quantiles = _JsonNumbers(self.quantiles, self.quantile_is_int)
+        values = _JsonNumbers(self.values, self.value_is_int)
+        offsets = self.offsets
+        for prediction_idx in range(start, len(self) if stop is None else min(stop, len(self))):
+            unit = self.unit_names[self.unit_codes[prediction_idx]]
+            target = self.target_names[self.target_codes[prediction_idx]]
+            number_start, number_stop = offsets[prediction_idx], offsets[prediction_idx + 1]
+            if self.is_point[prediction_idx]:
+                yield {'unit': unit,
+                       'target': target,
+                       'class': project.POINT_PREDICTION_CLASS,  # PointPrediction
+                       'prediction': {
+                           'value': values[number_start]}}
+            else:
+                yield {'unit': unit,
+                       'target': target,
+                       'class': project.QUANTILE_PREDICTION_CLASS,  # QuantileDistribution
+                       'prediction': {
+                           'quantile': quantiles[number_start:number_stop],
+                           'value': values[number_start:number_stop]}}
+
+    def to_json_io_dict(self):
+        """
+        :return: the predictions as a JSON IO dict, as `json_io_dict_from_quantile_csv_file()` returns it
+        """
+        return {'meta': {}, 'predictions': list(self.iter_prediction_dicts())}
+
+
+def write_json_io(predictions, fp, chunk_size=JSON_IO_CHUNK_SIZE):
+    """
+    Writes predictions in the Zoltar JSON IO format, `chunk_size` predictions at a time. The text is the same as
+    `json.dumps(predictions.to_json_io_dict())`.
+
+    :param predictions: a QuantilePredictions
+    :param fp: a text file-like object, e.g. an open file
+    :param chunk_size: number of predictions encoded at a time
+    """
+    fp.write('{"meta": {}, "predictions": [')
+    for chunk_start in range(0, len(predictions), chunk_size):
+        if chunk_start:
+            fp.write(', ')
+        fp.write(', '.join(json.dumps(prediction_dict) for prediction_dict
+                           in predictions.iter_prediction_dicts(chunk_start, chunk_start + chunk_size)))
+    fp.write(']}')
+
+
+class _JsonNumbers:
+    """
+    `QuantilePredictions.iter_prediction_dicts()` helper: indexing gives the numbers as Python ints and floats
+    """
+
+    def __init__(self, floats, is_int):
+        self.floats = floats
+        self.is_int = is_int
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [int(number) if is_int else number
+                    for number, is_int in zip(self.floats[index].tolist(), self.is_int[index].tolist())]
+        return int(self.floats[index]) if self.is_int[index] else float(self.floats[index])
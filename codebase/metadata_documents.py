@@ -0,0 +1,181 @@
+"""
+Parsed metadata files, each parsed once and shared by all the metadata checks:
+the schema validation, the hub rules and the duplicate model name/abbreviation
+index.
+
+A file is composed into a YAML node tree once, with the libyaml C parser when
+PyYAML was built with it, and two documents are constructed from that tree:
+- `strings`: every scalar as a string, as yaml.BaseLoader gives it, so that
+  e.g. 'True' can be told apart from 'true' by the hub rules
+- `typed`: scalars resolved to bools, ints, dates..., as the schema validation
+  expects them. These follow pykwalify's own (ruamel, YAML 1.2) loader: its
+  implicit resolvers, its ints (no leading-zero octals or sexagesimals) and
+  its error on duplicate keys
+"""
+
+# Standard modules
+import collections
+import io
+
+# To list in requirements.txt
+import ruamel.yaml.resolver
+import yaml
+from yaml.constructor import BaseConstructor, ConstructorError, SafeConstructor
+from yaml.nodes import MappingNode
+from yaml.resolver import BaseResolver
+
+try:
+    from yaml import CParser as _Parser  # libyaml
+    _COMPOSERS = ()  # the C parser composes the node tree itself
+except ImportError:
+    from yaml.parser import Parser as _Parser
+    from yaml.composer import Composer
+    _COMPOSERS = (Composer,)
+
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+
+MetadataDocument = collections.namedtuple('MetadataDocument', ['text', 'strings', 'typed'])
+
+
+class _Yaml12Resolver(BaseResolver):
+    pass
+
+
+# the YAML 1.2 implicit resolvers of ruamel, which pykwalify loads its files with
+for _versions, _tag, _regexp, _first in ruamel.yaml.resolver.implicit_resolvers:
+    if (1, 2) in _versions:
+        _Yaml12Resolver.add_implicit_resolver(_tag, _regexp, _first)
+
+
+class _Yaml12Constructor(SafeConstructor):
+    """
+    PyYAML's SafeConstructor with the YAML 1.2 differences of ruamel's safe constructor
+    """
+
+    def construct_yaml_int(self, node):
+        # as ruamel does for YAML 1.2: 0o (but not 0) starts an octal, and ':' is not sexagesimal
+        value = self.construct_scalar(node).replace('_', '')
+        sign = -1 if value[0] == '-' else 1
+        if value[0] in '+-':
+            value = value[1:]
+        for prefix, base in (('0b', 2), ('0x', 16), ('0o', 8)):
+            if value.startswith(prefix):
+                return sign * int(value[2:], base)
+        return sign * int(value)
+
+    def construct_mapping(self, node, deep=False):
+        if isinstance(node, MappingNode):
+            # before the merge keys are flattened into the mapping, which may override their keys
+            keys = set()
+            for key_node, _ in node.value:
+                if key_node.tag == MERGE_TAG:
+                    continue
+                key = self.construct_object(key_node, deep=True)
+                try:
+                    is_duplicate = key in keys
+                except TypeError:  # unhashable, reported by SafeConstructor
+                    continue
+                if is_duplicate:
+                    raise ConstructorError("while constructing a mapping", node.start_mark,
+                                           f"found duplicate key {key!r}", key_node.start_mark)
+                keys.add(key)
+        return super().construct_mapping(node, deep)
+
+
+_Yaml12Constructor.add_constructor('tag:yaml.org,2002:int', _Yaml12Constructor.construct_yaml_int)
+
+
+if _COMPOSERS:
+    from yaml.reader import Reader
+    from yaml.scanner import Scanner
+
+    class _MetadataLoader(Reader, Scanner, _Parser, *_COMPOSERS, _Yaml12Constructor, _Yaml12Resolver):
+        def __init__(self, stream):
+            Reader.__init__(self, stream)
+            Scanner.__init__(self)
+            _Parser.__init__(self)
+            Composer.__init__(self)
+            _Yaml12Constructor.__init__(self)
+            _Yaml12Resolver.__init__(self)
+else:
+    class _MetadataLoader(_Parser, _Yaml12Constructor, _Yaml12Resolver):
+        def __init__(self, stream):
+            _Parser.__init__(self, stream)
+            _Yaml12Constructor.__init__(self)
+            _Yaml12Resolver.__init__(self)
+
+
+def parse_metadata(text, name=None):
+    """
+    purpose: parse a metadata file once into its two documents, see the module docstring
+    params:
+        text: contents of the metadata file
+        name: name of the file in the parse error messages. None for '<file>'
+    returns: a MetadataDocument. raises yaml.YAMLError if the text is not valid YAML
+    """
+    loader = _MetadataLoader(_named_stream(text, name))
+    try:
+        try:
+            node = loader.get_single_node()
+        except yaml.YAMLError:
+            if not _COMPOSERS:
+                # parsed again in Python for the error, so that the messages are PyYAML's rather than libyaml's
+                yaml.load(_named_stream(text, name), Loader=yaml.BaseLoader)
+            raise
+        if node is None:  # empty file
+            return MetadataDocument(text, None, None)
+        # the strings first: SafeConstructor flattens merge keys ('<<') in the node tree
+        strings = BaseConstructor().construct_document(node)
+        typed = loader.construct_document(node)
+    finally:
+        loader.dispose()
+    return MetadataDocument(text, strings, typed)
+
+
+def _named_stream(text, name):
+    stream = io.StringIO(text)
+    if name is not None:
+        stream.name = name
+    return stream
+
+
+class MetadataDocuments:
+    """
+    purpose: cache of parsed metadata files, by file path. A file is read and parsed on first use only, and
+        parse errors are cached too
+    """
+
+    def __init__(self):
+        self._documents = {}  # filepath -> MetadataDocument or yaml.YAMLError
+
+    def get(self, filepath, text=None):
+        """
+        purpose: the parsed metadata file
+        params:
+            filepath: path of the metadata file
+            text: optional contents of the file, e.g. downloaded. If given, filepath is only used as the cache key
+                and is parsed again if the cached text differs
+        returns: a MetadataDocument. raises yaml.YAMLError if the file is not valid YAML
+        """
+        document = self._documents.get(filepath)
+        if document is None or (text is not None and document.text != text):
+            read_from_file = text is None
+            if read_from_file:
+                with open(filepath, 'r') as stream:
+                    text = stream.read()
+            try:
+                document = parse_metadata(text, filepath if read_from_file else None)
+            except yaml.YAMLError as exc:
+                exc.text = text
+                document = exc
+            self._documents[filepath] = document
+        if isinstance(document, yaml.YAMLError):
+            raise document
+        return document
+
+    def clear(self):
+        self._documents.clear()
+
+
+# the cache of this process
+metadata_documents = MetadataDocuments()
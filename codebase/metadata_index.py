@@ -0,0 +1,68 @@
+"""
+Which models have a metadata file in the hub, from one listing of the
+model-metadata folder: either a local checkout of the hub or its git tree, in
+two GitHub API calls. Existence questions are then answered from the
+in-memory set. If GitHub truncates the listing of the folder, the models that
+are asked about and not listed are looked up one by one.
+"""
+
+# Standard modules
+import os
+
+# To list in requirements.txt
+from github import UnknownObjectException
+
+METADATA_DIR = 'model-metadata'
+
+
+def find_hub_checkout(paths=('.', '..')):
+    """
+    :param paths: candidate hub roots, e.g. the working directory and the parent of this submodule
+    :return: the path of a local hub checkout, i.e. HUB_CHECKOUT or the first of paths with a model-metadata
+        folder. None if there is none
+    """
+    if os.environ.get('HUB_CHECKOUT'):
+        return os.environ['HUB_CHECKOUT']
+    return next((path for path in paths if os.path.isdir(os.path.join(path, METADATA_DIR))), None)
+
+
+def existing_metadata_names(repo=None, checkout=None, model_names=()):
+    """
+    purpose: list the model-metadata folder once
+
+    params:
+    * repo: a github Repository, listed on its default branch. only used if checkout is None
+    * checkout: path of a local hub checkout, see `find_hub_checkout()`
+    * model_names: the names that will be asked about. those that are not in a truncated listing are looked up
+      one by one
+
+    returns: set of model names (e.g. 'teamA-modelA') that have a model-metadata/<name>.yml file
+    """
+    if checkout is not None:
+        file_names = os.listdir(os.path.join(checkout, METADATA_DIR))
+    else:
+        # the git trees API lists a whole folder, up to its size limit. the contents API lists at most 1000 files
+        root_tree = repo.get_git_tree(repo.default_branch, recursive=False)
+        metadata_tree = next((element for element in root_tree.tree
+                              if element.path == METADATA_DIR and element.type == 'tree'), None)
+        if metadata_tree is None:  # no model-metadata folder
+            file_names = []
+        else:
+            metadata_listing = repo.get_git_tree(metadata_tree.sha, recursive=False)
+            file_names = [element.path for element in metadata_listing.tree]
+            if metadata_listing.raw_data.get('truncated'):
+                print(f"Warning: the listing of {METADATA_DIR} is truncated, looking up the metadata of "
+                      f"{len(set(model_names))} model(s) one by one.")
+                listed_file_names = set(file_names)
+                file_names.extend(f"{model_name}.yml" for model_name in sorted(set(model_names))
+                                  if f"{model_name}.yml" not in listed_file_names and
+                                  _has_metadata_file(repo, model_name))
+    return {file_name[:-len('.yml')] for file_name in file_names if file_name.endswith('.yml')}
+
+
+def _has_metadata_file(repo, model_name):
+    try:
+        repo.get_contents(f"{METADATA_DIR}/{model_name}.yml", ref=repo.default_branch)
+    except UnknownObjectException:
+        return False
+    return True
@@ -0,0 +1,62 @@
+"""
+Download of the files changed in a pull request: concurrently, over one pooled
+HTTP session, and into memory rather than into a folder on disk.
+"""
+
+# Standard modules
+from concurrent.futures import ThreadPoolExecutor
+
+# To list in requirements.txt
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_TIMEOUT = 30  # seconds
+DOWNLOAD_RETRIES = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # transient errors, retried like failed connections
+
+
+def http_session(pool_size=DOWNLOAD_WORKERS, token=None):
+    """
+    :param pool_size: number of connections kept open per host, i.e. the number of concurrent downloads
+    :param token: optional GitHub token, sent with every request
+    :return: a requests.Session whose connections are reused across downloads. failed connections and responses
+        with a RETRY_STATUSES status are retried DOWNLOAD_RETRIES times, with an exponential backoff
+    """
+    session = requests.Session()
+    retries = Retry(total=DOWNLOAD_RETRIES, backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+                    raise_on_status=False)  # the last response is returned, for raise_for_status()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if token is not None:
+        session.headers['Authorization'] = f"token {token}"
+    return session
+
+
+def download_files(urls, workers=DOWNLOAD_WORKERS, session=None, timeout=DOWNLOAD_TIMEOUT):
+    """
+    purpose: download urls with a bounded pool of threads sharing one session
+
+    params:
+    * urls: list of urls, e.g. the raw_url of changed files
+    * workers: maximum number of concurrent downloads
+    * session: requests.Session to use. a new `http_session()` by default
+    * timeout: per request timeout, in seconds
+
+    returns: list of the contents (bytes) of each url, in urls order. Raises requests.HTTPError
+             if a download fails
+    """
+    if not urls:
+        return []
+    if session is None:
+        session = http_session(pool_size=workers)
+
+    def download(url):
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+        return list(executor.map(download, urls))
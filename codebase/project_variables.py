@@ -4,26 +4,64 @@ Collection of global variables used as inputs to validation functions
   This helps prevent circular imports (between quantile_io and cdc_io)
   and more useful to see all the project-specific parts in one place
 
+The variables that come from the hub config (project_config, FORECAST_WEEK_DAY,
+HORIZONS, CODES, VALID_TARGET_NAMES, VALID_QUANTILES, CONFIG_HASH) are loaded lazily, on
+first access, so importing this module never touches the network.
+  The hub files are taken from, in order:
+  - an explicit local path, set with `configure()` or the HUB_PROJECT_CONFIG /
+    HUB_LOCATIONS environment variables
+  - a cached copy in HUB_CONFIG_CACHE_DIR younger than HUB_CONFIG_TTL seconds (a
+    day by default, also if the value is invalid)
+  - a fresh download from the hub repository, which refreshes the cache
+  With HUB_OFFLINE=true nothing is downloaded and a cached copy of any age is used.
+
 @author: kaths
 """
 import pandas as pd
 import json
-import requests 
-
-# Get hub config
-config = requests.get('https://raw.githubusercontent.com/epiforecasts/covid19-forecast-hub-europe/main/project-config.json')
-project_config = json.loads(config.text)
-
-## covid19.py
-FORECAST_WEEK_DAY = project_config['forecast_week_day']
-HORIZONS = project_config['horizon']['values']
-CODES = pd.read_csv('https://raw.githubusercontent.com/epiforecasts/covid19-forecast-hub-europe/main/data-locations/locations_eu.csv')
-VALID_TARGET_NAMES = [f"{_} wk ahead {target_variable}" \
-                      for _ in HORIZONS \
-                      for target_variable in project_config['target_variables']]
-VALID_QUANTILES = project_config['forecast_type']['quantiles']
-
-## quantile_io.py 
+import io
+import os
+import time
+import hashlib
+import requests
+
+# Hub files
+HUB_RAW_URL = 'https://raw.githubusercontent.com/epiforecasts/covid19-forecast-hub-europe/main/'
+PROJECT_CONFIG_URL = HUB_RAW_URL + 'project-config.json'
+LOCATIONS_URL = HUB_RAW_URL + 'data-locations/locations_eu.csv'
+
+# Local copies and cache settings
+DEFAULT_CONFIG_CACHE_TTL = 24 * 60 * 60  # seconds
+
+
+def _config_cache_ttl_from_environ():
+    config_cache_ttl = os.environ.get('HUB_CONFIG_TTL', str(DEFAULT_CONFIG_CACHE_TTL))
+    try:
+        seconds = float(config_cache_ttl)
+    except ValueError:
+        seconds = -1
+    if not seconds >= 0:  # also NaN
+        print(f"Warning: HUB_CONFIG_TTL must be a number of seconds, not {config_cache_ttl!r}. "
+              f"Using {DEFAULT_CONFIG_CACHE_TTL}.")
+        return DEFAULT_CONFIG_CACHE_TTL
+    return seconds
+
+
+CONFIG_CACHE_DIR = os.environ.get('HUB_CONFIG_CACHE_DIR',
+                                  os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                               'covid19-forecast-hub-europe'))
+CONFIG_CACHE_TTL = _config_cache_ttl_from_environ()  # seconds
+OFFLINE = os.environ.get('HUB_OFFLINE', '').lower() in ('1', 'true', 'yes')
+DOWNLOAD_TIMEOUT = 30  # seconds
+
+_local_paths = {'project-config.json': os.environ.get('HUB_PROJECT_CONFIG'),
+                'locations_eu.csv': os.environ.get('HUB_LOCATIONS')}
+
+# Names that are filled in by _load_config_variables() on first access
+_CONFIG_VARIABLES = ('project_config', 'FORECAST_WEEK_DAY', 'HORIZONS', 'CODES', 'VALID_TARGET_NAMES',
+                     'VALID_QUANTILES', 'CONFIG_HASH')
+
+## quantile_io.py
 BIN_DISTRIBUTION_CLASS = 'bin'
 NAMED_DISTRIBUTION_CLASS = 'named'
 POINT_PREDICTION_CLASS = 'point'
@@ -43,3 +81,130 @@ CDC_CSV_HEADER = ['location', 'target', 'type', 'unit', 'bin_start_incl', 'bin_e
 SEASON_START_EW_NUMBER = 30
 
 
+def configure(config_path=None, locations_path=None):
+    """
+    purpose: use local copies of the hub files instead of downloading them. Config
+             variables that were already loaded are reloaded on next access.
+
+    params:
+    * config_path: path to project-config.json
+    * locations_path: path to locations_eu.csv
+    """
+    if config_path is not None:
+        _local_paths['project-config.json'] = config_path
+    if locations_path is not None:
+        _local_paths['locations_eu.csv'] = locations_path
+    for name in _CONFIG_VARIABLES:
+        globals().pop(name, None)
+
+
+def config_variables():
+    """
+    purpose: the config variables, loaded if they were not yet. E.g. to hand them
+             to worker processes, see use_config_variables()
+
+    returns: dict of the config variable names to their values
+    """
+    if any(name not in globals() for name in _CONFIG_VARIABLES):
+        globals().update(_load_config_variables())
+    return {name: globals()[name] for name in _CONFIG_VARIABLES}
+
+
+def use_config_variables(variables):
+    """
+    purpose: use config variables loaded in another process, instead of loading
+             them again. E.g. as the initializer of a ProcessPoolExecutor, which
+             also works with the spawn and forkserver start methods
+
+    params:
+    * variables: as returned by config_variables()
+    """
+    globals().update(variables)
+
+
+def __getattr__(name):
+    # only called for names not (yet) in the module, i.e. the lazily loaded config variables
+    if name not in _CONFIG_VARIABLES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals().update(_load_config_variables())
+    return globals()[name]
+
+
+def _load_config_variables():
+    project_config_text = _hub_file('project-config.json', PROJECT_CONFIG_URL)
+    locations_text = _hub_file('locations_eu.csv', LOCATIONS_URL)
+    project_config = json.loads(project_config_text)
+    config_variables = {'project_config': project_config}
+    # identifies the config in use, e.g. for cached validation results
+    config_variables['CONFIG_HASH'] = hashlib.sha256((project_config_text + '\0' + locations_text).encode('utf-8')).hexdigest()
+
+    ## covid19.py
+    config_variables['FORECAST_WEEK_DAY'] = project_config['forecast_week_day']
+    config_variables['HORIZONS'] = project_config['horizon']['values']
+    config_variables['CODES'] = pd.read_csv(io.StringIO(locations_text))
+    config_variables['VALID_TARGET_NAMES'] = [f"{_} wk ahead {target_variable}" \
+                                              for _ in config_variables['HORIZONS'] \
+                                              for target_variable in project_config['target_variables']]
+    config_variables['VALID_QUANTILES'] = project_config['forecast_type']['quantiles']
+    return config_variables
+
+
+def _hub_file(name, url):
+    """
+    :return: the text of the hub file `name`, from a local path, the cache or `url` (see module docstring)
+    """
+    if _local_paths.get(name):
+        with open(_local_paths[name], encoding='utf-8') as fp:
+            return fp.read()
+
+    cached_text, cached_time = _read_cached_hub_file(name)
+    if cached_text is not None and (OFFLINE or time.time() - cached_time < CONFIG_CACHE_TTL):
+        return cached_text
+    if OFFLINE:
+        raise RuntimeError(f"HUB_OFFLINE is set but there is no cached copy of {name} in {CONFIG_CACHE_DIR}. "
+                           f"Set the path to a local copy with configure() or the environment.")
+
+    try:
+        response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        if cached_text is None:
+            raise
+        print(f"Could not download {url} ({exc}). Using cached copy of {name}.")
+        return cached_text
+
+    _write_cached_hub_file(name, url, response.text)
+    return response.text
+
+
+def _read_cached_hub_file(name):
+    """
+    :return: 2-tuple (text, download time) of the cached copy of `name`, or (None, None) if there is
+        none or its content does not match the hash recorded when it was downloaded
+    """
+    try:
+        with open(os.path.join(CONFIG_CACHE_DIR, name + '.json')) as fp:
+            cache_info = json.load(fp)
+        with open(os.path.join(CONFIG_CACHE_DIR, name), encoding='utf-8', newline='') as fp:
+            text = fp.read()
+    except (OSError, ValueError):
+        return None, None
+    if hashlib.sha256(text.encode('utf-8')).hexdigest() != cache_info.get('sha256'):
+        return None, None
+    return text, cache_info.get('time', 0)
+
+
+def _write_cached_hub_file(name, url, text):
+    try:
+        os.makedirs(CONFIG_CACHE_DIR, exist_ok=True)
+        cache_path = os.path.join(CONFIG_CACHE_DIR, name)
+        # write to temporary files first so that concurrent readers never see a partial copy
+        with open(cache_path + '.tmp', 'w', encoding='utf-8', newline='') as fp:
+            fp.write(text)
+        with open(cache_path + '.json.tmp', 'w') as fp:
+            json.dump({'url': url, 'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(), 'time': time.time()},
+                      fp)
+        os.replace(cache_path + '.tmp', cache_path)
+        os.replace(cache_path + '.json.tmp', cache_path + '.json')
+    except OSError as exc:
+        print(f"Could not cache {name} in {CONFIG_CACHE_DIR}: {exc}")
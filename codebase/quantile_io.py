@@ -1,9 +1,12 @@
 # Standard modules
-import csv
+from array import array
 import math
 from collections import defaultdict
 import datetime
-from itertools import groupby
+from itertools import chain, islice
+
+# To list in requirements.txt
+import numpy as np
 
 # useful when loading inside hub submodule (no impact otherwise)
 import sys
@@ -13,6 +16,8 @@ sys.path.append('validation/codebase')
 # project-independent variables
 #
 import codebase.project_variables as project
+from .error_summary import ErrorSummary, RowError
+from .forecast_file import csv_row_reader
 
 #
 # Note: The following code is a somewhat temporary solution to validation during COVID-19 crunch time. As such, we
@@ -28,7 +33,8 @@ import codebase.project_variables as project
 # json_io_dict_from_quantile_csv_file()
 #
 
-def json_io_dict_from_quantile_csv_file(csv_fp, valid_target_names, codes, row_validator=None, addl_req_cols=()):
+def json_io_dict_from_quantile_csv_file(csv_fp, valid_target_names, codes, row_validator=None, addl_req_cols=(),
+                                        column_validator=None, error_samples=None):
     """
     Utility that validates and extracts the two types of predictions found in quantile CSV files (PointPredictions and
     QuantileDistributions), returning them as a "JSON IO dict" suitable for loading into the database (see
@@ -45,58 +51,36 @@ def json_io_dict_from_quantile_csv_file(csv_fp, valid_target_names, codes, row_v
         `quantile`
 
     :param csv_fp: an open quantile csv file-like object. the quantile CSV file format is documented at
-        https://docs.zoltardata.com/
-    :param valid_target_names: list of strings of valid targets to validate against
-    :param codes: unit codes i.e. location codes (e.g. FIPS in US, ISO-2 in EU)
+        https://docs.zoltardata.com/ . or `forecast_file.ArrowRows`, the rows of a Parquet/Arrow forecast
+    :param valid_target_names: collection of strings of valid targets to validate against, best a (frozen)set
+    :param codes: unit codes i.e. location codes (e.g. FIPS in US, ISO-2 in EU), or an object that holds them such as
+        a `validation_context.ValidationContext`. only passed on to `row_validator` and `column_validator`
     :param row_validator: an optional function of these args that is run to perform additional project-specific
         validations. returns a list of `error_messages`.
         - column_index_dict: as returned by _validate_header(): a dict that maps column_name -> its index in header (row)
         - row: the raw row being validated. NB: the order of columns is variable, but callers can use column_index_dict
             to index into row
     :param addl_req_cols: an optional list of strings naming columns in addition to project.REQUIRED_COLUMNS that are required
+    :param column_validator: an optional alternative to `row_validator` that validates all rows in one call, e.g. with
+        vectorized column operations. args are `column_index_dict`, the list of raw rows and `codes`. returns a dict
+        that maps a row's index to the list of `error_messages` for that row. those are reported in the same position
+        as `row_validator` messages would be
+    :param error_samples: if not None, row error messages (`error_summary.RowError`) with the same message are reported
+        once, with their count and up to this many example rows. o/w every row error is reported
     :return 2-tuple: (json_io_dict, error_messages) where the former is a "JSON IO dict" (aka 'json_io_dict' by callers)
         that contains the two types of predictions. see https://docs.zoltardata.com/ for details. json_io_dict is None
         if there were errors
     """
     # load and validate the rows (validation step 1/2). error_messages is one of the the return values (filled next)
-    rows, error_messages = _validated_rows_for_quantile_csv(csv_fp, valid_target_names, codes, row_validator, addl_req_cols)
+    rows, error_messages = _validated_rows_for_quantile_csv(csv_fp, valid_target_names, codes, row_validator, addl_req_cols,
+                                                            column_validator, error_samples)
 
     if error_messages:
         return None, error_messages  # terminate processing b/c we can't proceed to step 1/2 with invalid rows
 
     # step 1/3: process rows, validating and collecting point and quantile values for each row. then add the actual
     # prediction dicts. each point row has its own dict, but quantile rows are grouped into one dict.
-    prediction_dicts = []  # the 'predictions' section of the returned value. filled next
-
-    rows.sort(key=lambda _: (_[0], _[1], _[2]))  # sorted for groupby()
-
-    for (target_name, location, is_point_row), quantile_val_grouper in \
-            groupby(rows, key=lambda _: (_[0], _[1], _[2])):
-        # fill values for points and bins
-        point_values = []
-        quant_quantiles, quant_values = [], []
-        for _, _, _, quantile, value in quantile_val_grouper:
-            if is_point_row:
-                point_values.append(value)  # quantile is NA
-
-            else:
-                quant_quantiles.append(quantile)
-                quant_values.append(value)
-
-        # add the actual prediction dicts
-        for point_value in point_values:
-            prediction_dicts.append({'unit': location,
-                                     'target': target_name,
-                                     'class': project.POINT_PREDICTION_CLASS,  # PointPrediction
-                                     'prediction': {
-                                         'value': point_value}})
-        if quant_quantiles:
-            prediction_dicts.append({'unit': location,
-                                     'target': target_name,
-                                     'class': project.QUANTILE_PREDICTION_CLASS,  # QuantileDistribution
-                                     'prediction': {
-                                         'quantile': quant_quantiles,
-                                         'value': quant_values}})
+    prediction_dicts = _prediction_dicts_for_quantile_rows(rows)  # the 'predictions' section of the returned value
 
     # step 2/3: validate individual prediction_dicts. along the way fill loc_targ_to_pred_classes, which helps to do
     # "prediction"-level validations at the end of this function. it maps 2-tuples to a list of prediction classes
@@ -110,11 +94,67 @@ def json_io_dict_from_quantile_csv_file(csv_fp, valid_target_names, codes, row_v
 
         prediction_class = prediction_dict['class']
         loc_targ_to_pred_classes[(unit_name, target_name)].append(prediction_class)
-        if prediction_dict['class'] == project.QUANTILE_PREDICTION_CLASS:
-            pred_dict_error_messages = _validate_quantile_prediction_dict(prediction_dict)  # raises o/w
-            error_messages.extend(pred_dict_error_messages)
+
+    # the quantile prediction_dicts are validated all at once
+    error_messages.extend(_validate_quantile_prediction_dicts(
+        [prediction_dict for prediction_dict in prediction_dicts
+         if prediction_dict['class'] == project.QUANTILE_PREDICTION_CLASS]))
 
     # step 3/3: do "prediction"-level validations
+    error_messages.extend(_prediction_level_error_messages(loc_targ_to_pred_classes))
+
+    # done
+    return {'meta': {}, 'predictions': prediction_dicts}, error_messages
+
+
+def _prediction_dicts_for_quantile_rows(rows):
+    """
+    `json_io_dict_from_quantile_csv_file()` helper function that builds the prediction dicts. Rows are grouped by
+    (target_name, location, is_point_row) in a single pass with a dict, and only the distinct groups are sorted, which
+    gives the same order as sorting all rows.
+
+    :param rows: as returned by `_validated_rows_for_quantile_csv()`: [target_name, location, is_point_row, quantile,
+        value]
+    :return: a list of PointPrediction or QuantileDistribution prediction dicts
+    """
+    grouped_values = {}  # (target_name, location, is_point_row) -> ([quantile1, ...], [value1, ...]), in row order
+    for target_name, location, is_point_row, quantile, value in rows:
+        group_values = grouped_values.get((target_name, location, is_point_row))
+        if group_values is None:
+            group_values = grouped_values[(target_name, location, is_point_row)] = ([], [])
+        group_values[0].append(quantile)
+        group_values[1].append(value)
+
+    prediction_dicts = []
+    for target_name, location, is_point_row in sorted(grouped_values):
+        quant_quantiles, quant_values = grouped_values[(target_name, location, is_point_row)]
+        # add the actual prediction dicts
+        if is_point_row:
+            for point_value in quant_values:  # quantile is NA
+                prediction_dicts.append({'unit': location,
+                                         'target': target_name,
+                                         'class': project.POINT_PREDICTION_CLASS,  # PointPrediction
+                                         'prediction': {
+                                             'value': point_value}})
+        else:
+            prediction_dicts.append({'unit': location,
+                                     'target': target_name,
+                                     'class': project.QUANTILE_PREDICTION_CLASS,  # QuantileDistribution
+                                     'prediction': {
+                                         'quantile': quant_quantiles,
+                                         'value': quant_values}})
+    return prediction_dicts
+
+
+def _prediction_level_error_messages(loc_targ_to_pred_classes):
+    """
+    `json_io_dict_from_quantile_csv_file()` helper function that does the "prediction"-level validations.
+
+    :param loc_targ_to_pred_classes: a dict that maps (unit_name, target_name) -> [prediction_class1, ...]
+    :return: list of error messages
+    """
+    error_messages = []
+
     # validate: "Within a Prediction, there cannot be more than 1 Prediction Element of the same type".
     duplicate_unit_target_tuples = [(unit, target, pred_classes) for (unit, target), pred_classes
                                     in loc_targ_to_pred_classes.items()
@@ -132,86 +172,395 @@ def json_io_dict_from_quantile_csv_file(csv_fp, valid_target_names, codes, row_v
                               f"unit, target, point counts tuples did not have exactly one point: "
                               f"{unit_target_point_count}")
 
-    # done
-    return {'meta': {}, 'predictions': prediction_dicts}, error_messages
+    return error_messages
 
 
-def _validated_rows_for_quantile_csv(csv_fp, valid_target_names, fips_codes,  row_validator, addl_req_cols):
+#
+# iter_quantile_csv_errors()
+#
+
+STREAM_CHUNK_SIZE = 10000  # number of rows read at a time by iter_quantile_csv_errors()
+
+
+def iter_quantile_csv_errors(csv_fp, valid_target_names, codes, row_validator=None, addl_req_cols=(),
+                             column_validator=None, chunk_size=STREAM_CHUNK_SIZE, on_predictions=None):
     """
-    `json_io_dict_from_quantile_csv_file()` helper function.
+    A bounded-memory alternative to `json_io_dict_from_quantile_csv_file()` for very large files: it does the same
+    validations but does not build the json_io_dict. Rows are read `chunk_size` at a time and apart from the current
+    chunk only this per-(location, target) state is kept:
+
+    - the quantiles and values of each quantile group, in the compact arrays of `_QuantileRowNumbers`. the rows of a
+      group may be anywhere in the file, so groups are only validated at the end of the file
+    - the number of point prediction elements, for the "prediction"-level validations at the end
+
+    The parsed rows and the prediction dicts are not kept, so memory grows with the numbers of the quantile rows only,
+    about 22 bytes per row.
+    The error messages are those of `json_io_dict_from_quantile_csv_file()`, in the same order, whatever the row order
+    and chunk size.
+
+    :param csv_fp: as passed to `json_io_dict_from_quantile_csv_file()`
+    :param valid_target_names: ""
+    :param codes: ""
+    :param row_validator: ""
+    :param addl_req_cols: ""
+    :param column_validator: "". it is called once per chunk, with the row indexes of that chunk
+    :param chunk_size: number of rows read at a time
+    :param on_predictions: optional function that is called with the `json_io.QuantilePredictions` of the file once
+        it passed all validations, e.g. to upload it without reading the file again. the point rows are then kept too,
+        in the same compact arrays as the quantile rows
+    :return: a generator of error messages (strings)
+    """
+    csv_reader = csv_row_reader(csv_fp)
+    header = next(csv_reader)
+    try:
+        column_index_dict = _validate_header(header, addl_req_cols)
+    except RuntimeError as re:
+        yield re.args[0]
+        return  # terminate processing
 
-    :return: 2-tuple: (validated_rows, error_messages)
+    error_targets = set()  # output set of invalid target names
+    has_row_errors = False
+    quantile_group_ids = {}  # (target_name, location) -> group id in quantile_numbers
+    quantile_numbers = _QuantileRowNumbers()
+    point_group_ids = {}  # (target_name, location) -> group id in point_numbers, if on_predictions
+    point_numbers = _QuantileRowNumbers() if on_predictions else None
+    loc_targ_to_point_counts = defaultdict(int)  # (target_name, location) -> # point
+
+    for csv_rows in iter(lambda: list(islice(csv_reader, chunk_size)), []):
+        num_checked_rows = next((row_idx for row_idx, row in enumerate(csv_rows) if len(row) != len(header)),
+                                len(csv_rows))
+        if column_validator:
+            column_error_messages = column_validator(column_index_dict, csv_rows[:num_checked_rows], codes)
+
+        for row_idx in range(num_checked_rows):
+            row = csv_rows[row_idx]
+            row_error_messages = []
+            if row_validator:
+                row_error_messages.extend(row_validator(column_index_dict, row, codes))
+            elif column_validator:
+                row_error_messages.extend(column_error_messages.get(row_idx, []))
+            target_name, location, is_point_row, quantile, value = \
+                _validated_quantile_row(column_index_dict, row, valid_target_names, error_targets, row_error_messages)
+            yield from row_error_messages
+
+            if (row_error_messages or error_targets) and not has_row_errors:
+                has_row_errors = True
+                quantile_group_ids.clear()  # no more group validations, so no need to keep their state
+                point_group_ids.clear()
+                quantile_numbers = point_numbers = None
+            if has_row_errors:
+                continue
+            if is_point_row:
+                loc_targ_to_point_counts[(target_name, location)] += 1
+                if point_numbers is not None:
+                    group_id = point_group_ids.get((target_name, location))
+                    if group_id is None:
+                        group_id = point_group_ids[(target_name, location)] = len(point_group_ids)
+                    point_numbers.append(group_id, quantile, value)
+            else:
+                group_id = quantile_group_ids.get((target_name, location))
+                if group_id is None:
+                    group_id = quantile_group_ids[(target_name, location)] = len(quantile_group_ids)
+                quantile_numbers.append(group_id, quantile, value)
+
+        if num_checked_rows < len(csv_rows):
+            row = csv_rows[num_checked_rows]
+            yield f"invalid number of items in row. len(header)={len(header)} but len(row)={len(row)}. row={row}"
+            return  # terminate processing
+
+    # Add invalid targets to errors
+    if len(error_targets) > 0:
+        yield f"invalid target name(s): {_sorted_set_repr(error_targets)}"
+    if has_row_errors:
+        return
+
+    # validate the quantile groups, then do "prediction"-level validations, in the (target, location) order of
+    # `json_io_dict_from_quantile_csv_file()`
+    group_error_messages = _quantile_group_error_messages(quantile_group_ids, quantile_numbers)
+    yield from group_error_messages
+    loc_targ_to_pred_classes = {}  # (unit_name, target_name) -> [prediction_class1, ...]
+    for target_name, location in sorted(set(quantile_group_ids) | set(loc_targ_to_point_counts)):
+        loc_targ_to_pred_classes[(location, target_name)] = \
+            [project.QUANTILE_PREDICTION_CLASS] * ((target_name, location) in quantile_group_ids) + \
+            [project.POINT_PREDICTION_CLASS] * loc_targ_to_point_counts[(target_name, location)]
+    prediction_error_messages = _prediction_level_error_messages(loc_targ_to_pred_classes)
+    yield from prediction_error_messages
+
+    if on_predictions and not (group_error_messages or prediction_error_messages):
+        on_predictions(_quantile_predictions(quantile_group_ids, quantile_numbers, point_group_ids, point_numbers))
+
+
+def _quantile_group_error_messages(quantile_group_ids, quantile_numbers):
     """
-    from .cdc_io import _parse_value  # avoid circular imports
+    `iter_quantile_csv_errors()` helper function that validates the quantile groups, in (target, location) order. The
+    groups are checked at once with `invalid_quantile_group_ids()` on the arrays of quantile_numbers, and only the
+    groups that fail are turned into prediction dicts, for the messages of `_validate_quantile_prediction_dict()`. If
+    not all the numbers are ints and floats, all groups are passed to `_validate_quantile_prediction_dicts()`, which
+    reports (or raises) as for the whole file.
+
+    :param quantile_group_ids: dict that maps (target_name, location) -> group id in quantile_numbers
+    :param quantile_numbers: a `_QuantileRowNumbers` with the quantile rows of the groups
+    :return: list of error messages
+    """
+    group_keys = sorted(quantile_group_ids)
+    if not quantile_numbers.are_all_numbers():
+        group_numbers = quantile_numbers.group_numbers(quantile_group_ids.values())
+        return _validate_quantile_prediction_dicts(
+            [_quantile_prediction_dict(group_key, *group_numbers[quantile_group_ids[group_key]])
+             for group_key in group_keys])
+
+    group_ranks = np.empty(len(group_keys), dtype=np.intp)  # group id -> index in group_keys
+    group_ranks[[quantile_group_ids[group_key] for group_key in group_keys]] = np.arange(len(group_keys))
+    group_ids, quantiles, values = quantile_numbers.arrays()
+    invalid_group_keys = [group_keys[group_rank] for group_rank
+                          in sorted(invalid_quantile_group_ids(group_ranks[group_ids], quantiles, values))]
+    group_numbers = quantile_numbers.group_numbers(quantile_group_ids[group_key] for group_key in invalid_group_keys)
+    return [error_message for group_key in invalid_group_keys
+            for error_message in _validate_quantile_prediction_dict(
+                _quantile_prediction_dict(group_key, *group_numbers[quantile_group_ids[group_key]]))]
+
+
+def _quantile_prediction_dict(group_key, quantiles, values):
+    target_name, location = group_key
+    return {'unit': location,
+            'target': target_name,
+            'class': project.QUANTILE_PREDICTION_CLASS,  # QuantileDistribution
+            'prediction': {
+                'quantile': quantiles,
+                'value': values}}
+
+
+def _quantile_predictions(quantile_group_ids, quantile_numbers, point_group_ids, point_numbers):
+    """
+    `iter_quantile_csv_errors()` helper function that builds the `json_io.QuantilePredictions` of a valid file from
+    its kept quantile and point rows.
 
+    :param quantile_group_ids: dict that maps (target_name, location) -> group id in quantile_numbers
+    :param quantile_numbers: a `_QuantileRowNumbers` with the quantile rows
+    :param point_group_ids: dict that maps (target_name, location) -> group id in point_numbers
+    :param point_numbers: a `_QuantileRowNumbers` with the point rows
+    """
+    from .json_io import QuantilePredictions  # avoid circular imports
+
+    unit_index, target_index = {}, {}  # name -> code, in first seen order
+    row_columns = []  # per kind of row: (unit_codes, target_codes, quantiles, quantile_is_int, values, value_is_int)
+    for group_ids, row_numbers in ((quantile_group_ids, quantile_numbers), (point_group_ids, point_numbers)):
+        group_unit_codes = np.empty(len(group_ids), dtype=np.int32)  # group id -> unit code
+        group_target_codes = np.empty(len(group_ids), dtype=np.int32)  # group id -> target code
+        for (target_name, location), group_id in group_ids.items():
+            group_unit_codes[group_id] = unit_index.setdefault(location, len(unit_index))
+            group_target_codes[group_id] = target_index.setdefault(target_name, len(target_index))
+        row_group_ids = row_numbers.arrays()[0]
+        row_columns.append((group_unit_codes[row_group_ids], group_target_codes[row_group_ids],
+                            *row_numbers.number_arrays()))
+    unit_codes, target_codes, quantiles, quantile_is_int, values, value_is_int = \
+        [np.concatenate(columns) for columns in zip(*row_columns)]
+    is_point = np.repeat([False, True], [len(quantile_numbers), len(point_numbers)])
+    return QuantilePredictions.from_rows(list(unit_index), list(target_index), unit_codes, target_codes, is_point,
+                                         quantiles, quantile_is_int, values, value_is_int)
+
+
+MAX_EXACT_INT = 2 ** 53  # larger ints do not all fit in a double
+
+
+class _QuantileRowNumbers:
+    """
+    `iter_quantile_csv_errors()` helper that keeps the quantile rows until the end of the file in compact arrays
+    rather than in lists of Python objects: per row, its group id, and its quantile and value as doubles with a kind
+    code, so that they are given back as they were parsed: an int, a float or None. Other parsed values, e.g. ints
+    that do not fit in a double, are kept as they are, by row.
+    """
+    FLOAT, INT, NONE, OTHER = range(4)  # kind codes
+
+    def __init__(self):
+        self.group_ids = array('i')
+        self.quantiles = array('d')  # NaN for kinds NONE and OTHER
+        self.values = array('d')  # ""
+        self.quantile_kinds = array('b')
+        self.value_kinds = array('b')
+        self.others = {}  # (row index, 'quantile' or 'value') -> parsed value, for kind OTHER
+
+    def __len__(self):
+        return len(self.group_ids)
+
+    def append(self, group_id, quantile, value):
+        row_idx = len(self.group_ids)
+        self.group_ids.append(group_id)
+        for column, number, numbers, kinds in (('quantile', quantile, self.quantiles, self.quantile_kinds),
+                                               ('value', value, self.values, self.value_kinds)):
+            number_type = type(number)
+            if number_type is float:
+                kind = self.FLOAT
+            elif number_type is int and -MAX_EXACT_INT <= number <= MAX_EXACT_INT:
+                kind = self.INT
+            elif number is None:
+                kind = self.NONE
+            else:
+                kind = self.OTHER
+                self.others[(row_idx, column)] = number
+            numbers.append(number if kind <= self.INT else math.nan)
+            kinds.append(kind)
+
+    def are_all_numbers(self):
+        """
+        :return: True if all the quantiles and values are ints and floats, and no quantile is NaN
+        """
+        return not (self.others or self.NONE in self.quantile_kinds or self.NONE in self.value_kinds or
+                    np.isnan(np.frombuffer(self.quantiles, dtype=float)).any())
+
+    def arrays(self):
+        """
+        :return: 3-tuple of NumPy views of the arrays, without copies: (group_ids, quantiles, values)
+        """
+        return (np.frombuffer(self.group_ids, dtype=np.intc), np.frombuffer(self.quantiles, dtype=float),
+                np.frombuffer(self.values, dtype=float))
+
+    def number_arrays(self):
+        """
+        :return: 4-tuple of arrays: (quantiles, quantile_is_int, values, value_is_int), where None is NaN and other
+            parsed ints and floats are as a float
+        """
+        number_arrays = []
+        for column, numbers, kinds in (('quantile', self.quantiles, self.quantile_kinds),
+                                       ('value', self.values, self.value_kinds)):
+            numbers, is_int = np.array(numbers, dtype=float), np.frombuffer(kinds, dtype=np.int8) == self.INT
+            for (row_idx, other_column), number in self.others.items():
+                if other_column == column and isinstance(number, (int, float)):
+                    numbers[row_idx], is_int[row_idx] = number, isinstance(number, int)
+            number_arrays.extend((numbers, is_int))
+        return tuple(number_arrays)
+
+    def group_numbers(self, group_ids):
+        """
+        :param group_ids: iterable of group ids
+        :return: dict that maps each group id to its (quantiles, values) lists, in row order, as they were parsed
+        """
+        groups = {group_id: ([], []) for group_id in group_ids}
+        row_idxs = np.flatnonzero(np.isin(self.arrays()[0], list(groups)))
+        for row_idx in row_idxs.tolist():
+            quantiles, values = groups[self.group_ids[row_idx]]
+            quantiles.append(self._number(row_idx, 'quantile', self.quantiles, self.quantile_kinds))
+            values.append(self._number(row_idx, 'value', self.values, self.value_kinds))
+        return groups
+
+    def _number(self, row_idx, column, numbers, kinds):
+        kind = kinds[row_idx]
+        if kind == self.FLOAT:
+            return numbers[row_idx]
+        elif kind == self.INT:
+            return int(numbers[row_idx])
+        elif kind == self.NONE:
+            return None
+        return self.others[(row_idx, column)]
+
+
+def _validated_rows_for_quantile_csv(csv_fp, valid_target_names, fips_codes,  row_validator, addl_req_cols,
+                                     column_validator=None, error_samples=None):
+    """
+    `json_io_dict_from_quantile_csv_file()` helper function.
 
-    error_messages = []  # list of strings. return value. set below if any issues
+    :return: 2-tuple: (validated_rows, error_messages)
+    """
+    # list of strings, or their summary. return value (as a list). set below if any issues
+    error_messages = [] if error_samples is None else ErrorSummary(error_samples)
 
-    csv_reader = csv.reader(csv_fp, delimiter=',')
+    csv_reader = csv_row_reader(csv_fp)
     header = next(csv_reader)
     try:
         column_index_dict = _validate_header(header, addl_req_cols)
     except RuntimeError as re:
         error_messages.append(re.args[0])
-        return [], error_messages  # terminate processing
+        return [], list(error_messages)  # terminate processing
 
     error_targets = set()  # output set of invalid target names
 
+    csv_rows = csv_reader
+    if column_validator:
+        # validate all rows up to the first one with an invalid number of items, where processing terminates below
+        csv_rows = list(csv_reader)
+        num_checked_rows = next((row_idx for row_idx, row in enumerate(csv_rows) if len(row) != len(header)),
+                                len(csv_rows))
+        column_error_messages = column_validator(column_index_dict, csv_rows[:num_checked_rows], fips_codes)
+
     rows = []  # list of parsed and validated rows. filled next
-    for row in csv_reader:
+    for row_idx, row in enumerate(csv_rows):
         if len(row) != len(header):
             error_messages.append(f"invalid number of items in row. len(header)={len(header)} but len(row)={len(row)}. "
                                   f"row={row}")
-            return [], error_messages  # terminate processing
+            return [], list(error_messages)  # terminate processing
 
         # do optional application-specific row validation. NB: error_messages is modified in-place as a side-effect
-        location, target_name, row_type, quantile, value = [row[column_index_dict[column]] for column in
-                                                            project.REQUIRED_COLUMNS]
         if row_validator:
             error_messages.extend(row_validator(column_index_dict, row, fips_codes))
+        elif column_validator:
+            error_messages.extend(column_error_messages.get(row_idx, []))
 
-        # validate target_name
-        if target_name not in valid_target_names:
-            error_targets.add(target_name)
-
-        # validate quantile and value
-        row_type = row_type.lower()
-        is_point_row = (row_type == project.CDC_POINT_ROW_TYPE.lower())
-        is_observed_row = (row_type == project.CDC_OBSERVED_ROW_TYPE.lower())
-        is_quantile_row = (row_type == project.CDC_QUANTILE_ROW_TYPE.lower())
-
-        if is_observed_row:
-            is_point_row = is_observed_row
-       # print(is_observed_row)
-        quantile = _parse_value(quantile)  # None if not an int, float, or Date. float might be inf or nan
-        value = _parse_value(value)  # ""
-        if not (is_point_row or is_observed_row) and ((quantile is None)  or
-                                   (isinstance(quantile, datetime.date)) or
-                                   (not math.isfinite(quantile)) or  # inf, nan
-                                   not (0 <= quantile <= 1)) and is_quantile_row:
-            error_messages.append(f"entries in the `quantile` column must be an int or float in [0, 1]: "
-                                  f"{quantile}. row={row}")
-        elif is_point_row and ((value is None) or
-                               (isinstance(value, datetime.date)) or
-                               (not math.isfinite(value))):  # inf, nan
-            error_messages.append(f"entries in the `value` column must be an int or float: {value}. row={row}")
-
-        elif is_observed_row and ((value is None) or
-                               (isinstance(value, datetime.date)) or
-                               (not math.isfinite(value))):   # inf, nan
-            error_messages.append(f"entries in the `value` column must be nan if type is observed: {value}. row={row}")
-
-        # convert parsed date back into string suitable for JSON.
-        # NB: recall all targets are "type": "discrete", so we only accept ints and floats
-        # if isinstance(value, datetime.date):
-        #     value = value.strftime(YYYY_MM_DD_DATE_FORMAT)
-        rows.append([target_name, location, is_point_row, quantile, value])
+        rows.append(_validated_quantile_row(column_index_dict, row, valid_target_names, error_targets,
+                                            error_messages))
 
     # Add invalid targets to errors
     if len(error_targets) > 0:
-        error_messages.append(f"invalid target name(s): {error_targets!r}")
+        error_messages.append(f"invalid target name(s): {_sorted_set_repr(error_targets)}")
+
+    return rows, list(error_messages)
+
+
+def _validated_quantile_row(column_index_dict, row, valid_target_names, error_targets, error_messages):
+    """
+    `_validated_rows_for_quantile_csv()` helper function that parses and validates one row. NB: invalid target names
+    are added to `error_targets` and other errors to `error_messages`, in-place.
 
-    return rows, error_messages
+    :return: the parsed row: [target_name, location, is_point_row, quantile, value]
+    """
+    from .cdc_io import _parse_value  # avoid circular imports
+
+    location, target_name, row_type, quantile, value = [row[column_index_dict[column]] for column in
+                                                        project.REQUIRED_COLUMNS]
+
+    # validate target_name
+    if target_name not in valid_target_names:
+        error_targets.add(target_name)
+
+    # validate quantile and value
+    row_type = row_type.lower()
+    is_point_row = (row_type == project.CDC_POINT_ROW_TYPE.lower())
+    is_observed_row = (row_type == project.CDC_OBSERVED_ROW_TYPE.lower())
+    is_quantile_row = (row_type == project.CDC_QUANTILE_ROW_TYPE.lower())
+
+    if is_observed_row:
+        is_point_row = is_observed_row
+    # print(is_observed_row)
+    quantile = _parse_value(quantile)  # None if not an int, float, or Date. float might be inf or nan
+    value = _parse_value(value)  # ""
+    if not (is_point_row or is_observed_row) and ((quantile is None)  or
+                               (isinstance(quantile, datetime.date)) or
+                               (not math.isfinite(quantile)) or  # inf, nan
+                               not (0 <= quantile <= 1)) and is_quantile_row:
+        error_messages.append(RowError(f"entries in the `quantile` column must be an int or float in [0, 1]: "
+                                       f"{quantile}.", row))
+    elif is_point_row and ((value is None) or
+                           (isinstance(value, datetime.date)) or
+                           (not math.isfinite(value))):  # inf, nan
+        error_messages.append(RowError(f"entries in the `value` column must be an int or float: {value}.", row))
+
+    elif is_observed_row and ((value is None) or
+                           (isinstance(value, datetime.date)) or
+                           (not math.isfinite(value))):   # inf, nan
+        error_messages.append(RowError(f"entries in the `value` column must be nan if type is observed: {value}.", row))
+
+    # convert parsed date back into string suitable for JSON.
+    # NB: recall all targets are "type": "discrete", so we only accept ints and floats
+    # if isinstance(value, datetime.date):
+    #     value = value.strftime(YYYY_MM_DD_DATE_FORMAT)
+    return [target_name, location, is_point_row, quantile, value]
+
+
+def _sorted_set_repr(values):
+    """
+    `json_io_dict_from_quantile_csv_file()` helper: the repr() of a set of strings, sorted so that it is the same in
+    every process
+    """
+    return '{%s}' % ', '.join(map(repr, sorted(values)))
 
 
 def _validate_header(header, addl_req_cols):
@@ -241,6 +590,68 @@ def _validate_header(header, addl_req_cols):
     return {column: header.index(column) for column in header}
 
 
+def _validate_quantile_prediction_dicts(prediction_dicts):
+    """
+    `json_io_dict_from_quantile_csv_file()` helper function. A batched `_validate_quantile_prediction_dict()`: the
+    quantiles and values of all prediction_dicts are put in flat arrays with a group id, sorted once by (group,
+    quantile) with a lexsort, and checked for unique quantiles and non-decreasing values (with the same rel_tol=1e-05)
+    in one diff pass. Only groups that fail are passed to `_validate_quantile_prediction_dict()`, for its messages.
+
+    :param prediction_dicts: a list of QuantileDistribution prediction dicts, as documented at
+        https://docs.zoltardata.com/
+    :return list of strings, one per error, in prediction_dicts order. [] if all are valid
+    """
+    quantile_lists = [prediction_dict['prediction']['quantile'] for prediction_dict in prediction_dicts]
+    value_lists = [prediction_dict['prediction']['value'] for prediction_dict in prediction_dicts]
+    group_sizes = [len(quantile_list) for quantile_list in quantile_lists]
+    num_rows = sum(group_sizes)
+    try:
+        if group_sizes != [len(value_list) for value_list in value_lists]:
+            raise ValueError("quantile and value vectors of different lengths")
+        quantiles = np.fromiter(chain.from_iterable(quantile_lists), dtype=float, count=num_rows)
+        values = np.fromiter(chain.from_iterable(value_lists), dtype=float, count=num_rows)
+        if np.isnan(quantiles).any():
+            raise ValueError("quantile that is not a number")
+    except (TypeError, ValueError):
+        # not all numbers: validate one by one, which reports (or raises) as before
+        return [error_message for prediction_dict in prediction_dicts
+                for error_message in _validate_quantile_prediction_dict(prediction_dict)]
+
+    group_ids = np.repeat(np.arange(len(prediction_dicts)), group_sizes)
+    invalid_group_ids = invalid_quantile_group_ids(group_ids, quantiles, values)
+
+    return [error_message for group_id in sorted(invalid_group_ids)
+            for error_message in _validate_quantile_prediction_dict(prediction_dicts[group_id])]
+
+
+def invalid_quantile_group_ids(group_ids, quantiles, values):
+    """
+    The checks of `_validate_quantile_prediction_dict()` on the quantiles and values of many quantile groups at once:
+    sorts them once by (group, quantile) with a lexsort and compares each (quantile, value) with the next one in the
+    same group.
+
+    :param group_ids: int array: the group of each quantile
+    :param quantiles: float array
+    :param values: float array
+    :return: set of the ids of the groups with duplicate quantiles or values that are not non-decreasing, with the
+        same rel_tol=1e-05
+    """
+    sort_order = np.lexsort((quantiles, group_ids))  # stable, like sorted() in _validate_quantile_prediction_dict()
+    quantiles, values, group_ids = quantiles[sort_order], values[sort_order], group_ids[sort_order]
+
+    # compare each (quantile, value) with the next one in the same group
+    is_same_group = group_ids[1:] == group_ids[:-1]
+    is_duplicate_quantile = quantiles[1:] == quantiles[:-1]
+    prev_values, next_values = values[:-1], values[1:]
+    with np.errstate(invalid='ignore', over='ignore'):
+        # a <= b, or math.isclose(a, b, rel_tol=1e-05), which is never true for inf/nan unless a == b
+        is_le_values = (prev_values <= next_values) | \
+                       (np.isfinite(prev_values) & np.isfinite(next_values) &
+                        (np.abs(prev_values - next_values) <=
+                         1e-05 * np.maximum(np.abs(prev_values), np.abs(next_values))))
+    return set(group_ids[1:][is_same_group & (is_duplicate_quantile | ~is_le_values)].tolist())
+
+
 def _validate_quantile_prediction_dict(prediction_dict):
     """
     `json_io_dict_from_quantile_csv_file()` helper function. Implements the quantile checks at
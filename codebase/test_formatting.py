@@ -1,4 +1,5 @@
 # Standard modules
+import argparse
 import glob
 from pprint import pprint
 import sys
@@ -6,6 +7,7 @@ import os
 import collections
 from datetime import datetime
 from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # To list in requirements.txt
@@ -20,6 +22,11 @@ from .covid19 import validate_quantile_csv_file
 from .validation_functions.metadata import check_for_metadata, get_metadata_model, output_duplicate_models
 from .validation_functions.forecast_filename import validate_forecast_file_name
 from .validation_functions.forecast_date import filename_match_forecast_date
+from .forecast_file import ForecastFile, as_forecast_file
+from .validation_cache import ValidationCache
+from .changed_files import classify_changed_files, git_changed_files
+from .validation_context import get_validation_context, location_populations
+from .hub_dataset import check_forecast_dataset
 
 import codebase.project_variables as project
 
@@ -29,7 +36,6 @@ metadata_version = 5
 
 # this is the root of the repository. 
 root = here()
-pop_df = project.CODES
 
 # set range of valid scenario IDs
 VALID_SCENARIO_ID = ["forecast"] # add new scenarios here
@@ -41,37 +47,42 @@ VALID_SCENARIO_ID = ["forecast"] # add new scenarios here
     - A prediction who's `value` is greater than the population of that region. 
 
     Method:
-    1. convert the location column to an integer (so that we can do an efficient `join` with the forecast DataFrame)
-    2. Do a left join of the forecast DataFrame with population dataframe on the `location` column.
-    3. Find number of rows that have the value in `value` column >= the value of the `Population` column.
+    1. look up the population of each row's `location` in the location index of the validation context, built once
+       from the locations table (see `validation_context.location_populations()`)
+    2. Find number of rows that have the value in `value` column >= that population.
+    3. Return those rows, with their `population`, as a merge with the locations table would give them.
 
     Population data: 
     Retrieved from the JHU timeseries data used for generating the truth data file.
     County population aggregated to state and state thereafter aggregated to national. 
 '''
-def get_num_invalid_predictions(forecast_filename):
-    model_df = pd.read_csv(open(forecast_filename, 'r'))
-    # preprocess model dataframe
-    model_df = model_df.astype({'location':str})
-    merged = model_df.merge(pop_df[['location', 'population']], on='location', how='left')
-    num_invalid_preds = np.sum(merged['value'] >= merged['population'])
-    return num_invalid_preds, merged[merged['value'] >= merged['population']]
+def get_num_invalid_predictions(forecast, context=None):
+    context = context or get_validation_context()
+    model_df = as_forecast_file(forecast).df
+    locations = model_df['location']
+    if locations.dtype != object:
+        locations = locations.astype(str)
+    populations = location_populations(context, locations)
+    is_invalid = model_df['value'].to_numpy() >= populations
+    num_invalid_preds = np.sum(is_invalid)
+    invalid_preds = model_df[is_invalid].assign(location=locations[is_invalid], population=populations[is_invalid])
+    return num_invalid_preds, invalid_preds
     
 
-def validate_forecast_values(filepath):
-    num_invalid, preds = get_num_invalid_predictions(filepath)
+def validate_forecast_values(forecast):
+    num_invalid, preds = get_num_invalid_predictions(forecast)
     if  num_invalid> 0:
         return True, [f"PREDICTION ERROR: You have {num_invalid} invalid predictions in your file. Invalid Predictions:\n {preds}"]
     return  False, "no errors"
 
-def validate_forecast_file(filepath, silent=False):
+def validate_forecast_file(forecast, silent=False):
     """
     purpose: Validates the forecast file with zoltpy 
 
     params:
-    * filepath: Full filepath of the forecast
+    * forecast: ForecastFile, or full filepath of the forecast
     """
-    file_error = validate_quantile_csv_file(filepath)
+    file_error = validate_quantile_csv_file(forecast)
 
     if file_error != "no errors":
         return True, file_error
@@ -110,24 +121,6 @@ def compile_output_errors(filepath, is_filename_error, filename_error_output, is
     return output_error_text
 
 
-def update_checked_files(df, previous_checked, files_in_repository):
-    """
-    purpose: update locally_validated_files.csv and remove deleted files
-
-    params:
-    * df: Pandas dataframe containing currently checked files
-    * previous_checked: Previously checked files as list
-    * files_in_repository: Current files in repo as list
-    """
-    # Remove files that have been deleted from repo
-    # Files that are in verify checks but NOT in repository
-    deleted_files = np.setdiff1d(previous_checked, files_in_repository)
-    df = df[~df['file_path'].isin(deleted_files)]
-
-    # update previously checked files
-    df.to_csv('code/validation/locally_validated_files.csv', index=False)
-
-
 def print_output_errors(output_errors, prefix=""):
     """
     purpose: Print the final errors
@@ -147,8 +140,8 @@ def print_output_errors(output_errors, prefix=""):
 
 
 # Check scenario column
-def scenario_id_match(filename):
-    df = pd.read_csv(filename)
+def scenario_id_match(forecast):
+    df = as_forecast_file(forecast).df
     
     # check if scenario col is present
     if 'scenario_id' in list(df):
@@ -162,25 +155,95 @@ def scenario_id_match(filename):
     else:
         return False, "no errors"
 
-def forecast_check(filepath):
-    is_error, forecast_error_output = validate_forecast_file(filepath)
+def forecast_check(forecast):
+    """
+    purpose: Run all forecast file checks, reading and parsing the file only once
+
+    params:
+    * forecast: ForecastFile, or full filepath of the forecast
+    """
+    forecast = as_forecast_file(forecast)
+    is_error, forecast_error_output = validate_forecast_file(forecast)
 
     # valdate predictions
     if not is_error:
-        is_error, forecast_error_output = validate_forecast_values(filepath)
+        is_error, forecast_error_output = validate_forecast_values(forecast)
 
     # Validate forecast file date = forecast_date column
-    is_date_error, forecast_date_output = filename_match_forecast_date(filepath)
+    is_date_error, forecast_date_output = filename_match_forecast_date(forecast)
     
     # Add to previously checked files
-    output_error_text = compile_output_errors(filepath,
+    output_error_text = compile_output_errors(forecast.filepath,
                                                       False, [],
                                                       is_error, forecast_error_output,
                                                       is_date_error, forecast_date_output)
     return output_error_text
     
+def check_forecast_file(filepath, forecast_file_path, text=None):
+    """
+    purpose: Run all checks on one forecast file of the data-processed folder
+
+    params:
+    * filepath: Full filepath of the forecast
+    * forecast_file_path: name of the model folder the forecast is in
+    * text: optional file contents, if already read
+
+    returns: list of error messages, [] if the forecast is valid
+    """
+    # Validate forecast file name = forecast file path
+    is_filename_error, filename_error_output = validate_forecast_file_name(filepath, forecast_file_path)
+
+    # Load the forecast once for all checks below
+    forecast = ForecastFile(filepath, text)
+
+    # Validate forecast file formatting
+    is_error, forecast_error_output = validate_forecast_file(forecast)
+
+    # validate predictions
+    if not is_error:
+        is_error, forecast_error_output = validate_forecast_values(forecast)
+
+
+    # Validate forecast file date = forecast_date column
+    is_date_error, forecast_date_output = filename_match_forecast_date(forecast)
+
+    return compile_output_errors(filepath,
+                                 is_filename_error, filename_error_output,
+                                 is_error, forecast_error_output,
+                                 is_date_error, forecast_date_output)
+
+
+def _check_forecast_files(forecast_tasks):
+    """
+    purpose: check_formatting() worker: run check_forecast_file() on a chunk of
+             (filepath, forecast_file_path, text) tasks, in order
+    """
+    return [check_forecast_file(filepath, forecast_file_path, text)
+            for filepath, forecast_file_path, text in forecast_tasks]
+
+
+def _chunk_forecast_tasks(forecast_tasks, chunking, chunksize):
+    """
+    purpose: split forecast tasks into the chunks sent to check_formatting() workers
+
+    params:
+    * forecast_tasks: list of (filepath, forecast_file_path, text) in validation order
+    * chunking: 'files' for chunks of `chunksize` files, 'models' for one chunk per model folder
+    * chunksize: number of files per chunk for 'files'
+    """
+    if chunking == 'models':
+        chunks = collections.defaultdict(list)  # keeps the order in which models are first seen
+        for forecast_task in forecast_tasks:
+            chunks[forecast_task[1]].append(forecast_task)
+        return list(chunks.values())
+    elif chunking == 'files':
+        return [forecast_tasks[i:i + chunksize] for i in range(0, len(forecast_tasks), chunksize)]
+    raise ValueError(f"chunking must be 'files' or 'models', not {chunking!r}")
+
+
 ## Check forecast formatting
-def check_formatting(my_path):
+def check_formatting(my_path, workers=1, chunking='files', chunksize=4, use_cache=True, dataset=False,
+                     forecast_paths=None):
     """
     purpose: Iterate through every forecast file and metadatadata 
              file and perform validation checks if haven't already.
@@ -188,9 +251,19 @@ def check_formatting(my_path):
 
     params:
     * my_path: string path to folder where forecasts are
+    * workers: number of processes for the forecast file checks. 1 checks
+      them in this process, None uses one process per CPU. Metadata checks
+      always run in this process, as they share state across models
+    * chunking: how forecast files are handed to workers, see _chunk_forecast_tasks()
+    * chunksize: number of files per chunk when chunking='files'
+    * use_cache: reuse the results of forecasts validated before, see ValidationCache
+    * dataset: check all forecast files at once, in one table, for full-hub
+      audits. Only the files that fail a check there are checked one by one,
+      see hub_dataset. workers and chunking are then not used
+    * forecast_paths: optional paths of the forecast files to validate, e.g.
+      the changed ones. The other forecasts are not validated. All metadata
+      files are still checked, as duplicate models are found across them
     """
-    #df = pd.read_csv('code/validation/validated_files.csv')
-    #previous_checked = list(df['file_path'])
     files_in_repository = []
     output_errors = {}
     meta_output_errors = {}
@@ -198,6 +271,12 @@ def check_formatting(my_path):
     existing_metadata_abbr = collections.defaultdict(list)
     errors_exist = False  # Keep track of errors
     metadata_validation_cache = {}
+    forecast_tasks = []  # (filepath, forecast_file_path, text) to check, in glob order
+    forecast_results = {}  # filepath -> list of error messages
+    validation_cache = ValidationCache() if use_cache else None
+    cache_keys = {}
+    if forecast_paths is not None:
+        forecast_paths = {os.path.normpath(forecast_path) for forecast_path in forecast_paths}
     
     # Iterate through processed csvs
     for path in glob.iglob(my_path + "**/**/", recursive=False):
@@ -226,44 +305,62 @@ def check_formatting(my_path):
         # Get filepath
         forecast_file_path = os.path.basename(os.path.dirname(path))
 
-        # Iterate through forecast files to validate format
+        # Collect forecast files to validate format
         for filepath in glob.iglob(path + "*.csv", recursive=False):
             files_in_repository += [filepath]
-
-            # Validate forecast file name = forecast file path
-            is_filename_error, filename_error_output = validate_forecast_file_name(filepath, forecast_file_path)
-
-            # Validate forecast file formatting
-            is_error, forecast_error_output = validate_forecast_file(filepath)
-
-            # validate predictions
-            if not is_error:
-                is_error, forecast_error_output = validate_forecast_values(filepath)
-
-
-            # Validate forecast file date = forecast_date column
-            is_date_error, forecast_date_output = filename_match_forecast_date(filepath)
-
-            # Add to previously checked files
-            output_error_text = compile_output_errors(filepath,
-                                                      is_filename_error, filename_error_output,
-                                                      is_error, forecast_error_output,
-                                                      is_date_error, forecast_date_output)
-            if output_error_text != []:
-                output_errors[filepath] = output_error_text
-
-            # Add validated file to locally_validated_files.csv
-            if len(output_errors) == 0:
-                current_time = datetime.now()
-
+            if forecast_paths is not None and os.path.normpath(filepath) not in forecast_paths:
+                continue
+
+            # Skip forecasts whose validation result is cached
+            with open(filepath, 'rb') as fp:
+                content = fp.read()
+            if validation_cache is not None:
+                cache_keys[filepath] = validation_cache.key(filepath, content)
+                cache_entry = validation_cache.get(filepath, cache_keys[filepath])
+                if cache_entry is not None:
+                    forecast_results[filepath] = cache_entry['errors']
+                    continue
+            forecast_tasks.append((filepath, forecast_file_path, content.decode('utf-8')))
+
+    # Validate forecast files, in parallel if asked to. Results come back in task order
+    forecast_warnings = {}  # filepath -> non-negativity warnings, for the files checked in one table with dataset=True
+    if dataset:
+        dataset_results, forecast_warnings = check_forecast_dataset(forecast_tasks, check_forecast_file)
+        forecast_chunks, chunk_results = [forecast_tasks], [dataset_results]
+        for filepath, warning in forecast_warnings.items():
+            if len(warning) > 0:
+                print(f"{filepath} {warning}\n")
+    elif workers == 1:
+        forecast_chunks = _chunk_forecast_tasks(forecast_tasks, chunking, chunksize)
+        chunk_results = list(map(_check_forecast_files, forecast_chunks))
+    else:
+        forecast_chunks = _chunk_forecast_tasks(forecast_tasks, chunking, chunksize)
+        # the workers get the hub config loaded here, rather than each loading (or downloading) it
+        with ProcessPoolExecutor(max_workers=workers, initializer=project.use_config_variables,
+                                 initargs=(project.config_variables(),)) as executor:
+            chunk_results = list(executor.map(_check_forecast_files, forecast_chunks))
+
+    for forecast_chunk, chunk_output_error_text in zip(forecast_chunks, chunk_results):
+        for (filepath, _, _), output_error_text in zip(forecast_chunk, chunk_output_error_text):
+            forecast_results[filepath] = output_error_text
+            if validation_cache is not None:
+                validation_cache.set(filepath, cache_keys[filepath], output_error_text,
+                                     forecast_warnings.get(filepath))
+
+    for filepath in files_in_repository:
+        if forecast_results.get(filepath, []) != []:  # not there if not in forecast_paths
+            output_errors[filepath] = forecast_results[filepath]
+
+    # Forget deleted forecasts and store the new results
+    if validation_cache is not None:
+        validation_cache.prune(files_in_repository)
+        validation_cache.save()
+        print(f"Reused {validation_cache.hits} cached forecast validation results, validated {len(forecast_tasks)} forecasts.")
 
     # Output duplicate model name or abbreviation metadata errors
     output_errors = output_duplicate_models(existing_metadata_abbr, output_errors)
     output_errors = output_duplicate_models(existing_metadata_name, output_errors)
 
-    # Update the locally_validated_files.csv
-    #update_checked_files(df, previous_checked, files_in_repository)
-
     # Error if necessary and print to console
     print_output_errors(meta_output_errors, prefix='metadata')
     print_output_errors(output_errors, prefix='data')
@@ -271,23 +368,30 @@ def check_formatting(my_path):
     if len(meta_output_errors) + len(output_errors) > 0:
         sys.exit("\n ERRORS FOUND EXITING BUILD...")
 
-# remove all entries of type files_changed from validated_files.csv
-def remove_all_entries_from_validated_files(files_changed):
-    val_path = './code/validation/validated_files.csv'
-    validated_files = pd.read_csv(val_path)
-    if len(files_changed)>0:
-        for f in files_changed:
-            validated_files = validated_files[validated_files.file_path != f]
-        validated_files.to_csv(val_path, index=False)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate all forecasts and metadata in data-processed")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes for the forecast file checks, 0 for one per CPU")
+    parser.add_argument('--chunking', choices=['files', 'models'], default='files',
+                        help="send workers chunks of files or one model folder at a time")
+    parser.add_argument('--chunksize', type=int, default=4, help="number of files per chunk with --chunking files")
+    parser.add_argument('--no-cache', action='store_true', help="validate all forecasts, ignoring cached results")
+    parser.add_argument('--dataset', action='store_true',
+                        help="check all forecasts at once, in one table, e.g. for a full-hub audit")
+    parser.add_argument('--git-base', default=os.environ.get('VALIDATION_GIT_BASE'),
+                        help="find the changed files with git, against this ref (e.g. origin/main), not the Github API")
+    args = parser.parse_args(argv)
 
-def main():
     my_path = "./data-processed"
     forecasts_changed = []
 
-    g = Github()
-    repo = g.get_repo('epiforecasts/covid19-forecast-hub-europe')    
-    
-    if os.environ.get('GITHUB_ACTIONS')=='true':
+    if args.git_base is not None:
+        files_changed = git_changed_files(args.git_base)
+        _, forecasts_err, _, _ = classify_changed_files(files_changed)
+        forecasts_changed.extend([f"./{file.filename}" for file in forecasts_err])
+    elif os.environ.get('GITHUB_ACTIONS')=='true':
+        g = Github()
+        repo = g.get_repo('epiforecasts/covid19-forecast-hub-europe')
         print(f"Github event name: {os.environ.get('GITHUB_EVENT_NAME')}")
         if os.environ.get('GITHUB_EVENT_NAME') == 'pull_request':
             # GIHUB_REF for PR is in the format: refs/pull/:prNumber/merge, extracting that here:
@@ -301,14 +405,18 @@ def main():
         if 'files_changed' in locals() and files_changed is not None:
             forecasts_changed.extend([f"./{file.filename}" for file in files_changed if file.filename.startswith('data-processed') and file.filename.endswith('.csv')])
     elif os.environ.get('TRAVIS')=='true':
+        g = Github()
+        repo = g.get_repo('epiforecasts/covid19-forecast-hub-europe')
         if os.environ.get('TRAVIS_EVENT_TYPE')=='pull_request':
             pr_num = int(os.environ.get('TRAVIS_PULL_REQUEST'))
             pr = repo.get_pull(pr_num)
             files_changed = [f for f in pr.get_files()]
             forecasts_changed.extend([f"./{file.filename}" for file in files_changed if file.filename.startswith('data-processed') and file.filename.endswith('.csv')])
-    remove_all_entries_from_validated_files(forecasts_changed)
     print(f"files changed: {forecasts_changed}")
-    check_formatting(my_path)
+    # with --git-base, only the changed forecasts are validated
+    check_formatting(my_path, workers=args.workers or None, chunking=args.chunking, chunksize=args.chunksize,
+                     use_cache=not args.no_cache, dataset=args.dataset,
+                     forecast_paths=forecasts_changed if args.git_base is not None else None)
 
 
 if __name__ == "__main__":
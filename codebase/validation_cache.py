@@ -0,0 +1,117 @@
+"""
+Persistent cache of forecast validation results, so that forecasts that did not
+change since they were last validated are not validated again.
+
+A cached result is used only if its key matches, where the key is a hash of:
+- the file path and contents (the filename and forecast_date checks depend on the name)
+- the validation code version: a hash of the codebase sources
+- the hub config: project_variables.CONFIG_HASH
+- the error report setting: error_summary.ERROR_SAMPLES
+
+The cache is a json file (VALIDATION_CACHE, default .validation-cache.json)
+holding one entry per file path:
+  {filepath: {'key': ..., 'passed': bool, 'errors': [...], 'warnings': ...}}
+"""
+
+# Standard modules
+import glob
+import hashlib
+import json
+import os
+
+import codebase.project_variables as project
+from .error_summary import ERROR_SAMPLES
+
+VALIDATION_CACHE_FILE = os.environ.get('VALIDATION_CACHE', '.validation-cache.json')
+
+_code_version = None
+
+
+def code_version():
+    """
+    :return: a hash of the validation code, i.e. every module in the codebase package
+    """
+    global _code_version
+    if _code_version is None:
+        code_hash = hashlib.sha256()
+        codebase_dir = os.path.dirname(os.path.abspath(__file__))
+        for source_file in sorted(glob.glob(os.path.join(codebase_dir, '**', '*.py'), recursive=True)):
+            code_hash.update(os.path.relpath(source_file, codebase_dir).encode('utf-8'))
+            with open(source_file, 'rb') as fp:
+                code_hash.update(fp.read())
+        _code_version = code_hash.hexdigest()
+    return _code_version
+
+
+class ValidationCache:
+    """
+    purpose: look up and store validation results of forecast files
+
+    params:
+    * path: json file the cache is loaded from and saved to
+    """
+
+    def __init__(self, path=VALIDATION_CACHE_FILE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(path) as fp:
+                self.entries = json.load(fp)
+        except (OSError, ValueError):
+            self.entries = {}
+        self._changed = False
+
+    def key(self, filepath, content):
+        """
+        :param filepath: path of the forecast
+        :param content: the file contents, as bytes
+        :return: the cache key of the file (see module docstring)
+        """
+        key_hash = hashlib.sha256()
+        for part in (filepath.encode('utf-8'), hashlib.sha256(content).digest(),
+                     code_version().encode('utf-8'), project.CONFIG_HASH.encode('utf-8'),
+                     str(ERROR_SAMPLES).encode('utf-8')):
+            key_hash.update(part)
+            key_hash.update(b'\0')
+        return key_hash.hexdigest()
+
+    def get(self, filepath, key):
+        """
+        :return: the cached entry of filepath if it was stored with `key`, None o/w
+        """
+        entry = self.entries.get(filepath)
+        if entry is not None and entry['key'] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def set(self, filepath, key, errors, warnings=None):
+        """
+        purpose: store the validation result of filepath, replacing any older one
+
+        params:
+        * errors: list of error messages, [] if the file passed
+        * warnings: optional warnings to store with it
+        """
+        self.entries[filepath] = {'key': key, 'passed': not errors, 'errors': errors, 'warnings': warnings}
+        self._changed = True
+
+    def prune(self, filepaths):
+        """
+        purpose: evict the entries of files that are not in filepaths, e.g. deleted forecasts
+        """
+        filepaths = set(filepaths)
+        for filepath in [filepath for filepath in self.entries if filepath not in filepaths]:
+            del self.entries[filepath]
+            self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+        # write to a temporary file first so that an interrupted run never leaves a partial cache
+        with open(self.path + '.tmp', 'w') as fp:
+            json.dump(self.entries, fp)
+        os.replace(self.path + '.tmp', self.path)
+        self._changed = False
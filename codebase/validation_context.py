@@ -0,0 +1,86 @@
+"""
+The hub config in the form the forecast validators look things up in, built
+once per config and shared by every validator:
+
+- the valid locations and target names as frozensets
+- the valid quantiles as a frozenset of floats. A quantile must equal one of
+  them exactly, as with the list of the config: 0.5000000000001 is invalid
+- the number of weeks ahead of each valid target, parsed once from the config
+  horizons rather than from each row's target string
+- the population of each location, as an array aligned with a hashed index
+  of the location codes, see `location_populations()`
+
+`get_validation_context()` gives the context of the current hub config. It is
+rebuilt only when the config changes, see `project_variables.configure()`.
+"""
+
+# Standard modules
+import collections
+
+# To list in requirements.txt
+import numpy as np
+import pandas as pd
+
+# Local modules
+import codebase.project_variables as project
+
+ValidationContext = collections.namedtuple('ValidationContext',
+                                           ['locations', 'target_names', 'quantiles', 'target_horizons',
+                                            'location_index', 'populations', 'config_hash'])
+
+
+def validation_context(locations, target_variables, horizons, quantiles, populations=None, config_hash=None):
+    """
+    :param locations: valid location codes
+    :param target_variables: e.g. ['inc case', 'inc death']
+    :param horizons: valid numbers of weeks ahead, e.g. [1, 2, 3, 4]
+    :param quantiles: valid quantiles
+    :param populations: the population of each location, in the order of `locations`. None if not known
+    :param config_hash: identifies the config the context was built from
+    :return: a ValidationContext. targets are named f"{horizon} wk ahead {target_variable}", as in the hub config.
+        its target_horizons dict is shared and must not be modified. it stays a dict so that the context can be
+        pickled, e.g. to worker processes
+    """
+    locations = list(locations)
+    target_horizons = {f"{horizon} wk ahead {target_variable}": int(horizon)
+                       for horizon in horizons for target_variable in target_variables}
+    return ValidationContext(locations=frozenset(locations),
+                             target_names=frozenset(target_horizons),
+                             quantiles=frozenset(float(quantile) for quantile in quantiles),
+                             target_horizons=target_horizons,
+                             location_index=pd.Index(locations),
+                             populations=None if populations is None else np.asarray(populations),
+                             config_hash=config_hash)
+
+
+def location_populations(context, locations):
+    """
+    :param context: a ValidationContext with populations
+    :param locations: array-like of location codes, e.g. a forecast's location column
+    :return: array of the population of each location, gathered through the location index. as a left merge with the
+        locations table would give them: NaN for unknown locations, in which case the array is of floats
+    """
+    positions = context.location_index.get_indexer(locations)
+    populations = context.populations[positions]
+    is_unknown = positions < 0
+    if is_unknown.any():
+        populations = np.where(is_unknown, np.nan, populations)
+    return populations
+
+
+_context = None
+
+
+def get_validation_context():
+    """
+    :return: the ValidationContext of the hub config in use, built on first use and again only if the config changed
+    """
+    global _context
+    if _context is None or _context.config_hash != project.CONFIG_HASH:
+        _context = validation_context(locations=project.CODES['location'],
+                                      target_variables=project.project_config['target_variables'],
+                                      horizons=project.HORIZONS,
+                                      quantiles=project.VALID_QUANTILES,
+                                      populations=project.CODES['population'],
+                                      config_hash=project.CONFIG_HASH)
+    return _context
@@ -8,17 +8,21 @@ Compatible with any forecast date
 # Standard modules
 import os
 
-# To list in requirements.txt
-import pandas as pd
+# Local modules
+from codebase.forecast_file import as_forecast_file
 
-def filename_match_forecast_date(filepath):
-    df = pd.read_csv(filepath)
+def filename_match_forecast_date(forecast):
+    forecast = as_forecast_file(forecast)
+    filepath = forecast.filepath
+    df = forecast.df
     file_forecast_date = os.path.basename(os.path.basename(filepath))[:10]
     if 'forecast_date' in df:
         forecast_date_column = set(list(df['forecast_date']))
         if len(forecast_date_column) > 1:
+            # sorted, so that the message is the same in every process
+            forecast_dates = '{%s}' % ', '.join(map(repr, sorted(forecast_date_column, key=str)))
             return True, ["FORECAST DATE ERROR: %s has multiple forecast dates: %s. Forecast date must be unique" % (
-                filepath, forecast_date_column)]
+                filepath, forecast_dates)]
         else:
             forecast_date_column = forecast_date_column.pop()
             if (file_forecast_date != forecast_date_column):
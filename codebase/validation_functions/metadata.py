@@ -1,4 +1,5 @@
 # Standard modules
+import functools
 import os
 import glob
 import re
@@ -9,143 +10,229 @@ import dateutil
 from dateutil.parser import parse
 import yaml
 import pandas as pd
+import pykwalify
+from pykwalify.compat import yml
 from pykwalify.core import Core
+from pykwalify.rule import Rule
+
+# Local modules
+from codebase.metadata_documents import metadata_documents
 
 SCHEMA_FILE = 'schema.yml'
+LICENSES_FILE = 'accepted-licenses.csv'
 DESIGNATED_MODEL_CACHE_KEY = 'designated_model_cache'
 
-def validate_metadata_contents(metadata, filepath, cache):
-    # Initialize output
-    is_metadata_error = False
-    metadata_error_output = []
+MODEL_FILE_PAT = re.compile(r"(.+)\.yml")
+URL_PAT = re.compile(
+    r'^(?:http|ftp)s?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
-    core = Core(source_file=filepath, schema_files=["schema.yml"])
-    core.validate(raise_exception=False)
 
-    if len(core.validation_errors)>0:
-        metadata_error_output.extend(['METADATA_ERROR: %s' % err for err in core.validation_errors])
-        is_metadata_error = True
+class _CompiledSchemaCore(Core):
+    """
+    A pykwalify Core that validates with a root rule built beforehand, instead of building it from the schema on
+    every validation. Overrides the private `Core._start_validate()` of pykwalify 1.8, hence the pin in
+    requirements.txt. Its "schema;" partial schemas are registered by `MetadataValidator`, once
+    """
 
-    pat_model = re.compile(r"(.+)\.yml")
-    model_name_file = re.findall(pat_model, os.path.basename(filepath))[0]
-    click.echo(f"* validating metadata_file '{model_name_file}.yml'...")
+    def __init__(self, source_data, schema_data, root_rule):
+        super().__init__(source_data=source_data, schema_data=schema_data)
+        self._compiled_root_rule = root_rule
 
-    # This is a critical error and hence do not run further checks.
-    if 'model_abbr' not in metadata:
-        metadata_error_output.extend(['METADATA_ERROR: model_abbr key not present in the metadata file'])
-        is_metadata_error = True
-        return is_metadata_error, metadata_error_output
+    def _start_validate(self, value=None):
+        self.errors = []
+        self.root_rule = self._compiled_root_rule
+        self._validate(value, self.root_rule, "", [])
 
-    if model_name_file != metadata['model_abbr']:
-        metadata_error_output.append(f"METADATA_ERROR: Model abreviation in metadata inconsistent with folder name for model_abbr={metadata['model_abbr']} as specified in metadata. NOTE: model name on file is: {model_name_file}")
-        is_metadata_error = True
-    metadata['team_abbr'] = metadata['model_abbr'].split('-')[0]
-    # Check if every team has only one `team_model_designation` as `primary`
-    if 'team_abbr' in metadata.keys():
-        # add designated primary model acche entry to the cache if not present
-        if DESIGNATED_MODEL_CACHE_KEY not in cache:
-            cache[DESIGNATED_MODEL_CACHE_KEY] = []
-        
-        # if the current models designation is primary AND the team_name is already present in the cache, then report error
-        if metadata['team_abbr'] in cache[DESIGNATED_MODEL_CACHE_KEY] and metadata['team_model_designation'] == 'primary':
+
+class MetadataValidator:
+    """
+    purpose: validate metadata documents against the schema and the hub rules. The schema, its pykwalify rules and
+        the accepted licenses are loaded once, when the validator is created, so that one validator checks any
+        number of files. Use `get_metadata_validator()` for the validator of the current process
+    params:
+        schema_file: pykwalify schema of the metadata files
+        licenses_file: csv file of the accepted licenses, in its 'license' column
+    """
+
+    def __init__(self, schema_file=SCHEMA_FILE, licenses_file=LICENSES_FILE):
+        with open(schema_file, 'r') as stream:
+            schema = yml.load(stream)
+        # as `Core._start_validate()` does: "schema;<name>" partial schemas are registered before the root rule is built
+        self.schema = {}
+        for key, value in schema.items():
+            if key.startswith("schema;"):
+                pykwalify.partial_schemas[key.split(";", 1)[1]] = Rule(schema=value)
+            else:
+                self.schema[key] = value
+        self.root_rule = Rule(schema=self.schema)
+        self.accepted_licenses = frozenset(pd.read_csv(licenses_file)['license'])
+
+    def schema_errors(self, document):
+        """
+        purpose: validate a metadata document against the schema
+        params:
+            document: the metadata, as parsed by pykwalify's yaml loader (typed values)
+        returns: list of pykwalify error messages
+        """
+        core = _CompiledSchemaCore(document, self.schema, self.root_rule)
+        core.validate(raise_exception=False)
+        return core.validation_errors
+
+    def validate(self, metadata, filepath, cache, document):
+        """
+        purpose: validate a parsed metadata file
+        params:
+            metadata: the metadata, as parsed by yaml.BaseLoader (string values)
+            filepath: path of the metadata file, for its model name and the messages
+            cache: dict shared by the files of a run, to check the primary designation of each team
+            document: the metadata, as parsed by pykwalify's yaml loader, for the schema validation
+        returns: (is_metadata_error, metadata_error_output)
+        """
+        # Initialize output
+        is_metadata_error = False
+        metadata_error_output = []
+
+        schema_errors = self.schema_errors(document)
+        if len(schema_errors)>0:
+            metadata_error_output.extend(['METADATA_ERROR: %s' % err for err in schema_errors])
             is_metadata_error = True
-            metadata_error_output.append('METADATA ERROR: %s has more than 1 model designated as \"primary\"' % (metadata['team_abbr']))
-        # else if the current model designation is "primary", then add it to the cache
-        elif metadata['team_model_designation'] == 'primary':
-            cache[DESIGNATED_MODEL_CACHE_KEY].append(metadata['team_abbr'])
+
+        model_name_file = re.findall(MODEL_FILE_PAT, os.path.basename(filepath))[0]
+        click.echo(f"* validating metadata_file '{model_name_file}.yml'...")
+
+        # This is a critical error and hence do not run further checks.
+        if 'model_abbr' not in metadata:
+            metadata_error_output.extend(['METADATA_ERROR: model_abbr key not present in the metadata file'])
+            is_metadata_error = True
+            return is_metadata_error, metadata_error_output
+
+        if model_name_file != metadata['model_abbr']:
+            metadata_error_output.append(f"METADATA_ERROR: Model abreviation in metadata inconsistent with folder name for model_abbr={metadata['model_abbr']} as specified in metadata. NOTE: model name on file is: {model_name_file}")
+            is_metadata_error = True
+        metadata['team_abbr'] = metadata['model_abbr'].split('-')[0]
+        # Check if every team has only one `team_model_designation` as `primary`
+        if 'team_abbr' in metadata.keys():
+            # add designated primary model acche entry to the cache if not present
+            if DESIGNATED_MODEL_CACHE_KEY not in cache:
+                cache[DESIGNATED_MODEL_CACHE_KEY] = []
+        
+            # if the current models designation is primary AND the team_name is already present in the cache, then report error
+            if metadata['team_abbr'] in cache[DESIGNATED_MODEL_CACHE_KEY] and metadata['team_model_designation'] == 'primary':
+                is_metadata_error = True
+                metadata_error_output.append('METADATA ERROR: %s has more than 1 model designated as \"primary\"' % (metadata['team_abbr']))
+            # else if the current model designation is "primary", then add it to the cache
+            elif metadata['team_model_designation'] == 'primary':
+                cache[DESIGNATED_MODEL_CACHE_KEY].append(metadata['team_abbr'])
     
-    # if `this_model_is_an_emnsemble` is rpesent, show a warning.
+        # if `this_model_is_an_emnsemble` is rpesent, show a warning.
     
-    # Check for Required Fields
-    required_fields = ['team_name', 'team_abbr', 'model_name', 'model_contributors', 'model_abbr', 'website_url','license', 'team_model_designation', 'methods']
-    # required_fields = ['team_name', 'team_abbr', 'model_name', 'model_abbr',\
-    #                        'methods', 'team_url', 'license', 'include_in_ensemble_and_visualization']
+        # Check for Required Fields
+        required_fields = ['team_name', 'team_abbr', 'model_name', 'model_contributors', 'model_abbr', 'website_url','license', 'team_model_designation', 'methods']
+        # required_fields = ['team_name', 'team_abbr', 'model_name', 'model_abbr',\
+        #                        'methods', 'team_url', 'license', 'include_in_ensemble_and_visualization']
     
-    # for field in required_fields:
-    #     if field not in metadata.keys():
-    #         is_metadata_error = True
-    #         metadata_error_output += ["METADATA ERROR: %s missing '%s'" % (filepath, field)]
-
-    # Check methods character length (warning not error)
-    # if 'methods' in metadata.keys():
-    #     methods_char_lenth = len(metadata['methods'])
-    #     if methods_char_lenth > 200:
-    #         metadata_error_output += [
-    #             "METADATA WARNING: %s methods is too many characters (%i should be less than 200)" %
-    #             (filepath, methods_char_lenth)]
-
-    # Check if forecast_startdate is date
-    if 'forecast_startdate' in metadata.keys():
-        forecast_startdate = str(metadata['forecast_startdate'])
-        try:
-            dateutil.parser.parse(forecast_startdate)
-            is_date = True
-        except ValueError:
-            is_date = False
-        if not is_date:
-            is_metadata_error = True
-            metadata_error_output += [
-                "METADATA ERROR: %s forecast_startdate %s must be a date and should be in YYYY-MM-DD format" %
-                (filepath, forecast_startdate)]
-
-    # Check if this_model_is_an_ensemble and this_model_is_unconditional are boolean
-    boolean_fields = ['this_model_is_an_ensemble', 'this_model_is_unconditional',
-                      'include_in_ensemble_and_visualization']
-    possible_booleans = ['true', 'false']
-    for field in boolean_fields:
-        if field in metadata.keys():
-            if metadata[field] not in possible_booleans:
+        # for field in required_fields:
+        #     if field not in metadata.keys():
+        #         is_metadata_error = True
+        #         metadata_error_output += ["METADATA ERROR: %s missing '%s'" % (filepath, field)]
+
+        # Check methods character length (warning not error)
+        # if 'methods' in metadata.keys():
+        #     methods_char_lenth = len(metadata['methods'])
+        #     if methods_char_lenth > 200:
+        #         metadata_error_output += [
+        #             "METADATA WARNING: %s methods is too many characters (%i should be less than 200)" %
+        #             (filepath, methods_char_lenth)]
+
+        # Check if forecast_startdate is date
+        if 'forecast_startdate' in metadata.keys():
+            forecast_startdate = str(metadata['forecast_startdate'])
+            try:
+                dateutil.parser.parse(forecast_startdate)
+                is_date = True
+            except ValueError:
+                is_date = False
+            if not is_date:
                 is_metadata_error = True
                 metadata_error_output += [
-                    "METADATA ERROR: %s '%s' field must be lowercase boolean (true, false) not '%s'" %
-                    (filepath, field, metadata[field])]
-
-    # Validate team URLS
-    regex = re.compile(
-        r'^(?:http|ftp)s?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-
-    # if 'team_url' in metadata.keys():
-    #     if re.match(regex, str(metadata['team_url'])) is None:
-    #         is_metadata_error = True
-    #         metadata_error_output += [
-    #             "METADATA ERROR: %s 'team_url' field must be a full URL (https://www.example.com) '%s'" %
-    #             (filepath, metadata[field])]
-
-    # Validate licenses
-    license_df = pd.read_csv('accepted-licenses.csv')
-    accepted_licenses = list(license_df['license'])
-    if 'license' in metadata.keys():
-        if metadata['license'] not in accepted_licenses:
-            is_metadata_error = True
-            metadata_error_output += [
-                "METADATA ERROR: %s 'license' field must be in `./code/accepted-licenses.csv` 'license' column '%s'" %
-                (filepath, metadata['license'])]
-    return is_metadata_error, metadata_error_output
-
-
-def check_metadata_file(filepath, cache={}):
-    with open(filepath, 'r') as stream:
-        try:
-            Loader = yaml.BaseLoader  # Define Loader to avoid true/false auto conversion
-            metadata = yaml.load(stream, Loader=yaml.BaseLoader)
-            is_metadata_error, metadata_error_output = validate_metadata_contents(metadata, filepath, cache)
-            if is_metadata_error:
-                return True, metadata_error_output
-            else:
-                return False, "no errors"
-        except yaml.YAMLError as exc:
-            return True, [
-                "METADATA ERROR: Metadata YAML Fromat Error for %s file. \
+                    "METADATA ERROR: %s forecast_startdate %s must be a date and should be in YYYY-MM-DD format" %
+                    (filepath, forecast_startdate)]
+
+        # Check if this_model_is_an_ensemble and this_model_is_unconditional are boolean
+        boolean_fields = ['this_model_is_an_ensemble', 'this_model_is_unconditional',
+                          'include_in_ensemble_and_visualization']
+        possible_booleans = ['true', 'false']
+        for field in boolean_fields:
+            if field in metadata.keys():
+                if metadata[field] not in possible_booleans:
+                    is_metadata_error = True
+                    metadata_error_output += [
+                        "METADATA ERROR: %s '%s' field must be lowercase boolean (true, false) not '%s'" %
+                        (filepath, field, metadata[field])]
+
+        # Validate team URLS
+        # if 'team_url' in metadata.keys():
+        #     if re.match(URL_PAT, str(metadata['team_url'])) is None:
+        #         is_metadata_error = True
+        #         metadata_error_output += [
+        #             "METADATA ERROR: %s 'team_url' field must be a full URL (https://www.example.com) '%s'" %
+        #             (filepath, metadata[field])]
+
+        # Validate licenses
+        if 'license' in metadata.keys():
+            if metadata['license'] not in self.accepted_licenses:
+                is_metadata_error = True
+                metadata_error_output += [
+                    "METADATA ERROR: %s 'license' field must be in `./code/accepted-licenses.csv` 'license' column '%s'" %
+                    (filepath, metadata['license'])]
+        return is_metadata_error, metadata_error_output
+
+
+@functools.lru_cache(maxsize=None)
+def get_metadata_validator(schema_file=SCHEMA_FILE, licenses_file=LICENSES_FILE):
+    """
+    purpose: the MetadataValidator of this process, created on first use
+    """
+    return MetadataValidator(schema_file, licenses_file)
+
+
+def validate_metadata_contents(metadata, filepath, cache, text=None):
+    """
+    purpose: validate a metadata file with the validator of this process, see `MetadataValidator.validate()`
+    params:
+        text: optional contents of the metadata file. If not given, the file is read from filepath
+    """
+    document = metadata_documents.get(filepath, text)
+    return get_metadata_validator().validate(metadata, filepath, cache, document.typed)
+
+
+def check_metadata_file(filepath, cache={}, text=None):
+    """
+    text: optional contents of the metadata file. If given, filepath is only used for its name
+    """
+    try:
+        # parsed once, see `metadata_documents`. The strings avoid true/false auto conversion
+        document = metadata_documents.get(filepath, text)
+        metadata = dict(document.strings)  # a copy: the checks add 'team_abbr'
+        is_metadata_error, metadata_error_output = get_metadata_validator().validate(metadata, filepath, cache,
+                                                                                     document.typed)
+        if is_metadata_error:
+            return True, metadata_error_output
+        else:
+            return False, "no errors"
+    except yaml.YAMLError as exc:
+        return True, [
+            "METADATA ERROR: Metadata YAML Fromat Error for %s file. \
                     \nCommon fixes (if parse error message is unclear):\
                     \n* Try converting all tabs to spaces \
                     \n* Try copying the example metadata file and follow formatting closely \
                     \n Parse Error Message:\n%s \n"
-                % (filepath, exc)]
+            % (filepath, exc)]
 
 
 
@@ -173,18 +260,17 @@ def get_metadata_model(filepath):
     model_name = None
     model_abbr = None
     
-    with open(metdata_dir, 'r') as stream:
-        try:
-            metadata = yaml.safe_load(stream)
-            # Output model name and model abbr if exists
-            if 'model_name' in metadata.keys():
-                model_name = metadata['model_name']
-            if 'model_abbr' in metadata.keys():
-                model_abbr = metadata['model_abbr']
-
-            return model_name, model_abbr
-        except yaml.YAMLError as exc:
-            return None, None
+    try:
+        metadata = metadata_documents.get(metdata_dir).typed
+    except yaml.YAMLError as exc:
+        return None, None
+    # Output model name and model abbr if exists
+    if 'model_name' in metadata.keys():
+        model_name = metadata['model_name']
+    if 'model_abbr' in metadata.keys():
+        model_abbr = metadata['model_abbr']
+
+    return model_name, model_abbr
 
 
 def output_duplicate_models(existing_metadata_name, output_errors):
@@ -5,13 +5,13 @@ Created on Fri Mar 26 15:18:25 2021
 @author: Jannik
 """
 
-import pandas as pd
+from codebase.forecast_file import as_forecast_file
 
 def non_negative_values(file):
     """
     Parameters
     ----------
-    file : path
+    file : ForecastFile or path
 
     Returns
     -------
@@ -21,7 +21,7 @@ def non_negative_values(file):
     
     result = []
     
-    df = pd.read_csv(file)
+    df = as_forecast_file(file).df
     negative = df["value"]<0
     
     
@@ -5,51 +5,60 @@ Created on Sat Mar  6 19:04:35 2021
 @author: Jannik
 """
 
-import re
+import argparse
 import os
 import json
 import glob
 from github import Github
-import github
-import urllib.request
 import sys
 import shutil
 
 from codebase.test_formatting import forecast_check, print_output_errors
+from codebase.changed_files import classify_changed_files, git_changed_files
+from codebase.forecast_file import ForecastFile
+from codebase.metadata_index import existing_metadata_names, find_hub_checkout
+from codebase.pr_files import download_files, http_session
+from codebase.validation_cache import ValidationCache
 from codebase.validation_functions.metadata import check_metadata_file
 from codebase.validation_functions.non_negative_forecasts import non_negative_values
 
-# Pattern that matches a forecast file added to the data-processed folder.
-# Test this regex usiing this link: https://regex101.com/r/wmajJA/1
-pat = re.compile(r"^data-processed/(.+)/\d\d\d\d-\d\d-\d\d-\1\.csv$")
-pat_meta = re.compile(r"^model-metadata/.+\.yml$")
-pat_other = re.compile(r"^data-processed/(.+)\.csv$")
+parser = argparse.ArgumentParser(description="Validate the forecasts and metadata changed in a PR")
+parser.add_argument('--git-base', default=os.environ.get('VALIDATION_GIT_BASE'),
+                    help="validate the files changed in the local git checkout since it branched off this ref "
+                         "(e.g. origin/main), offline and without the Github API")
+args = parser.parse_args()
+git_mode = args.git_base is not None
 
 # Identify if local or Github event
 local = os.environ.get('CI') != 'true'
-fresh_pr = os.environ.get('GITHUB_EVENT_NAME') in ['pull_request', 'pull_request_target']
+fresh_pr = os.environ.get('GITHUB_EVENT_NAME') in ['pull_request', 'pull_request_target'] and not git_mode
 
-# Set up token
-if local:
+if git_mode:
+    print(f"Running on LOCAL GIT mode, comparing to {args.git_base}.")
     token = None
-    print("Running on LOCAL mode.")
+    repo = None
 else:
-    print("Added token")
-    token  = os.environ.get('GH_TOKEN')
-
-if token is None:
-    g = Github()
-else:
-    print(f"Token length: {len(token)}")
-    g = Github(token)
-
-# Mount repository
-repo_name = os.environ.get('GITHUB_REPOSITORY')
-if repo_name is None:
-    repo_name = 'epiforecasts/covid19-forecast-hub-europe'
-repo = g.get_repo(repo_name)
-
-print(f"Github repository: {repo_name}")
+    # Set up token
+    if local:
+        token = None
+        print("Running on LOCAL mode.")
+    else:
+        print("Added token")
+        token  = os.environ.get('GH_TOKEN')
+
+    if token is None:
+        g = Github()
+    else:
+        print(f"Token length: {len(token)}")
+        g = Github(token)
+
+    # Mount repository
+    repo_name = os.environ.get('GITHUB_REPOSITORY')
+    if repo_name is None:
+        repo_name = 'epiforecasts/covid19-forecast-hub-europe'
+    repo = g.get_repo(repo_name)
+
+    print(f"Github repository: {repo_name}")
 
 if fresh_pr:
     print(f"Github event name: {os.environ.get('GITHUB_EVENT_NAME')}")
@@ -59,7 +68,11 @@ pr = None
 comment = ''
 files_changed = []
 
-if fresh_pr:
+if git_mode:
+    # the changes of the local checkout, with the same attributes as the Github API files
+    files_changed += git_changed_files(args.git_base)
+
+elif fresh_pr:
     # Fetch the  PR number from the event json
     pr_num = event['pull_request']['number']
     print(f"PR number: {pr_num}")
@@ -78,12 +91,9 @@ elif local and not glob.glob("./forecasts/*.csv"):
     pr = repo.get_pull(int(pr_num))
     files_changed +=[f for f in pr.get_files()]
 
-forecasts = [file for file in files_changed if pat.match(file.filename) is not None]
-forecasts_err = [file for file in files_changed if pat_other.match(file.filename) is not None]
-metadatas = [file for file in files_changed if pat_meta.match(file.filename) is not None]
-other_files = [file for file in files_changed if (pat.match(file.filename) is None and pat_meta.match(file.filename) is None)]
+forecasts, forecasts_err, metadatas, other_files = classify_changed_files(files_changed)
 
-if fresh_pr:
+if fresh_pr or git_mode:
     # IF there are other fields changed in the PR
     if len(other_files) > 0 and len(forecasts) >0 :
         print("PR has other files changed too.")
@@ -111,37 +121,59 @@ if fresh_pr:
     if changed_forecasts:
         comment += "\n Your submission seem to have updated/renamed some forecasts. Could you provide a reason? Thank you!\n\n"
 
-# Download all forecasts
-# create a forecasts directory
-os.makedirs('forecasts', exist_ok=True)
-
-# Download all forecasts changed in the PR into the forecasts folder
-for f in forecasts:
-    if f.status != "removed":
-        urllib.request.urlretrieve(f.raw_url, f"./forecasts/{f.filename.split('/')[-1]}")
-
-# Download all metadata files changed in the PR into the forecasts folder
-for f in metadatas:
-    if f.status != "removed":
-        urllib.request.urlretrieve(f.raw_url, f"./forecasts/{f.filename.split('/')[-1]}")
+# Contents of the files to validate, by path. Files put in the forecasts folder by hand (local mode) are read from disk
+pr_files = {}
+for file in sorted(glob.glob("./forecasts/*.csv") + glob.glob("./forecasts/*.yml")):
+    with open(file, 'rb') as fp:
+        pr_files[file] = fp.read()
+
+# Download all forecasts and metadata files changed in the PR, concurrently and into memory
+downloads = [f for f in forecasts + metadatas if f.status != "removed"]
+if git_mode:
+    contents = []
+    for f in downloads:
+        with open(f.filename, 'rb') as fp:
+            contents.append(fp.read())
+else:
+    contents = download_files([f.raw_url for f in downloads], session=http_session(token=token))
+for f, content in zip(downloads, contents):
+    pr_files[f"./forecasts/{f.filename.split('/')[-1]}"] = content
 
 # Run validations on each of these files
 errors = {}
 warnings = {}
+validation_cache = ValidationCache()
+
+for file, content in pr_files.items():
+    if not file.endswith('.csv'):
+        continue
+
+    # reuse the result if this forecast was validated before
+    cache_key = validation_cache.key(file, content)
+    cache_entry = validation_cache.get(file, cache_key)
+    if cache_entry is not None:
+        error_file, warning = cache_entry['errors'], cache_entry['warnings']
+    else:
+        # parse each forecast once, shared by all checks
+        forecast = ForecastFile(file, content.decode('utf-8'))
+        error_file = forecast_check(forecast)
+        warning = non_negative_values(forecast)
+        validation_cache.set(file, cache_key, error_file, warning)
 
-for file in glob.glob("./forecasts/*.csv"):
-    error_file = forecast_check(file)
-    warning = non_negative_values(file)
     if len(error_file) >0:
         errors[os.path.basename(file)] = error_file
 
     if len(warning) > 0:
         warnings[os.path.basename(file)] = warning
 
+validation_cache.save()
+
 is_meta_error = False
 meta_err_output = {}
-for file in glob.glob("./forecasts/*.yml"):
-    is_metadata_error, metadata_error_output = check_metadata_file(file)
+for file, content in pr_files.items():
+    if not file.endswith('.yml'):
+        continue
+    is_metadata_error, metadata_error_output = check_metadata_file(file, text=content.decode('utf-8'))
     if is_metadata_error:
         is_meta_error = True
         meta_err_output[file] = metadata_error_output
@@ -158,13 +190,13 @@ if data_processed_changes:
             team_names.append(file.filename.split("/")[-2])
         team_names = set(team_names)
 
-        # if the PR doesnt add a metadatafile we have to check if there is a existing file in the main repo
+        # if the PR doesnt add a metadatafile we have to check if there is a existing file in the main repo,
+        # listed once from a local checkout or the Github API
+        existing_metadata = existing_metadata_names(repo, checkout='.' if git_mode else find_hub_checkout(),
+                                                    model_names=team_names)
         for name in team_names:
-            try:
-                repo.get_contents("model-metadata/{}.yml".format(name))
-
             # metadata file doesnt exist and is not added in the PR
-            except github.UnknownObjectException:
+            if name not in existing_metadata:
                 is_meta_error = True
                 meta_err_output["{}.yml".format(name)] = ["Missing Metadata"]
 
@@ -184,18 +216,23 @@ if is_meta_error:
 print_output_errors(meta_err_output, prefix="metadata")
 
 # add the consolidated comment to the PR
-if comment!='' and not local:
+if comment!='' and not local and pr is not None:
     pr.create_issue_comment(comment)
+elif comment!='' and git_mode:
+    print(comment)
 
 if is_meta_error or len(errors)>0:
-    shutil.rmtree("./forecasts")
+    shutil.rmtree("./forecasts", ignore_errors=True)
     sys.exit("\n ERRORS FOUND EXITING BUILD...")
 
 if len(warnings) > 0:
     warning_message = ""
     for file in warnings.keys():
         warning_message += str(file) + " " + warnings[file] + "\n\n"
-    pr.create_issue_comment(warning_message)
+    if pr is not None:
+        pr.create_issue_comment(warning_message)
+    else:
+        print(warning_message)
 
 # delete checked files from validation
-shutil.rmtree("forecasts")
+shutil.rmtree("forecasts", ignore_errors=True)
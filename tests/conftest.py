@@ -0,0 +1,84 @@
+"""
+Shared setup of the tests:
+- a small hub config (4 locations, 1 to 4 wk ahead inc case and inc death
+  targets), used through the HUB_PROJECT_CONFIG and HUB_LOCATIONS environment
+  variables, so that nothing is downloaded
+- functions that write valid forecasts and model folders of a hub
+"""
+
+# Standard modules
+import datetime
+import json
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+HUB_CONFIG = {'repo_url': 'https://github.com/epiforecasts/covid19-forecast-hub-europe',
+              'forecast_week_day': 'Monday',
+              'horizon': {'values': [1, 2, 3, 4]},
+              'target_variables': ['inc case', 'inc death'],
+              'forecast_type': {'quantiles': [0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5,
+                                              0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.975, 0.99]}}
+LOCATIONS = [('Austria', 'AT', 8901064), ('Belgium', 'BE', 11549888), ('Germany', 'DE', 83166711),
+             ('France', 'FR', 67320216)]
+FORECAST_DATE = '2021-07-12'  # a Monday
+
+METADATA = """team_name: Team {model}
+model_name: Model {model}
+model_abbr: {model}
+model_contributors:
+  - name: A Person
+website_url: https://example.org
+license: cc-by-4.0
+team_model_designation: primary
+methods: Some methods
+this_model_is_an_ensemble: false
+"""
+
+_config_dir = tempfile.mkdtemp(prefix='hub-config-')
+with open(os.path.join(_config_dir, 'project-config.json'), 'w') as fp:
+    json.dump(HUB_CONFIG, fp)
+with open(os.path.join(_config_dir, 'locations_eu.csv'), 'w') as fp:
+    fp.write('location_name,location,population\n')
+    fp.writelines(f'{name},{code},{population}\n' for name, code, population in LOCATIONS)
+os.environ.update({'HUB_PROJECT_CONFIG': os.path.join(_config_dir, 'project-config.json'),
+                   'HUB_LOCATIONS': os.path.join(_config_dir, 'locations_eu.csv'),
+                   'HUB_CONFIG_CACHE_DIR': _config_dir,
+                   'HUB_OFFLINE': 'true'})
+
+
+def forecast_text(forecast_date=FORECAST_DATE):
+    """
+    :return: the csv text of a valid forecast: a point and all quantiles of each target and location
+    """
+    lines = ['forecast_date,target,target_end_date,location,type,quantile,value']
+    for horizon in HUB_CONFIG['horizon']['values']:
+        target_end_date = (datetime.date.fromisoformat(forecast_date) + datetime.timedelta(days=5 + 7 * (horizon - 1)))
+        for target_variable in HUB_CONFIG['target_variables']:
+            target = f'{horizon} wk ahead {target_variable}'
+            for _, location, _ in LOCATIONS:
+                lines.append(f'{forecast_date},{target},{target_end_date},{location},point,NA,100')
+                lines.extend(f'{forecast_date},{target},{target_end_date},{location},quantile,{quantile},{idx * 10 + 1}'
+                             for idx, quantile in enumerate(HUB_CONFIG['forecast_type']['quantiles']))
+    return '\n'.join(lines) + '\n'
+
+
+def write_model(hub_dir, model, forecasts):
+    """
+    Writes a model folder in hub_dir/data-processed, with its metadata file and forecasts.
+
+    :param forecasts: dict that maps each forecast file name to its text
+    :return: path of the model folder
+    """
+    model_dir = os.path.join(hub_dir, 'data-processed', model)
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, f'metadata-{model}.yml'), 'w') as fp:
+        fp.write(METADATA.format(model=model))
+    for file_name, text in forecasts.items():
+        with open(os.path.join(model_dir, file_name), 'w') as fp:
+            fp.write(text)
+    return model_dir
+
@@ -0,0 +1,82 @@
+"""
+Tests of test_formatting.check_formatting(), run in a subprocess: it reads its error report setting at import and
+exits with an error status when it finds errors.
+"""
+
+# Standard modules
+import os
+import shutil
+import subprocess
+import sys
+
+# Local modules
+from conftest import REPO_DIR, forecast_text, write_model
+
+CHECK_FORMATTING = ("import sys; from codebase.test_formatting import check_formatting; "
+                    "check_formatting(sys.argv[1], workers=int(sys.argv[2]), use_cache=False)")
+
+
+def run_check_formatting(hub_dir, workers, error_samples='5', hash_seed='0'):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, VALIDATION_ERROR_SAMPLES=error_samples, PYTHONHASHSEED=hash_seed)
+    return subprocess.run([sys.executable, '-c', CHECK_FORMATTING, os.path.join(str(hub_dir), 'data-processed'),
+                           str(workers)], cwd=REPO_DIR, env=env, capture_output=True, text=True)
+
+
+def test_parallel_check_reports_every_row_error(tmp_path):
+    # each row error comes back from the workers as a RowError, which must survive pickling
+    invalid_text = forecast_text().replace(',AT,', ',XX,')
+    for model in ('teamA-modelA', 'teamB-modelB'):
+        write_model(tmp_path, model, {f'2021-07-12-{model}.csv': invalid_text})
+
+    result = run_check_formatting(tmp_path, workers=2, error_samples='all')
+
+    assert 'BrokenProcessPool' not in result.stderr
+    assert result.returncode == 1 and 'ERRORS FOUND' in result.stderr
+    assert result.stdout.count("invalid ISO-2 location: 'XX'") == 2 * invalid_text.count(',XX,')
+
+
+def error_report(stdout):
+    # without the progress lines, which the workers print in any order
+    return [line for line in stdout.splitlines() if not line.startswith('* validating quantile_csv_file')]
+
+
+def test_parallel_check_reports_as_the_serial_check(tmp_path):
+    lines = forecast_text().splitlines(keepends=True)
+    for line_idx, (forecast_date, target) in enumerate([('2021-07-13', 'x wk ahead inc case'),
+                                                        ('2021-07-14', '7 wk ahead inc case'),
+                                                        ('2021-07-15', '9 wk ahead inc death')], start=1):
+        lines[line_idx] = lines[line_idx].replace('2021-07-12', forecast_date, 1).replace('1 wk ahead inc case', target)
+    for model in ('teamA-modelA', 'teamB-modelB', 'teamC-modelC'):
+        write_model(tmp_path, model, {f'2021-07-12-{model}.csv': ''.join(lines)})
+
+    serial_result = run_check_formatting(tmp_path, workers=1, hash_seed='1')
+    assert 'has multiple forecast dates' in serial_result.stdout
+    assert 'invalid target name(s)' in serial_result.stdout
+    for hash_seed in ('2', '3'):
+        parallel_result = run_check_formatting(tmp_path, workers=2, hash_seed=hash_seed)
+        assert error_report(parallel_result.stdout) == error_report(serial_result.stdout)
+
+
+def test_git_base_checks_only_the_changed_forecasts(tmp_path):
+    def git(*args):
+        subprocess.run(['git', '-C', str(tmp_path), '-c', 'user.name=test', '-c', 'user.email=test@example.org'] +
+                       list(args), check=True, capture_output=True)
+
+    # the checks read the metadata schema and licenses from the working directory
+    for file_name in ('schema.yml', 'accepted-licenses.csv'):
+        shutil.copy(os.path.join(REPO_DIR, file_name), tmp_path)
+    invalid_text = forecast_text().replace(',AT,', ',XX,')
+    write_model(tmp_path, 'teamA-modelA', {'2021-07-12-teamA-modelA.csv': invalid_text})
+    git('init', '-q')
+    git('add', '.')
+    git('commit', '-q', '-m', 'unchanged forecasts')
+    write_model(tmp_path, 'teamB-modelB', {'2021-07-12-teamB-modelB.csv': invalid_text})
+    git('add', '.')
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    result = subprocess.run([sys.executable, '-m', 'codebase.test_formatting', '--git-base', 'HEAD', '--no-cache'],
+                            cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert 'ERRORS FOUND' in result.stderr
+    assert '2021-07-12-teamB-modelB.csv' in result.stdout
+    assert '2021-07-12-teamA-modelA.csv' not in result.stdout
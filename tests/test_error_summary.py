@@ -0,0 +1,24 @@
+"""
+Tests of error_summary.
+"""
+
+# Standard modules
+import pickle
+
+# Local modules
+from codebase.error_summary import RowError, summarize_errors
+
+
+def test_row_error_pickles_with_its_message_and_row():
+    row_error = pickle.loads(pickle.dumps(RowError("Error > invalid ISO-2 location: 'XX'.", ['XX', '1'])))
+
+    assert isinstance(row_error, RowError)
+    assert row_error == "Error > invalid ISO-2 location: 'XX'. row=['XX', '1']"
+    assert (row_error.message, row_error.row) == ("Error > invalid ISO-2 location: 'XX'.", ['XX', '1'])
+
+
+def test_row_errors_are_grouped_by_message():
+    row_errors = [RowError("Error > invalid ISO-2 location: 'XX'.", [str(idx)]) for idx in range(4)]
+
+    assert summarize_errors(row_errors + ['other error'], max_samples=2) == [
+        "Error > invalid ISO-2 location: 'XX'. 4 rows, e.g. row=['0']; row=['1']; and 2 more", 'other error']
@@ -0,0 +1,23 @@
+"""
+Tests of json_io.
+"""
+
+# Standard modules
+import io
+import json
+
+# Local modules
+from conftest import forecast_text
+from codebase.covid19 import validated_quantile_predictions
+from codebase.json_io import write_json_io
+
+
+def test_json_io_is_written_as_the_dict_is_dumped(tmp_path):
+    forecast_path = tmp_path / '2021-07-12-teamA-modelA.csv'
+    forecast_path.write_text(forecast_text().replace(',point,NA,100\n', ',point,NA,100.5\n'))
+    predictions, _ = validated_quantile_predictions(str(forecast_path))
+
+    json_fp = io.StringIO()
+    write_json_io(predictions, json_fp, chunk_size=5)
+
+    assert json_fp.getvalue() == json.dumps(predictions.to_json_io_dict())
@@ -0,0 +1,59 @@
+"""
+Tests of metadata_documents: the two documents of a metadata file must be those of yaml.BaseLoader and of
+pykwalify's own loader.
+"""
+
+# Standard modules
+import io
+
+# To list in requirements.txt
+import pytest
+import yaml
+from pykwalify.compat import yml
+
+# Local modules
+from codebase.metadata_documents import parse_metadata
+
+SCALARS = ['1:20', '0o17', '017', '08', '0', '-12', '1_000', '0x1F', '0b101', '1e3', '1.', '.5', '-.inf', '1.5',
+           'true', 'True', 'yes', 'no', 'on', 'null', '~', '2021-01-01', '2021-01-01 10:00:00.5 +01:00', '12:30:00',
+           '"1"', "'true'", 'abc', '!!str 12', '!!int "12"']
+
+
+@pytest.mark.parametrize('scalar', SCALARS)
+def test_documents_as_the_loaders_give_them(scalar):
+    text = f"citation: {scalar}\nlist: [{scalar}]\nmapping: {{key: {scalar}}}\n"
+
+    document = parse_metadata(text)
+
+    assert document.strings == yaml.load(text, Loader=yaml.BaseLoader)
+    typed = yml.load(text)
+    assert document.typed == typed
+    assert [type(value) for value in document.typed.values()] == [type(value) for value in typed.values()]
+
+
+def test_merge_keys():
+    text = "base: &base {x: 1, y: 2}\nmodel:\n  <<: *base\n  x: 3\n"
+
+    document = parse_metadata(text)
+
+    assert document.typed == yml.load(text) == {'base': {'x': 1, 'y': 2}, 'model': {'x': 3, 'y': 2}}
+    assert document.strings == yaml.load(text, Loader=yaml.BaseLoader)
+
+
+def test_duplicate_keys_are_an_error():
+    with pytest.raises(yaml.YAMLError, match="found duplicate key 'model_abbr'"):
+        parse_metadata("model_abbr: teamA-modelA\nmodel_abbr: teamA-modelB\n")
+
+
+def test_parse_errors_are_worded_by_pyyaml():
+    text = "model_contributors: [A Person\n"
+    with pytest.raises(yaml.YAMLError) as pyyaml_error:
+        yaml.load(io.StringIO(text), Loader=yaml.BaseLoader)  # a stream, as the file was in the baseline
+
+    with pytest.raises(yaml.YAMLError, match=r"expected ',' or '\]', but got '<stream end>'") as error:
+        parse_metadata(text)
+    assert str(error.value) == str(pyyaml_error.value)
+
+
+def test_empty_file():
+    assert parse_metadata('# no metadata\n') == ('# no metadata\n', None, None)
@@ -0,0 +1,75 @@
+"""
+Tests of metadata_index.existing_metadata_names() with a fake GitHub repository.
+"""
+
+# Standard modules
+from types import SimpleNamespace
+
+# To list in requirements.txt
+from github import UnknownObjectException
+
+# Local modules
+from codebase.metadata_index import existing_metadata_names
+
+
+class FakeRepo:
+    """
+    The calls of a github Repository that existing_metadata_names() makes, on a repository with the given
+    model-metadata files (None for no model-metadata folder). `listed` is the number of them in the listing of the
+    folder: fewer makes it truncated
+    """
+
+    def __init__(self, metadata_files, listed=None):
+        self.default_branch = 'main'
+        self.metadata_files = metadata_files
+        self.listed = listed
+        self.contents_lookups = []
+
+    def get_git_tree(self, sha, recursive=False):
+        if sha == self.default_branch:
+            elements = [SimpleNamespace(path='README.md', type='blob', sha='readme'),
+                        SimpleNamespace(path='data-processed', type='tree', sha='data-processed')]
+            if self.metadata_files is not None:
+                elements.append(SimpleNamespace(path='model-metadata', type='tree', sha='model-metadata'))
+            return SimpleNamespace(tree=elements, raw_data={'sha': sha, 'truncated': False})
+        assert sha == 'model-metadata'
+        listed_files = self.metadata_files[:self.listed]
+        return SimpleNamespace(tree=[SimpleNamespace(path=file_name, type='blob', sha=file_name)
+                                     for file_name in listed_files],
+                               raw_data={'sha': sha, 'truncated': len(listed_files) < len(self.metadata_files)})
+
+    def get_contents(self, path, ref=None):
+        self.contents_lookups.append(path)
+        if path.split('/')[-1] not in (self.metadata_files or []):
+            raise UnknownObjectException(404, {'message': 'Not Found'}, {})
+        return SimpleNamespace(path=path)
+
+
+def test_listed_metadata_files():
+    repo = FakeRepo(['teamA-modelA.yml', 'teamB-modelB.yml', 'README.md'])
+
+    assert existing_metadata_names(repo, model_names={'teamA-modelA'}) == {'teamA-modelA', 'teamB-modelB'}
+    assert repo.contents_lookups == []
+
+
+def test_no_model_metadata_folder():
+    repo = FakeRepo(None)
+
+    assert existing_metadata_names(repo, model_names={'teamA-modelA'}) == set()
+    assert repo.contents_lookups == []
+
+
+def test_models_not_in_a_truncated_listing_are_looked_up():
+    repo = FakeRepo(['teamA-modelA.yml', 'teamB-modelB.yml', 'teamC-modelC.yml'], listed=1)
+
+    metadata_names = existing_metadata_names(repo, model_names={'teamA-modelA', 'teamC-modelC', 'teamD-modelD'})
+
+    assert metadata_names == {'teamA-modelA', 'teamC-modelC'}
+    assert repo.contents_lookups == ['model-metadata/teamC-modelC.yml', 'model-metadata/teamD-modelD.yml']
+
+
+def test_local_checkout(tmp_path):
+    (tmp_path / 'model-metadata').mkdir()
+    (tmp_path / 'model-metadata' / 'teamA-modelA.yml').write_text('model_abbr: teamA-modelA\n')
+
+    assert existing_metadata_names(checkout=str(tmp_path)) == {'teamA-modelA'}
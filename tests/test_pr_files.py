@@ -0,0 +1,84 @@
+"""
+Tests of pr_files.download_files() against a local http.server standing in for GitHub.
+"""
+
+# Standard modules
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# To list in requirements.txt
+import pytest
+import requests
+
+# Local modules
+from codebase.pr_files import download_files
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    """
+    Serves '/<name>' as b'contents of <name>', slowly enough that concurrent downloads overlap. The server counts the
+    requests of each path and the maximum number of concurrent requests. '/missing' is not found, and '/flaky'
+    fails with a 503 the first time
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            num_requests = server.requests[self.path]
+        time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+
+        if self.path == '/missing':
+            self._send(404, b'Not Found')
+        elif self.path == '/flaky' and num_requests == 1:
+            self._send(503, b'Service Unavailable')
+        else:
+            self._send(200, f'contents of {self.path[1:]}'.encode())
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_github():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGithubHandler)
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    server.lock = threading.Lock()
+    server.requests, server.in_flight, server.max_in_flight = {}, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_files_are_downloaded_concurrently_in_order(fake_github):
+    names = [f'forecast-{idx}.csv' for idx in range(8)]
+
+    contents = download_files([f'{fake_github.url}/{name}' for name in names], workers=4)
+
+    assert contents == [f'contents of {name}'.encode() for name in names]
+    assert 1 < fake_github.max_in_flight <= 4
+
+
+def test_a_missing_file_is_an_error(fake_github):
+    with pytest.raises(requests.HTTPError, match='404'):
+        download_files([f'{fake_github.url}/forecast.csv', f'{fake_github.url}/missing'])
+
+
+def test_a_transient_error_is_retried(fake_github):
+    contents = download_files([f'{fake_github.url}/flaky', f'{fake_github.url}/forecast.csv'])
+
+    assert contents == [b'contents of flaky', b'contents of forecast.csv']
+    assert fake_github.requests['/flaky'] == 2
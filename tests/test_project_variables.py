@@ -0,0 +1,24 @@
+"""
+Tests of project_variables.
+"""
+
+# To list in requirements.txt
+import pytest
+
+# Local modules
+from codebase.project_variables import DEFAULT_CONFIG_CACHE_TTL, _config_cache_ttl_from_environ
+
+
+@pytest.mark.parametrize('config_cache_ttl', ['a day', '-1', 'nan', ''])
+def test_an_invalid_config_ttl_falls_back_to_the_default(monkeypatch, capsys, config_cache_ttl):
+    monkeypatch.setenv('HUB_CONFIG_TTL', config_cache_ttl)
+
+    assert _config_cache_ttl_from_environ() == DEFAULT_CONFIG_CACHE_TTL
+    assert f"HUB_CONFIG_TTL must be a number of seconds, not {config_cache_ttl!r}" in capsys.readouterr().out
+
+
+def test_config_ttl(monkeypatch):
+    monkeypatch.setenv('HUB_CONFIG_TTL', '60')
+    assert _config_cache_ttl_from_environ() == 60
+    monkeypatch.delenv('HUB_CONFIG_TTL')
+    assert _config_cache_ttl_from_environ() == DEFAULT_CONFIG_CACHE_TTL
@@ -0,0 +1,53 @@
+"""
+Tests of the streaming validation of quantile_io.
+"""
+
+# Standard modules
+import random
+
+# Local modules
+from conftest import forecast_text
+from codebase.covid19 import validate_quantile_csv_file, validated_json_io_dict, validated_quantile_predictions
+from codebase.quantile_io import _QuantileRowNumbers
+
+
+def test_streaming_reports_as_the_whole_file(tmp_path):
+    header, *lines = forecast_text().splitlines(keepends=True)
+    lines[5] = lines[5].replace(',41\n', ',1000.5\n')  # a quantile group with decreasing values
+    random.Random(0).shuffle(lines)  # groups spread over the file and its chunks
+    forecast_path = tmp_path / '2021-07-12-teamA-modelA.csv'
+    forecast_path.write_text(header + ''.join(lines))
+
+    error_messages = validate_quantile_csv_file(str(forecast_path))
+
+    assert 'Entries in `value` must be non-decreasing' in error_messages[0]
+    assert validate_quantile_csv_file(str(forecast_path), streaming=True, chunk_size=7) == error_messages
+
+
+def test_predictions_of_the_validating_pass_are_the_json_io_dict(tmp_path):
+    header, *lines = forecast_text().splitlines(keepends=True)
+    lines = [line.replace(',point,NA,100\n', ',point,NA,100.5\n') for line in lines]
+    random.Random(1).shuffle(lines)
+    forecast_path = tmp_path / '2021-07-12-teamA-modelA.csv'
+    forecast_path.write_text(header + ''.join(lines))
+
+    predictions, error_messages = validated_quantile_predictions(str(forecast_path), chunk_size=7)
+
+    assert error_messages == []
+    json_io_dict = predictions.to_json_io_dict()
+    assert json_io_dict == validated_json_io_dict(str(forecast_path))[0]
+    assert [type(prediction_dict['prediction']['value']) for prediction_dict in json_io_dict['predictions']
+            if prediction_dict['class'] == 'point'] == [float] * 32
+
+
+def test_quantile_row_numbers_are_given_back_as_parsed():
+    quantile_numbers = _QuantileRowNumbers()
+    rows = [(1, 0.5, 10), (0, 0.25, 2.5), (1, 1, None), (1, 0, 2 ** 70)]
+    for row in rows:
+        quantile_numbers.append(*row)
+
+    group_numbers = quantile_numbers.group_numbers([0, 1])
+
+    assert group_numbers == {0: ([0.25], [2.5]), 1: ([0.5, 1, 0], [10, None, 2 ** 70])}
+    assert [type(value) for value in group_numbers[1][1]] == [int, type(None), int]
+    assert not quantile_numbers.are_all_numbers()
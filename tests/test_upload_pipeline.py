@@ -0,0 +1,169 @@
+"""
+Tests of upload_pipeline.upload_forecasts() against a fake Zoltar server: a local http.server with the few endpoints
+that zoltpy and forecast_upload use (token, model, forecast upload and job).
+"""
+
+# Standard modules
+import email
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# To list in requirements.txt
+import pytest
+from zoltpy.connection import Model, ZoltarConnection
+
+# Local modules
+from conftest import forecast_text, write_model
+from codebase.covid19 import validated_json_io_dict
+from zoltar_scripts.forecast_upload import upload_predictions
+from zoltar_scripts.upload_pipeline import INVALID, JOB_FAILED, UPLOAD_FAILED, UPLOADED, upload_forecasts
+
+TOKEN = 'a-token'
+JOB_STATUS_IDS = {'QUEUED': 2, 'SUCCESS': 4, 'FAILED': 5}  # as in zoltpy's Job.STATUS_ID_TO_STR
+
+
+class FakeZoltarHandler(BaseHTTPRequestHandler):
+    """
+    The requests of one client. The state is in the server: its `uploads` (source -> form fields), the
+    `job_statuses` of each forecast (file name -> statuses returned by the successive polls, the last one repeated)
+    and the `failing_models` (ids of the models whose uploads fail)
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/api-token-auth/':
+            self._send_json({'token': TOKEN})
+            return
+        model_id = int(re.fullmatch(r'/api/model/(\d+)/forecasts/', self.path).group(1))
+        if not self._is_authorized():
+            return
+        if model_id in self.server.failing_models:
+            self._send_json({'error': 'the forecast could not be saved'}, status=500)
+            return
+
+        form = email.message_from_bytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        fields = {part.get_param('name', header='content-disposition'): part for part in form.get_payload()}
+        source = fields['data_file'].get_filename()
+        with self.server.lock:
+            self.server.uploads[source] = {'timezero_date': fields['timezero_date'].get_payload(),
+                                           'json_io_dict': json.loads(fields['data_file'].get_payload(decode=True))}
+            self.server.jobs.append(list(self.server.job_statuses[os.path.basename(source)]))
+            job_id = len(self.server.jobs) - 1
+        self._send_json({'url': f'{self.server.url}/api/job/{job_id}/'})
+
+    def do_GET(self):
+        if not self._is_authorized():
+            return
+        model_match = re.fullmatch(r'/api/model/(\d+)/', self.path)
+        if model_match:
+            self._send_json({'id': int(model_match.group(1)), 'url': self.server.url + self.path})
+            return
+        job_id = int(re.fullmatch(r'/api/job/(\d+)/', self.path).group(1))
+        with self.server.lock:
+            statuses = self.server.jobs[job_id]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        self._send_json({'id': job_id, 'url': self.server.url + self.path, 'status': JOB_STATUS_IDS[status],
+                         'failure_message': 'could not load the forecast' if status == 'FAILED' else ''})
+
+    def _is_authorized(self):
+        if self.headers.get('Authorization') == f'JWT {TOKEN}':
+            return True
+        self._send_json({'detail': 'Authentication credentials were not provided.'}, status=401)
+        return False
+
+    def _send_json(self, json_data, status=200):
+        body = json.dumps(json_data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_zoltar():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeZoltarHandler)
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    server.lock = threading.Lock()
+    server.uploads, server.jobs, server.job_statuses, server.failing_models = {}, [], {}, set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run_upload_forecasts(fake_zoltar, forecast_paths, model_id=1, job_timeout=60):
+    conn = ZoltarConnection(fake_zoltar.url)
+    conn.authenticate('a-user', 'a-password')
+    model = Model(conn, f'{fake_zoltar.url}/api/model/{model_id}/')
+
+    def upload(forecast):
+        return upload_predictions(model, forecast['predictions'], forecast['path'], forecast['name'][:10])
+
+    def job_status(job):
+        job.refresh()
+        return job.status_as_str
+
+    finished = []
+    summary = upload_forecasts(forecast_paths, upload, job_status, validation_workers=2, poll_interval=0.05,
+                               job_timeout=job_timeout, on_finished=lambda name, forecast: finished.append(name))
+    assert sorted(finished) == sorted(summary)
+    return summary
+
+
+def write_forecasts(hub_dir, forecast_texts):
+    model_dir = write_model(hub_dir, 'teamA-modelA', {f'2021-07-12-{name}.csv': text
+                                                      for name, text in forecast_texts.items()})
+    return [os.path.join(model_dir, f'2021-07-12-{name}.csv') for name in forecast_texts]
+
+
+def test_valid_forecasts_are_uploaded_and_invalid_ones_are_not(tmp_path, fake_zoltar):
+    forecast_paths = write_forecasts(tmp_path, {'teamA-modelA': forecast_text(),
+                                                'teamA-invalid': forecast_text().replace(',AT,', ',XX,')})
+    fake_zoltar.job_statuses['2021-07-12-teamA-modelA.csv'] = ['QUEUED', 'QUEUED', 'SUCCESS']
+
+    summary = run_upload_forecasts(fake_zoltar, forecast_paths)
+
+    assert [forecast['status'] for forecast in summary.values()] == [UPLOADED, INVALID]
+    assert list(fake_zoltar.uploads) == [forecast_paths[0]]
+    upload = fake_zoltar.uploads[forecast_paths[0]]
+    assert upload['timezero_date'] == '2021-07-12'
+    assert upload['json_io_dict'] == validated_json_io_dict(forecast_paths[0])[0]
+    assert "invalid ISO-2 location: 'XX'" in summary['2021-07-12-teamA-invalid.csv']['errors'][0]
+
+
+def test_upload_failure(tmp_path, fake_zoltar):
+    forecast_paths = write_forecasts(tmp_path, {'teamA-modelA': forecast_text()})
+    fake_zoltar.failing_models.add(2)
+
+    summary = run_upload_forecasts(fake_zoltar, forecast_paths, model_id=2)
+
+    forecast = summary['2021-07-12-teamA-modelA.csv']
+    assert forecast['status'] == UPLOAD_FAILED and forecast['job'] is None
+    assert 'status_code=500' in forecast['errors'][0]
+
+
+def test_job_failure(tmp_path, fake_zoltar):
+    forecast_paths = write_forecasts(tmp_path, {'teamA-modelA': forecast_text()})
+    fake_zoltar.job_statuses['2021-07-12-teamA-modelA.csv'] = ['QUEUED', 'FAILED']
+
+    summary = run_upload_forecasts(fake_zoltar, forecast_paths)
+
+    forecast = summary['2021-07-12-teamA-modelA.csv']
+    assert (forecast['status'], forecast['errors']) == (JOB_FAILED, ['could not load the forecast'])
+
+
+def test_job_timeout(tmp_path, fake_zoltar):
+    forecast_paths = write_forecasts(tmp_path, {'teamA-modelA': forecast_text()})
+    fake_zoltar.job_statuses['2021-07-12-teamA-modelA.csv'] = ['QUEUED']
+
+    summary = run_upload_forecasts(fake_zoltar, forecast_paths, job_timeout=0.3)
+
+    forecast = summary['2021-07-12-teamA-modelA.csv']
+    assert (forecast['status'], forecast['errors']) == (JOB_FAILED, ['job not done before the timeout, status: QUEUED'])
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 from zoltpy import util
 from zoltpy.connection import ZoltarConnection
+import argparse
 import os
 import sys
 
@@ -19,9 +20,11 @@ if (os.environ.get('Z_USERNAME') == None):
 
 sys.path.append('validation/')
 
-from codebase.quantile_io import json_io_dict_from_quantile_csv_file
-from codebase.covid19 import VALID_TARGET_NAMES, covid19_row_validator, validate_quantile_csv_file
-from codebase.project_variables import REQUIRED_COLUMNS, CODES
+from zoltar_scripts.forecast_upload import upload_predictions
+from zoltar_scripts.upload_pipeline import upload_forecasts, print_upload_summary, UPLOADED, JOB_FAILED
+from zoltar_scripts.validated_file_db import ValidatedFileDB
+from zoltar_scripts.project_state import ProjectState
+from zoltar_scripts.reconcile import diff_forecasts, load_diff, print_diff, repo_forecast_names
 
 cwd_p = Path(__file__).parent.resolve()
 all_forecasts = glob.glob('./data-processed/**/*-*.csv')
@@ -36,25 +39,12 @@ conn = util.authenticate()
 repo_url = hub_config['repo_url'] + '/tree/main/data-processed'
 
 project_obj = [project for project in conn.projects if project.name == project_name][0]
-project_timezeros = [timezero.timezero_date for timezero in project_obj.timezeros]
-models = [model for model in project_obj.models]
-model_abbrs = [model.abbreviation for model in models]
-zoltar_forecasts = []
-repo_forecasts = []
+# models, timezeros and forecast paths, loaded once and indexed
+project_state = ProjectState(project_obj, all_forecasts)
 
 
-def read_validation_db():
-    try:
-        with open('validation/zoltar_scripts/validated_file_db.json', 'rb') as f:
-            l = json.load(f)
-    except Exception as ex:
-        l = {}
-    return dict(l)
-
-
-def write_db(db):
-    with open('validation/zoltar_scripts/validated_file_db.json', 'w') as fw:
-        json.dump(db, fw, indent=4)
+# uploaded forecasts, with their checksum, upload time and Zoltar job
+validated_file_db = ValidatedFileDB()
 
 # Function to read metadata file to get model name
 def metadata_dict_for_file(metadata_file):
@@ -64,7 +54,7 @@ def metadata_dict_for_file(metadata_file):
 
 def get_forecast_info(name):
     print(name)
-    path = list(filter(lambda f: name in f, all_forecasts))[0]
+    path = project_state.forecast_path(name)
     # abbr = name.split('.')[0].split('-')[-1]
     return path
 
@@ -90,83 +80,68 @@ def create_model(file_path, metadata):
     try:
         print('Creating model with config: ')
         pprint.pprint(model_config)
-        models.append(project_obj.create_model(model_config))
+        project_state.create_model(model_config)
     except Exception as ex:
         raise ex
         return ex
 
 def create_timezero(tz):
     try:
-        project_obj.create_timezero(tz)
-        project_timezeros.append(tz)
+        project_state.create_timezero(tz)
     except Exception as ex:
         return ex
 
 def extract_model_name(forecast_name):
     return forecast_name.split('-', maxsplit = 3)[3].split('.')[0]
 
-def upload_forecast(forecast_name):
-    path = get_forecast_info(forecast_name)
-    model_name = extract_model_name(forecast_name)
-    db = read_validation_db()
-
-    metadata = metadata_dict_for_file('model-metadata/{}.yml'.format(model_name))
-    if f"{metadata['model_abbr']}"  not in [m.abbreviation for m in models]:
-        create_model(path, metadata)
-
-    time_zero_date = '-'.join(forecast_name.split('-')[:3])
-
-    if time_zero_date not in [timezero.timezero_date for timezero in project_obj.timezeros]:
-        create_timezero(time_zero_date)
-
-    # print(forecast_name, metadata, time_zero_date)
-    if path is not None:
-        errors_from_validation = validate_quantile_csv_file(path)
-        if errors_from_validation != "no errors":
-            print(errors_from_validation)
-            return errors_from_validation, True
-        with open(path) as fp:
-            print('uploading %s' % path)
-            checksum = hashlib.md5(str(fp.read()).encode('utf-8')).hexdigest()
-            fp.seek(0)
-            quantile_json, error_from_transformation = json_io_dict_from_quantile_csv_file(fp,
-            VALID_TARGET_NAMES,
-            CODES,
-            covid19_row_validator,
-            REQUIRED_COLUMNS)
-
-            if len(error_from_transformation) > 0:
-                return error_from_transformation, True
-
-            try:
-                fr = util.upload_forecast(conn, quantile_json, path, project_name, f"{metadata['model_abbr']}" , time_zero_date)
-                db[forecast_name] = checksum
-                write_db(db)
-                return None, fr
-            except Exception as e:
-                raise e
-                return e, True
-    pass
-
 if __name__ == '__main__':
-    for model in models:
-        existing_forecasts = [forecast.source for forecast in model.forecasts]
-        zoltar_forecasts.extend(existing_forecasts)
-    for directory in [model for model in os.listdir('./data-processed/') if "." not in model]:
-        forecasts = [forecast for forecast in os.listdir('./data-processed/'+directory+"/") if ".csv" in forecast]
-        repo_forecasts.extend(forecasts)
-    print("number of forecasts in zoltar: " + str(len(zoltar_forecasts)))
-    print("number of forecasts in repo: " + str(len(repo_forecasts)))
-    print()
-    print('----------------------------------------------------------')
-    print()
-    forecasts_to_upload = []
-    for forecast in repo_forecasts:
-        if forecast not in zoltar_forecasts:
-            print("This forecast in repo but not in zoltar "+forecast)
-            forecasts_to_upload.append(forecast)
-
-    l = list(map(upload_forecast, forecasts_to_upload))
-    print(l)
+    parser = argparse.ArgumentParser(description="Upload the forecasts in the repo that are not in Zoltar")
+    parser.add_argument('--diff', help="json diff saved by compare_repo_to_zoltar.py --output, instead of comparing "
+                                       "the repo to Zoltar again")
+    args = parser.parse_args()
+
+    if args.diff:
+        diff = load_diff(args.diff)
+    else:
+        zoltar_forecasts = set().union(*project_state.forecast_sources().values())
+        diff = diff_forecasts(repo_forecast_names('./data-processed/'), zoltar_forecasts)
+    print_diff(diff)
+    forecasts_to_upload = diff['in_repo_not_in_zoltar']
+
     print('Forecasts to upload: ')
     pprint.pprint(forecasts_to_upload)
+
+    # create the missing models and timezeros first, so that the uploads can run concurrently
+    forecast_model_abbrs = {}  # forecast name -> model_abbr
+    for forecast_name in forecasts_to_upload:
+        metadata = metadata_dict_for_file('model-metadata/{}.yml'.format(extract_model_name(forecast_name)))
+        if not project_state.has_model(f"{metadata['model_abbr']}"):
+            create_model(get_forecast_info(forecast_name), metadata)
+        time_zero_date = '-'.join(forecast_name.split('-')[:3])
+        if not project_state.has_timezero(time_zero_date):
+            create_timezero(time_zero_date)
+        forecast_model_abbrs[forecast_name] = f"{metadata['model_abbr']}"
+
+    def start_upload(forecast):
+        print('uploading %s' % forecast['path'])
+        # the JSON IO text is written from the arrays a chunk at a time, and streamed from a temporary file
+        conn.re_authenticate_if_necessary()
+        return upload_predictions(project_state.models[forecast_model_abbrs[forecast['name']]],
+                                  forecast['predictions'], forecast['path'], '-'.join(forecast['name'].split('-')[:3]))
+
+    def job_status(job):
+        job.refresh()
+        return job.status_as_str
+
+    def record_upload(name, forecast):
+        # recorded as each job finishes, committed every BATCH_SIZE records and when the db is closed
+        if forecast['status'] in (UPLOADED, JOB_FAILED):
+            validated_file_db.record(name, forecast['checksum'], job_id=getattr(forecast['job'], 'id', None),
+                                     status=forecast['status'])
+
+    try:
+        summary = upload_forecasts([get_forecast_info(forecast_name) for forecast_name in forecasts_to_upload],
+                                   start_upload, job_status, on_finished=record_upload)
+    finally:
+        validated_file_db.close()
+    print_upload_summary(summary)
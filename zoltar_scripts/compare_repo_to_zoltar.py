@@ -1,44 +1,32 @@
 from zoltpy import util
+import argparse
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zoltar_scripts.reconcile import reconcile, print_diff, save_diff, ZOLTAR_SNAPSHOT_FILE
 
 # 1 Meta info 
 
+parser = argparse.ArgumentParser(description="Compare the forecasts in the repo with those in Zoltar")
+parser.add_argument('--output', help="save the differences as json, e.g. for upload_zoltar.py --diff")
+parser.add_argument('--snapshot', default=ZOLTAR_SNAPSHOT_FILE,
+                    help="snapshot of the Zoltar forecasts, refreshed for the models whose forecasts changed")
+args = parser.parse_args()
+
 ## Set connections to Zoltar project and github repo
 project_name = 'ECDC European COVID-19 Forecast Hub'
-project_obj = None
-project_timezeros = []
 conn = util.authenticate()
-url = 'https://github.com/epiforecasts/covid19-forecast-hub-europe/tree/master/data-processed/'
 
-## Get Zoltar project with all times, models, model names, forecasts
+## Get Zoltar project with all models
 project_obj = [project for project in conn.projects if project.name == project_name][0]
-project_timezeros = [timezero.timezero_date for timezero in project_obj.timezeros]
-models = [model for model in project_obj.models]
-model_names = [model.name for model in models]
-
-# 2 Get forecasts
-zoltar_forecasts = []
-repo_forecasts = []
-
-## Get all forecasts in Zoltar
-for model in models:
-    existing_forecasts = [forecast.source for forecast in model.forecasts]
-    zoltar_forecasts.extend(existing_forecasts)
-    
-## Get all forecasts in repo
-for directory in [model for model in os.listdir('./data-processed/') if "." not in model]:
-    forecasts = [forecast for forecast in os.listdir('./data-processed/'+directory+"/") if ".csv" in forecast]
-    repo_forecasts.extend(forecasts)
-    
+models = {model.abbreviation: model for model in project_obj.models}
+
+# 2 Get forecasts in Zoltar (concurrently, with the snapshot) and in the repo, and compare them
+diff = reconcile(models, './data-processed/', args.snapshot)
+
 # 3 Return mismatches
-print("number of forecasts in zoltar: " + str(len(zoltar_forecasts)))
-print("number of forecasts in repo: " + str(len(repo_forecasts)))
-for forecast in zoltar_forecasts:
-    if forecast not in repo_forecasts:
-        print("This forecast in zoltar but not in repo "+forecast)
-print()
-print('----------------------------------------------------------')
-print()
-for forecast in repo_forecasts:
-    if forecast not in zoltar_forecasts:
-        print("This forecast in repo but not in zoltar "+forecast)
\ No newline at end of file
+print_diff(diff)
+if args.output:
+    save_diff(diff, args.output)
@@ -0,0 +1,61 @@
+"""
+Upload of a forecast to Zoltar from its `json_io.QuantilePredictions`.
+
+zoltpy's `Model.upload_forecast()` takes the JSON IO dict of the whole forecast
+and posts it as one JSON string. `upload_predictions()` posts the same request,
+but the JSON IO text is written by `json_io.write_json_io()`, a chunk of
+predictions at a time, into the multipart body in a temporary file, which
+requests then streams from disk. Neither the dict nor the text of a whole
+forecast is held in memory.
+"""
+
+# Standard modules
+import io
+import tempfile
+import uuid
+
+# To list in requirements.txt
+import requests
+try:
+    from zoltpy.connection import Job
+except ImportError:  # the zoltpy of stable-req.txt
+    from zoltpy.connection import UploadFileJob as Job
+
+# Local modules
+from codebase.json_io import write_json_io
+
+
+def upload_predictions(model, predictions, source, timezero_date, notes=''):
+    """
+    Uploads a forecast, as zoltpy's `Model.upload_forecast(json_io_dict, source, timezero_date, notes)` does.
+
+    :param model: the zoltpy Model to upload to
+    :param predictions: a `json_io.QuantilePredictions` of a valid forecast
+    :param source: the source of the forecast in Zoltar, e.g. its file name
+    :param timezero_date: the timezero of the forecast, 'YYYY-MM-DD'
+    :param notes: optional notes of the forecast
+    :return: the zoltpy Job of the upload
+    """
+    boundary = uuid.uuid4().hex
+    with tempfile.TemporaryFile() as body_fp:
+        for name, value in (('timezero_date', timezero_date), ('notes', notes)):
+            body_fp.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                          .encode('utf-8'))
+        body_fp.write(f'--{boundary}\r\nContent-Disposition: form-data; name="data_file"; '
+                      f'filename="{source.replace(chr(34), "%22")}"\r\nContent-Type: application/json\r\n\r\n'
+                      .encode('utf-8'))
+        json_fp = io.TextIOWrapper(body_fp, encoding='utf-8', newline='')
+        write_json_io(predictions, json_fp)
+        json_fp.detach()  # flushes, and leaves body_fp open
+        body_fp.write(f'\r\n--{boundary}--\r\n'.encode('utf-8'))
+        body_fp.seek(0)
+
+        # a file body is sent a block at a time, with its size as Content-Length
+        response = requests.post(model.uri + 'forecasts/',
+                                 headers={'Authorization': f'JWT {model.zoltar_connection.session.token}',
+                                          'Content-Type': f'multipart/form-data; boundary={boundary}'},
+                                 data=body_fp)
+    if response.status_code != 200:  # HTTP_200_OK
+        raise RuntimeError(f"upload_predictions(): status code was not 200. status_code={response.status_code}. "
+                           f"text={response.text}")
+    return Job(model.zoltar_connection, response.json()['url'])
@@ -0,0 +1,80 @@
+"""
+The state of the Zoltar project that upload_zoltar.py works with, loaded once
+and indexed in memory: its models by abbreviation, its timezero dates, the
+sources of its existing forecasts, and the paths of the forecast files in the
+repository by name. The indexes are updated in place when models or timezeros
+are created, so no lookup needs a remote call or a scan of a list.
+"""
+
+# Standard modules
+import os
+
+# Local modules
+from .reconcile import zoltar_forecast_sources
+
+
+class ProjectState:
+    """
+    Indexed state of a Zoltar project, see the module docstring.
+
+    :param project: a zoltpy Project
+    :param forecast_paths: paths of the forecast csv files in the repository
+    """
+
+    def __init__(self, project, forecast_paths=()):
+        self.project = project
+        self.models = {model.abbreviation: model for model in project.models}  # abbreviation -> Model
+        self.timezero_dates = {timezero.timezero_date for timezero in project.timezeros}
+        self.forecast_paths = {os.path.basename(path): path for path in forecast_paths}  # file name -> path
+        self._forecast_sources = None  # abbreviation -> set of forecast sources. loaded on first use
+        self._all_forecast_sources = None  # sources of all models
+
+    def has_model(self, abbreviation):
+        return abbreviation in self.models
+
+    def create_model(self, model_config):
+        """
+        Creates a model in the project and adds it to the index.
+
+        :return: the new zoltpy Model
+        """
+        model = self.project.create_model(model_config)
+        self.models[model.abbreviation] = model
+        if self._forecast_sources is not None:
+            self._forecast_sources[model.abbreviation] = set()
+        return model
+
+    def has_timezero(self, timezero_date):
+        return timezero_date in self.timezero_dates
+
+    def create_timezero(self, timezero_date):
+        """
+        Creates a timezero in the project and adds it to the index.
+        """
+        timezero = self.project.create_timezero(timezero_date)
+        self.timezero_dates.add(timezero_date)
+        return timezero
+
+    def forecast_path(self, forecast_name):
+        """
+        :param forecast_name: file name of a forecast, e.g. '2021-07-12-teamA-modelA.csv'
+        :return: the path of the forecast in the repository, None if there is no such file
+        """
+        return self.forecast_paths.get(forecast_name)
+
+    def forecast_sources(self):
+        """
+        :return: dict that maps each model abbreviation to the set of the sources (file names) of its forecasts in
+            Zoltar. fetched once, on first use, see `reconcile.zoltar_forecast_sources()`
+        """
+        if self._forecast_sources is None:
+            self._forecast_sources = zoltar_forecast_sources(self.models)
+            self._all_forecast_sources = set().union(*self._forecast_sources.values())
+        return self._forecast_sources
+
+    def has_forecast(self, forecast_name):
+        """
+        :return: True if a forecast with source forecast_name is in Zoltar
+        """
+        self.forecast_sources()
+        return forecast_name in self._all_forecast_sources
@@ -0,0 +1,121 @@
+"""
+Reconciliation of the forecasts in the repository with those in Zoltar.
+
+- the forecasts of the Zoltar models are fetched concurrently, one model per thread
+- they are kept in an on-disk snapshot (ZOLTAR_SNAPSHOT, default .zoltar-snapshot.json),
+  so a later run only fetches again the models whose number of forecasts changed
+- the repository and Zoltar forecasts are compared as sets
+- the result is a diff dict that can be saved as json, and that upload_zoltar.py
+  takes to know which forecasts to upload:
+  {'in_repo_not_in_zoltar': [...], 'in_zoltar_not_in_repo': [...],
+   'num_repo_forecasts': n, 'num_zoltar_forecasts': m}
+"""
+
+# Standard modules
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+ZOLTAR_SNAPSHOT_FILE = os.environ.get('ZOLTAR_SNAPSHOT', '.zoltar-snapshot.json')
+FETCH_WORKERS = 8
+
+
+def repo_forecast_names(data_processed='./data-processed/'):
+    """
+    :return: set of the file names of the forecasts in the model folders of data_processed
+    """
+    return {forecast for directory in os.listdir(data_processed) if "." not in directory
+            for forecast in os.listdir(os.path.join(data_processed, directory)) if ".csv" in forecast}
+
+
+def _num_forecasts(model):
+    """
+    :return: the number of forecasts of model from the model json, without fetching them. None if it is not there
+    """
+    model_forecasts = model.json.get('forecasts')
+    if not isinstance(model_forecasts, list):
+        return None
+    return sum(1 for forecast in model_forecasts if not isinstance(forecast, dict) or forecast.get('forecast'))
+
+
+def zoltar_forecast_sources(models, snapshot_path=ZOLTAR_SNAPSHOT_FILE, workers=FETCH_WORKERS):
+    """
+    Fetches the sources of the forecasts of each model, concurrently, reusing the snapshot for the models whose
+    number of forecasts did not change. The snapshot is updated.
+
+    :param models: dict that maps model abbreviations to zoltpy Models
+    :param snapshot_path: path of the snapshot json. None to not use a snapshot
+    :param workers: maximum number of concurrent fetches
+    :return: dict that maps each model abbreviation to the set of its forecast sources
+    """
+    snapshot = {}
+    if snapshot_path is not None:
+        try:
+            with open(snapshot_path) as fp:
+                snapshot = json.load(fp)
+        except (OSError, ValueError):
+            snapshot = {}
+
+    num_forecasts = {abbreviation: _num_forecasts(model) for abbreviation, model in models.items()}
+    stale_abbreviations = [abbreviation for abbreviation in models
+                           if num_forecasts[abbreviation] is None or abbreviation not in snapshot
+                           or snapshot[abbreviation]['num_forecasts'] != num_forecasts[abbreviation]]
+
+    def fetch(abbreviation):
+        return [forecast.source for forecast in models[abbreviation].forecasts]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for abbreviation, sources in zip(stale_abbreviations, executor.map(fetch, stale_abbreviations)):
+            snapshot[abbreviation] = {'num_forecasts': num_forecasts[abbreviation], 'sources': sources}
+    print(f"Fetched the forecasts of {len(stale_abbreviations)} of {len(models)} Zoltar models.")
+
+    snapshot = {abbreviation: snapshot[abbreviation] for abbreviation in models}
+    if snapshot_path is not None and stale_abbreviations:
+        # write to a temporary file first so that an interrupted run never leaves a partial snapshot
+        with open(snapshot_path + '.tmp', 'w') as fp:
+            json.dump(snapshot, fp)
+        os.replace(snapshot_path + '.tmp', snapshot_path)
+    return {abbreviation: set(model_snapshot['sources']) for abbreviation, model_snapshot in snapshot.items()}
+
+
+def diff_forecasts(repo_forecasts, zoltar_forecasts):
+    """
+    :param repo_forecasts: set of the forecast file names in the repository
+    :param zoltar_forecasts: set of the forecast sources in Zoltar
+    :return: the diff dict described in the module docstring
+    """
+    return {'in_repo_not_in_zoltar': sorted(repo_forecasts - zoltar_forecasts),
+            'in_zoltar_not_in_repo': sorted(zoltar_forecasts - repo_forecasts),
+            'num_repo_forecasts': len(repo_forecasts),
+            'num_zoltar_forecasts': len(zoltar_forecasts)}
+
+
+def reconcile(models, data_processed='./data-processed/', snapshot_path=ZOLTAR_SNAPSHOT_FILE):
+    """
+    :param models: dict that maps model abbreviations to zoltpy Models
+    :return: the diff dict of the forecasts in data_processed and in Zoltar
+    """
+    zoltar_forecasts = set().union(*zoltar_forecast_sources(models, snapshot_path).values())
+    return diff_forecasts(repo_forecast_names(data_processed), zoltar_forecasts)
+
+
+def print_diff(diff):
+    print("number of forecasts in zoltar: " + str(diff['num_zoltar_forecasts']))
+    print("number of forecasts in repo: " + str(diff['num_repo_forecasts']))
+    for forecast in diff['in_zoltar_not_in_repo']:
+        print("This forecast in zoltar but not in repo "+forecast)
+    print()
+    print('----------------------------------------------------------')
+    print()
+    for forecast in diff['in_repo_not_in_zoltar']:
+        print("This forecast in repo but not in zoltar "+forecast)
+
+
+def save_diff(diff, path):
+    with open(path, 'w') as fp:
+        json.dump(diff, fp, indent=4)
+
+
+def load_diff(path):
+    with open(path) as fp:
+        return json.load(fp)
@@ -0,0 +1,177 @@
+"""
+A producer/consumer pipeline to upload many forecasts to Zoltar:
+
+1. forecasts are validated in a pool of processes, a chunk of rows at a time,
+   and converted in the same pass to compact `json_io.QuantilePredictions`
+   arrays rather than JSON IO dicts. `upload(forecast)` can then write the JSON
+   IO text from the arrays, see `forecast_upload.upload_predictions()`
+2. converted forecasts are uploaded by a bounded pool of upload threads, at most
+   `upload_workers` at a time, as soon as they are ready
+3. the Zoltar jobs of the uploads are polled every `poll_interval` seconds,
+   while the other forecasts are still being validated and uploaded. A job
+   that is not done after `job_timeout` seconds counts as failed
+4. the outcome of each forecast is collected in a summary, and passed to
+   `on_finished(name, forecast)` as soon as it is known, e.g. to record it
+
+The Zoltar side is passed in as two functions, `upload(forecast)` and
+`job_status(job)`, so the pipeline can run against any Zoltar connection,
+e.g. a local fake server.
+"""
+
+# Standard modules
+import collections
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Local modules
+from codebase.covid19 import validated_quantile_predictions
+from codebase.forecast_file import as_forecast_file
+
+UPLOAD_WORKERS = 4
+POLL_INTERVAL = 2  # seconds
+JOB_TIMEOUT = 3600  # seconds a job may stay unfinished, e.g. QUEUED, before it counts as failed
+
+# Zoltar job statuses, see zoltpy.connection.Job
+JOB_SUCCESS_STATUS = 'SUCCESS'
+JOB_FAILURE_STATUSES = ('FAILED', 'TIMEOUT')
+
+# forecast outcomes in the summary
+INVALID = 'invalid'
+UPLOAD_FAILED = 'upload failed'
+JOB_FAILED = 'job failed'
+UPLOADED = 'uploaded'
+
+
+def prepare_forecast(path):
+    """
+    Validates a forecast and converts its predictions to compact arrays, that are cheap to send back from the
+    validation processes and to hold until the upload. The arrays are built from the rows of the validation, a chunk
+    at a time: the JSON IO dict of the forecast is not built here. The file is read and parsed once: the checksum is
+    of the same contents.
+
+    :param path: path of a forecast csv, Parquet or Arrow file
+    :return: dict with the forecast 'name', 'path', 'checksum' (md5 of the file contents), validation 'errors' (a list)
+        and 'predictions' (a `json_io.QuantilePredictions`, None if there were errors)
+    """
+    forecast_file = as_forecast_file(path)
+    predictions, errors_from_validation = validated_quantile_predictions(forecast_file)
+    return {'name': os.path.basename(path),
+            'path': path,
+            'checksum': forecast_file.checksum(),
+            'errors': errors_from_validation,
+            'predictions': predictions}
+
+
+def upload_forecasts(paths, upload, job_status, validation_workers=None, upload_workers=UPLOAD_WORKERS,
+                     poll_interval=POLL_INTERVAL, job_timeout=JOB_TIMEOUT, on_finished=None):
+    """
+    Runs the pipeline described in the module docstring.
+
+    :param paths: paths of the forecast csv (or Parquet/Arrow) files to upload
+    :param upload: function that starts the upload of a forecast, as returned by `prepare_forecast()`, and returns its
+        Zoltar job. run in the upload threads
+    :param job_status: function that refreshes a job and returns its status, e.g. 'QUEUED' or 'SUCCESS'
+    :param validation_workers: number of validation processes, None for one per CPU
+    :param upload_workers: maximum number of concurrent uploads
+    :param poll_interval: seconds between two polls of the pending jobs
+    :param job_timeout: seconds after the upload after which a job that is still not done counts as failed
+    :param on_finished: optional function (name, forecast) called with the summary dict of each forecast once its
+        status is set, in the calling thread, e.g. to record the upload
+    :return: summary: dict that maps each forecast name to a dict with its 'path', 'status' (INVALID, UPLOAD_FAILED,
+        JOB_FAILED or UPLOADED), 'errors' (a list), 'checksum' and 'job'. in paths order
+    """
+    summary = {os.path.basename(path): {'path': path, 'status': None, 'errors': [], 'checksum': None, 'job': None}
+               for path in paths}
+    ready_forecasts = collections.deque()  # converted forecasts waiting for an upload thread
+    pending_jobs = {}  # forecast name -> (job of an upload that is not done yet, its deadline)
+    next_poll_time = 0
+
+    with ProcessPoolExecutor(validation_workers) as validators, ThreadPoolExecutor(upload_workers) as uploaders:
+        prepare_futures = {validators.submit(prepare_forecast, path): path for path in paths}
+        upload_futures = {}  # future -> forecast name
+
+        while prepare_futures or ready_forecasts or upload_futures or pending_jobs:
+            # start uploads, at most upload_workers at a time so that converted forecasts wait here, not in memory
+            # of the executor
+            while ready_forecasts and len(upload_futures) < upload_workers:
+                forecast = ready_forecasts.popleft()
+                upload_futures[uploaders.submit(upload, forecast)] = forecast['name']
+
+            timeout = max(next_poll_time - time.monotonic(), 0) if pending_jobs else None
+            done, _ = wait(set(prepare_futures) | set(upload_futures), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future in prepare_futures:
+                    path = prepare_futures.pop(future)
+                    try:
+                        forecast = future.result()
+                    except Exception as ex:  # e.g. a cell the validation does not handle: only this forecast fails
+                        _finish(summary, os.path.basename(path), on_finished, status=INVALID, errors=[repr(ex)])
+                        continue
+                    summary[forecast['name']]['checksum'] = forecast['checksum']
+                    if forecast['errors']:
+                        _finish(summary, forecast['name'], on_finished, status=INVALID, errors=forecast['errors'])
+                    else:
+                        ready_forecasts.append(forecast)
+                else:
+                    name = upload_futures.pop(future)
+                    try:
+                        summary[name]['job'] = job = future.result()
+                        pending_jobs[name] = job, time.monotonic() + job_timeout
+                    except Exception as ex:
+                        _finish(summary, name, on_finished, status=UPLOAD_FAILED, errors=[repr(ex)])
+
+            if pending_jobs and time.monotonic() >= next_poll_time:
+                _poll_jobs(pending_jobs, job_status, summary, on_finished)
+                next_poll_time = time.monotonic() + poll_interval
+
+    return summary
+
+
+def _poll_jobs(pending_jobs, job_status, summary, on_finished=None):
+    """
+    `upload_forecasts()` helper that polls each pending job once and records the finished ones in summary. Jobs past
+    their deadline are failed
+    """
+    for name, (job, deadline) in list(pending_jobs.items()):
+        try:
+            status = job_status(job)
+        except Exception as ex:
+            status, failure_message = JOB_FAILURE_STATUSES[0], repr(ex)
+        else:
+            failure_message = (getattr(job, 'json', None) or {}).get('failure_message') or status
+        if status == JOB_SUCCESS_STATUS:
+            _finish(summary, name, on_finished, status=UPLOADED)
+        elif status in JOB_FAILURE_STATUSES:
+            _finish(summary, name, on_finished, status=JOB_FAILED, errors=[failure_message])
+        elif time.monotonic() >= deadline:
+            _finish(summary, name, on_finished, status=JOB_FAILED,
+                    errors=[f"job not done before the timeout, status: {status}"])
+        else:
+            continue
+        del pending_jobs[name]
+
+
+def _finish(summary, name, on_finished, **outcome):
+    """
+    `upload_forecasts()` helper that sets the outcome of forecast `name` in summary and passes it on to on_finished
+    """
+    summary[name].update(outcome)
+    if on_finished is not None:
+        on_finished(name, summary[name])
+
+
+def print_upload_summary(summary):
+    """
+    Prints the number of forecasts per outcome and the errors of those that were not uploaded.
+    """
+    status_counts = collections.Counter(forecast['status'] for forecast in summary.values())
+    print(f"Uploaded {status_counts[UPLOADED]} of {len(summary)} forecasts. "
+          f"invalid: {status_counts[INVALID]}, upload failed: {status_counts[UPLOAD_FAILED]}, "
+          f"job failed: {status_counts[JOB_FAILED]}")
+    for name, forecast in summary.items():
+        if forecast['status'] != UPLOADED:
+            print(f"* {forecast['status'].upper()}: {name}")
+            for error in forecast['errors']:
+                print(f"    {error}")
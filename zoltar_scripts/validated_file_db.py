@@ -0,0 +1,118 @@
+"""
+The database of forecasts uploaded to Zoltar, in SQLite.
+
+One row per forecast file name, with the md5 checksum of the uploaded file, the
+upload time, and the id and status of the Zoltar upload job. Changes are
+written in batches, in one transaction per batch, and the database is opened
+in WAL mode with a busy timeout so that concurrent upload workers can share it.
+
+The older json database (forecast name -> checksum) is imported once, the first
+time the SQLite database is opened.
+"""
+
+# Standard modules
+import datetime
+import json
+import sqlite3
+
+VALIDATED_FILE_DB = 'validation/zoltar_scripts/validated_file_db.sqlite'
+VALIDATED_FILE_JSON_DB = 'validation/zoltar_scripts/validated_file_db.json'
+BATCH_SIZE = 100  # records per commit
+BUSY_TIMEOUT = 60  # seconds to wait for another writer
+
+UPLOADED_STATUS = 'uploaded'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    name TEXT PRIMARY KEY,
+    checksum TEXT NOT NULL,
+    upload_time TEXT,
+    job_id INTEGER,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ValidatedFileDB:
+    """
+    Forecasts uploaded to Zoltar, see the module docstring. Use as a context manager, or call `commit()` and
+    `close()`.
+
+    :param path: path of the SQLite database
+    :param json_path: path of the json database to import if not imported yet. None to not import
+    :param batch_size: number of `record()` calls after which the changes are committed
+    """
+
+    def __init__(self, path=VALIDATED_FILE_DB, json_path=VALIDATED_FILE_JSON_DB, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._num_uncommitted = 0
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+        if json_path is not None:
+            self._import_json_db(json_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _import_json_db(self, json_path):
+        with self.connection:  # one transaction: the import happens completely or not at all
+            if self.connection.execute("SELECT 1 FROM meta WHERE key = 'imported_json_db'").fetchone():
+                return
+            try:
+                with open(json_path, 'rb') as f:
+                    json_db = dict(json.load(f))
+            except (OSError, ValueError):
+                json_db = {}
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO forecasts (name, checksum, status) VALUES (?, ?, ?)",
+                [(name, checksum, UPLOADED_STATUS) for name, checksum in json_db.items()])
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('imported_json_db', ?)",
+                                    (json_path,))
+
+    def checksum(self, name):
+        """
+        :return: the checksum of forecast `name` when it was uploaded, None if it was not
+        """
+        row = self.connection.execute("SELECT checksum FROM forecasts WHERE name = ? AND status = ?",
+                                      (name, UPLOADED_STATUS)).fetchone()
+        return row[0] if row else None
+
+    def checksums(self):
+        """
+        :return: dict that maps the name of each uploaded forecast to its checksum
+        """
+        return dict(self.connection.execute("SELECT name, checksum FROM forecasts WHERE status = ?",
+                                            (UPLOADED_STATUS,)))
+
+    def record(self, name, checksum, job_id=None, status=UPLOADED_STATUS, upload_time=None):
+        """
+        Records an upload of forecast `name`, replacing any earlier one. Committed with the current batch.
+
+        :param upload_time: a datetime. now by default
+        """
+        upload_time = upload_time or datetime.datetime.now(datetime.timezone.utc)
+        self.connection.execute(
+            "INSERT INTO forecasts (name, checksum, upload_time, job_id, status) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET checksum = excluded.checksum, upload_time = excluded.upload_time, "
+            "job_id = excluded.job_id, status = excluded.status",
+            (name, checksum, upload_time.isoformat(timespec='seconds'), job_id, status))
+        self._num_uncommitted += 1
+        if self._num_uncommitted >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self._num_uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()